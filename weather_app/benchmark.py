@@ -0,0 +1,266 @@
+""" Benchmarks for the Wettermonitor
+
+Usage:
+python3 benchmark.py [name ...]
+
+Runs the given benchmarks (all if no name is given) and prints the time per call.
+The benchmarks use generated data and don't need a running database or network access.
+"""
+
+import json
+import os
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta
+import numpy as np
+import pandas as pd
+from pandas import json_normalize
+import pytz
+import weatherdata as wd
+import weatherimport as wi
+import weatherstatistics
+import weatherstorage
+from influxdb.resultset import ResultSet
+
+
+def measure(name, function, number = 100, repeat = 5):
+    """
+    prints the best time per call of function in ms
+
+    Parameters:
+    name (string): label of the measurement
+    function (function): function without parameters to measure
+    number (int): calls per repetition
+    repeat (int): number of repetitions (the best one is taken)
+    """
+    best = min(timeit.repeat(function, number = number, repeat = repeat)) / number
+    print(f'{name:<50} {best * 1000:10.3f} ms')
+    return best
+
+def generate_api_result(day, missing_every = 17):
+    """
+    generates a 'result' list of the measurements API (one entry every 10 minutes)
+
+    Parameters:
+    day (datetime): day of the entries
+    missing_every (int): every n-th value is missing (represented as .)
+    """
+    fields = [key.split('.')[1] for key in wd.Config.keys_mapping if key.startswith('values.')]
+    rng = np.random.default_rng(0)
+    result = []
+    for i, time in enumerate(pd.date_range(day, periods = 144, freq = '10min', tz = 'UTC')):
+        values = {}
+        for j, field in enumerate(fields):
+            value = '.' if (i * len(fields) + j) % missing_every == 0 else round(float(rng.normal(10, 5)), 1)
+            values[field] = {'value': value, 'unit': '', 'status': 'ok'}
+        result.append({'station': 'mythenquai', 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S.000Z'), 'values': values})
+    return result
+
+def legacy_clean_data(config, result, last_db_time):
+    # previous implementation (json_normalize, column wise mapping and type conversion)
+    normalized = json_normalize(result)
+
+    for column in normalized.columns[0:]:
+        mapping = config.keys_mapping.get(column, None)
+        if mapping is not None:
+            normalized[mapping] = normalized[column]
+        if mapping != column:
+            normalized.drop(columns = column, inplace = True)
+
+    normalized['timestamp'] = pd.to_datetime(normalized['timestamp'], format = '%Y-%m-%dT%H:%M:%S.%fZ', utc = True)
+    normalized.set_index('timestamp', inplace = True)
+    normalized.replace('.', 0, inplace = True)
+    for column in normalized.columns[0:]:
+        normalized[column] = normalized[column].astype(np.float64)
+
+    if last_db_time is not None:
+        normalized.drop(normalized[normalized.index <= last_db_time].index, inplace = True)
+
+    return normalized
+
+def benchmark_decode():
+    """decode one day of the measurements API (poll every 10 minutes)"""
+    config = wd.Config()
+    day = datetime(2021, 11, 15, tzinfo = pytz.utc)
+    result = generate_api_result(day)
+
+    for label, last_db_time in [('whole day', None), ('last 10 minutes', day + timedelta(hours = 23, minutes = 40))]:
+        legacy = legacy_clean_data(config, result, last_db_time)
+        decoded = wd.decode_measurements(config, result, last_db_time)
+        pd.testing.assert_frame_equal(legacy, decoded[legacy.columns], check_names = False)
+
+        measure(f'decode {label}: json_normalize (legacy)', lambda: legacy_clean_data(config, result, last_db_time))
+        measure(f'decode {label}: decode_measurements', lambda: wd.decode_measurements(config, result, last_db_time))
+
+def benchmark_snapshot():
+    """load one year of historic data: csv file vs. binary snapshot"""
+    config = wd.Config()
+    index = pd.date_range('2019-01-01', periods = 6 * 24 * 365, freq = '10min', tz = 'UTC')
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({column: rng.normal(10, 5, len(index)).round(1) for column in config.columns})
+    data.insert(0, 'timestamp_utc', index.strftime('%Y-%m-%dT%H:%M:%S+0000'))
+    data.insert(1, 'timestamp_cet', index.tz_convert('Europe/Zurich').strftime('%Y-%m-%dT%H:%M:%S%z'))
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory, 'messwerte.csv')
+        data.to_csv(file_name, index = False)
+        snapshot_file = wd.create_snapshot(file_name)
+
+        csv = pd.concat([wd.__define_types(chunk, '%Y-%m-%dT%H:%M:%S%z') for chunk in pd.read_csv(file_name, chunksize = config.historic_data_chunksize)])
+        snapshot = pd.concat(wd.__read_snapshot(snapshot_file, config.historic_data_chunksize))
+        pd.testing.assert_frame_equal(csv, snapshot, check_names = False)
+
+        print(f'csv: {os.path.getsize(file_name) / 1e6:.1f} MB, snapshot: {os.path.getsize(snapshot_file) / 1e6:.1f} MB')
+        measure('parse csv (read_csv + __define_types)', lambda: [wd.__define_types(chunk, '%Y-%m-%dT%H:%M:%S%z') for chunk in pd.read_csv(file_name, chunksize = config.historic_data_chunksize)], number = 1, repeat = 3)
+        measure('load snapshot', lambda: list(wd.__read_snapshot(snapshot_file, config.historic_data_chunksize)), number = 1, repeat = 3)
+
+def generate_query_result(start, periods, columns, missing_every = 97):
+    """generates a query result like the database client (utc index, every n-th entry missing)"""
+    index = pd.date_range(start, periods = periods, freq = '10min', tz = 'UTC')
+    index = index[np.arange(periods) % missing_every != 0]
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({column: rng.normal(10, 5, len(index)) for column in columns}, index = index)
+
+def legacy_normalize(df):
+    # previous implementation of get_measurements (resample, per element timezone conversion, reset_index)
+    df = df.resample("10min").asfreq()
+    zurich = pytz.timezone('Europe/Zurich')
+    df.index = df.index.map(lambda date: date.astimezone(zurich))
+    df["time"] = df.index
+    return df.reset_index(drop = True)
+
+def benchmark_normalize():
+    """normalize query results for plotting (1 day, 7 days, 1 year)"""
+    columns = [wi.Measurement.Air_temp.value, wi.Measurement.Dew_point.value, wi.Measurement.Water_temp.value]
+    for label, periods, number in [('1d', 144, 100), ('7d', 7 * 144, 20), ('1y', 365 * 144, 1)]:
+        df = generate_query_result('2021-01-01', periods, columns)
+        pd.testing.assert_frame_equal(legacy_normalize(df.copy()), wi.normalize_measurements(df.copy()), check_freq = False)
+
+        measure(f'normalize {label}: resample + lambda (legacy)', lambda: legacy_normalize(df.copy()), number = number)
+        measure(f'normalize {label}: normalize_measurements', lambda: wi.normalize_measurements(df.copy()), number = number)
+        measure(f'normalize {label}: arrays (align_to_grid)', lambda: wi.align_to_grid(df)[columns[0]].to_numpy(), number = number)
+
+def benchmark_storage():
+    """write one year and read 1 day, 7 days, 1 year: sqlite vs. influx (only if reachable)"""
+    config = wd.Config()
+    columns = config.columns
+    data = generate_query_result('2021-01-01', 365 * 144, columns)
+    stop = data.index[-1]
+
+    with tempfile.TemporaryDirectory() as directory:
+        backends = [('sqlite', weatherstorage.SQLiteStorage(os.path.join(directory, 'benchmark.sqlite')))]
+        try:
+            influx = weatherstorage.InfluxStorage(config.db_host, config.db_port, 'benchmark')
+            influx.ping()
+            backends.append(('influx', influx))
+        except Exception as e:
+            print(f'influx: skipped (not reachable at {config.db_host}:{config.db_port})')
+
+        for name, storage in backends:
+            storage.create()
+            storage.drop()
+            measure(f'{name}: write 1y', lambda: storage.write('benchmark', data, batch_size = config.historic_data_batch_size), number = 1, repeat = 1)
+            for label, days, number in [('1d', 1, 20), ('7d', 7, 10), ('1y', 365, 1)]:
+                start = stop - pd.Timedelta(days = days)
+                measure(f'{name}: read {label} (3 fields)', lambda: storage.read('benchmark', columns[:3], start, stop), number = number, repeat = 3)
+            measure(f'{name}: count 1y per day', lambda: storage.count('benchmark', columns[0], data.index[0], stop, '1d'), number = 1, repeat = 3)
+            measure(f'{name}: last entry', lambda: storage.last_entry('benchmark'), number = 20, repeat = 3)
+            if name == 'influx':
+                storage.client.drop_database('benchmark')
+
+def generate_influx_responses(station, data):
+    """generates the json and csv response body of InfluxDB for a query of all entries of data (like a 1.x server)"""
+    values = data.astype(object).where(data.notna(), None)
+    series = {'name': station, 'columns': ['time'] + list(data.columns), 'values': [[time] + row for time, row in zip(data.index.strftime('%Y-%m-%dT%H:%M:%SZ'), values.values.tolist())]}
+    json_body = json.dumps({'results': [{'statement_id': 0, 'series': [series]}]}).encode()
+
+    csv_data = data.copy()
+    csv_data.insert(0, 'time', data.index.asi8)
+    csv_data.insert(0, 'tags', '')
+    csv_data.insert(0, 'name', station)
+    csv_body = csv_data.to_csv(index = False, float_format = '%.15g').encode()
+    return json_body, csv_body
+
+def legacy_decode_query(client, json_body):
+    # previous read path (InfluxDBClient.query + DataFrameClient._to_dataframe: json -> ResultSet -> row wise DataFrame)
+    result = ResultSet(json.loads(json_body)['results'][0])
+    return client._to_dataframe(result)
+
+def benchmark_query_decode():
+    """decode the query result of one year with 6 fields: json (DataFrameClient) vs. csv (read_csv)"""
+    config = wd.Config()
+    data = generate_query_result('2021-01-01', 365 * 144, config.columns[:6])
+    json_body, csv_body = generate_influx_responses('benchmark', data)
+    client = weatherstorage.DataFrameClient()
+
+    legacy = legacy_decode_query(client, json_body)['benchmark']
+    decoded = weatherstorage.decode_csv(csv_body)[0][1]
+    pd.testing.assert_frame_equal(legacy, decoded, check_freq = False)
+
+    print(f'json: {len(json_body) / 1e6:.1f} MB, csv: {len(csv_body) / 1e6:.1f} MB')
+    measure('decode 1y, 6 fields: json + DataFrameClient (legacy)', lambda: legacy_decode_query(client, json_body), number = 1, repeat = 3)
+    measure('decode 1y, 6 fields: csv + decode_csv', lambda: weatherstorage.decode_csv(csv_body), number = 1, repeat = 3)
+
+def benchmark_render():
+    """render a simple plot (1 day) and the wind graph (7 days, hourly) per render profile: ms per graph and file size"""
+    import matplotlib
+    matplotlib.use('Agg')
+    wi.init_plotting()
+    config = wd.Config()
+    simple = generate_query_result('2021-01-01', 144, [wi.Measurement.Air_temp.value])
+    wind = generate_query_result('2021-01-01', 7 * 144, [measurement.value for measurement in wi.wind_measurements]).resample('1h').mean()
+    timestamps, values = wi._to_arrays(simple, [wi.Measurement.Air_temp])
+    wind_timestamps, wind_values = wi._to_arrays(wind, wi.wind_measurements, freq = '1h')
+
+    profiles = {'legacy (3000 px)': {'width': 3000, 'format': 'png', 'compress_level': 6, 'quality': 80}} #previous simple plot: 6 inch * 500 dpi, default compression
+    profiles.update(config.render_profiles)
+    with tempfile.TemporaryDirectory() as directory:
+        for name, profile in profiles.items():
+            simple_path = os.path.join(directory, f'simple.{profile["format"]}')
+            wind_path = os.path.join(directory, f'wind.{profile["format"]}')
+            render_simple = lambda: wi.generate_simple_plot('benchmark', values[wi.Measurement.Air_temp], timestamps, ['Temperatur', 'T', '°C'], simple_path, '%H:%M', profile = profile)
+            render_wind = lambda: wi.plot_wind_graph('benchmark', 'history', wind_timestamps, wind_values, profile = profile, imagepath = wind_path)
+            measure(f'{name}: simple plot', render_simple, number = 3, repeat = 3)
+            measure(f'{name}: wind graph', render_wind, number = 3, repeat = 3)
+            print(f'{name}: simple plot {os.path.getsize(simple_path) / 1e3:.0f} kB, wind graph {os.path.getsize(wind_path) / 1e3:.0f} kB')
+
+def legacy_annotations(values):
+    # previous implementation (missing values as 0, min / max in python loops with sentinel start values)
+    values = np.nan_to_num(values, nan = 0)
+    ymin, xpos_min = 100000000, 0
+    ymax, xpos_max = 0, 0
+    for i in range(len(values)):
+        if values[i] < ymin:
+            ymin, xpos_min = values[i], i
+        if values[i] > ymax:
+            ymax, xpos_max = values[i], i
+    return (ymin, xpos_min), (ymax, xpos_max), np.nanmean(values), values[-1]
+
+def benchmark_annotations():
+    """statistics of the graph annotations (min / max / mean / latest) for 1 day, 7 days, 1 year"""
+    for label, periods, number in [('1d', 144, 100), ('7d', 7 * 144, 20), ('1y', 365 * 144, 1)]:
+        values = wi.align_to_grid(generate_query_result('2021-01-01', periods, ['value']))['value'].to_numpy() #missing entries -> NaN
+        series = pd.Series(values)
+        statistics = weatherstatistics.annotation_statistics(values)
+        assert statistics['min'] == (series.min(), series.idxmin()) and statistics['max'] == (series.max(), series.idxmax())
+        assert np.isclose(statistics['mean'], series.mean()) and statistics['count'] == series.count()
+
+        measure(f'annotations {label}: python loops (legacy)', lambda: legacy_annotations(values), number = number)
+        measure(f'annotations {label}: annotation_statistics', lambda: weatherstatistics.annotation_statistics(values), number = number)
+
+
+benchmarks = {
+    'decode': benchmark_decode,
+    'snapshot': benchmark_snapshot,
+    'normalize': benchmark_normalize,
+    'storage': benchmark_storage,
+    'query_decode': benchmark_query_decode,
+    'render': benchmark_render,
+    'annotations': benchmark_annotations
+}
+
+if __name__ == '__main__':
+    for name in sys.argv[1:] or benchmarks.keys():
+        print(f'# {name}: {benchmarks[name].__doc__}')
+        benchmarks[name]()
@@ -0,0 +1,44 @@
+""" Creates binary snapshots of the historic csv files
+
+Usage:
+python3 create_snapshots.py
+
+For every station with a CSV_File (config.ini) a snapshot (.npz next to the csv file) is created.
+On the first start the snapshots are loaded instead of parsing the csv files.
+"""
+
+import logging
+import os
+from pathlib import Path
+import weatherdata as wd
+
+
+def create_snapshots(root, station_registry):
+    """Creates the snapshots of all stations with a csv file
+
+    Parameters:
+    root (String): project root (the paths of the csv files are relative to it)
+    station_registry (dict): stations (see weatherdata.load_station_registry)
+
+    Returns:
+    list of String: paths of the created snapshots
+    """
+    snapshots = []
+    for station, settings in station_registry.items():
+        if not settings["csv_file"]:
+            continue
+
+        file_name = root + "/" + settings["csv_file"]
+        if not os.path.exists(file_name):
+            logging.warning(f'CSV file {file_name} of {station} not found')
+            continue
+
+        snapshots.append(wd.create_snapshot(file_name))
+    return snapshots
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(asctime)s - %(message)s')
+
+    root = str(Path(os.path.dirname(os.path.realpath(__file__))).parent)
+    create_snapshots(root, wd.Config.station_registry)
@@ -6,7 +6,7 @@ import schedule
 import logging
 import logging.handlers
 from flask import Flask  
-from flask import render_template, redirect
+from flask import render_template, redirect, abort
 
 from flaskwebgui import FlaskUI
 #https://github.com/btashton/flask-influxdb
@@ -20,11 +20,11 @@ influx_db = InfluxDB(app=app)
 ui = FlaskUI(app, fullscreen=True, width=600, height=500, start_server='flask', idle_interval=20)
 
 
-def update_data():
+def update_data(stations = None):
     # use the scheduler to plot inside the main thread
     # generate_today_graphs() will cancel the job, so the job is only run once
     if weatherimport.systemInitialized:
-        schedule.every().second.do(weatherimport.generate_today_graphs) # update graphs with new data
+        schedule.every().second.do(weatherimport.generate_today_graphs, stations) # update graphs of the updated stations with new data
     logging.info('Update Data from database')
 
 
@@ -34,13 +34,21 @@ def check_for_pending_jobs():
         schedule.run_pending()
 
 
+@app.context_processor
+def inject_stations():
+    """
+    Stellt allen Templates die Messstationen und das Bildformat der Grafiken aus der config.ini zur Verfügung.
+    """
+    return dict(stations = weatherimport.config.station_registry, graph_format = weatherimport.config.render_profile["format"])
+
+
 @app.route('/')
 @app.route('/wetterstation')
 def index():
     """
-    Leitet den Client weiter auf die Übersichtsseite der Messstation Tiefenbrunnen.
+    Leitet den Client weiter auf die Übersichtsseite der Standard-Messstation (config.ini).
     """
-    return redirect("/wetterstation/tiefenbrunnen")
+    return redirect(f"/wetterstation/{weatherimport.config.default_station}")
 
 
 @app.route("/wetterstation/<station>")
@@ -51,6 +59,9 @@ def wetterstation(station: str):
     Args:
         station (str): Name der Wetterstation.
     """
+    if station not in weatherimport.config.station_registry:
+        abort(404)
+
     if not weatherimport.systemInitialized:
         logging.warning("System not initialized")
         return render_template('load_data.html')
@@ -100,6 +111,9 @@ def wetterstation_details(station: str, category: str, type: str):
         category (str): Die Kategorie der anzuzeigenden Messwerte (wind, temperature, water).
         type (str): Der Zeitraum der anzuzeigenden Messwerte (today, tomorrow, history).
     """
+    if station not in weatherimport.config.station_registry:
+        abort(404)
+
     if not weatherimport.systemInitialized:
         logging.warning("System not initialized")
         return render_template('load_data.html')
@@ -128,6 +142,8 @@ if __name__ == "__main__":
     logging.basicConfig(level=logging.DEBUG, format='[%(levelname)s] %(asctime)s - %(message)s')
     logging.info("Program has started")
 
+    weatherimport.setup() # config.ini (used by the web pages)
+
     # If matplotlib isn't run in the main thread, it will print warning messages like 20 atomic bombs have been detonated and it's the ending of humanity.
     threading.Thread(target=ui.run).start()
 
@@ -136,9 +152,14 @@ if __name__ == "__main__":
     
     weatherimport.reset_graphs()
 
-    threading.Thread(target=weatherimport.read_data_continuesly).start()
+    threading.Thread(target=weatherimport.read_data_continuesly, args=(update_data,)).start()
+    threading.Thread(target=weatherimport.repair_gaps, args=(update_data,)).start()
+    threading.Thread(target=weatherimport.sync_archive).start()
+    threading.Thread(target=weatherimport.sync_rollups).start()
 
     schedule.every().day.at("00:30").do(weatherimport.generate_last_7_days_graphs)
+    schedule.every().day.at("02:00").do(lambda: threading.Thread(target=weatherimport.repair_gaps, args=(update_data,)).start())
+    schedule.every().day.at("03:00").do(lambda: threading.Thread(target=weatherimport.apply_retention).start())
     schedule.every().day.at("01:00").do(weatherimport.generate_prediction_graphs)
     
     # generate graphs the first time
@@ -0,0 +1,30 @@
+import os
+import sys
+import pytest
+
+# the modules of the app import each other by name (run from weather_app)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def config(tmp_path):
+    """Config of the app with all stateful members (database, archive, ...) in a temporary directory"""
+    import weatherarchive
+    import weatherbuffer
+    import weathercache
+    import weatherdata as wd
+    import weatherspool
+    import weatherstorage
+    import weatherwatermarks
+
+    config = wd.Config()
+    config.storage = weatherstorage.SQLiteStorage(str(tmp_path / 'weather.sqlite'))
+    config.storage.create()
+    config.watermarks = weatherwatermarks.WatermarkStore(str(tmp_path / 'watermarks.json'))
+    config.spool = weatherspool.Spool(str(tmp_path / 'spool'))
+    config.archive = weatherarchive.Archive(str(tmp_path / 'archive'), config.columns)
+    config.recent = weatherbuffer.RecentBuffer(8, config.columns)
+    config.query_cache = weathercache.QueryCache(1024 * 1024, ttl = 600)
+    config.stations_last_entries = {}
+    config.stations_first_entries = {}
+    yield config
+    config.storage.connection.close()
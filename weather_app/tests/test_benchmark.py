@@ -0,0 +1,19 @@
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_script(*args):
+    # new interpreter: the import order of the script is tested, not the one of the test session
+    return subprocess.run([sys.executable, *args], cwd = APP_DIR, capture_output = True, text = True, timeout = 300)
+
+def test_benchmark_entry_point():
+    result = run_script('benchmark.py', 'annotations')
+    assert result.returncode == 0, result.stderr
+    assert '# annotations' in result.stdout
+
+def test_benchmarks_are_registered():
+    import benchmark
+    assert set(benchmark.benchmarks) == {'decode', 'snapshot', 'normalize', 'storage', 'query_decode', 'render', 'annotations'}
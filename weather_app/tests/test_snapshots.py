@@ -0,0 +1,37 @@
+import os
+import subprocess
+import sys
+import numpy as np
+import pandas as pd
+import create_snapshots
+import weatherdata as wd
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def write_csv(file_name, periods = 144):
+    index = pd.date_range('2019-01-01', periods = periods, freq = '10min', tz = 'UTC')
+    rng = np.random.default_rng(0)
+    data = pd.DataFrame({column: rng.normal(10, 5, len(index)).round(1) for column in wd.Config.columns})
+    data.insert(0, 'timestamp_utc', index.strftime('%Y-%m-%dT%H:%M:%S+0000'))
+    data.insert(1, 'timestamp_cet', index.tz_convert('Europe/Zurich').strftime('%Y-%m-%dT%H:%M:%S%z'))
+    data.to_csv(file_name, index = False)
+
+def test_create_snapshots(tmp_path):
+    write_csv(tmp_path / 'mythenquai.csv')
+    registry = {
+        'mythenquai': {'label': 'Mythenquai', 'categories': [], 'csv_file': 'mythenquai.csv'},
+        'tiefenbrunnen': {'label': 'Tiefenbrunnen', 'categories': [], 'csv_file': 'missing.csv'},
+        'without_csv': {'label': 'Without csv', 'categories': [], 'csv_file': None}
+    }
+
+    snapshots = create_snapshots.create_snapshots(str(tmp_path), registry)
+
+    assert snapshots == [wd.get_snapshot_file(str(tmp_path / 'mythenquai.csv'))]
+    csv = pd.concat(wd.__define_types(chunk, '%Y-%m-%dT%H:%M:%S%z') for chunk in pd.read_csv(tmp_path / 'mythenquai.csv', chunksize = 50))
+    snapshot = pd.concat(wd.__read_snapshot(snapshots[0], 50))
+    pd.testing.assert_frame_equal(csv, snapshot, check_names = False)
+
+def test_create_snapshots_script():
+    result = subprocess.run([sys.executable, 'create_snapshots.py'], cwd = APP_DIR, capture_output = True, text = True, timeout = 120)
+    assert result.returncode == 0, result.stderr
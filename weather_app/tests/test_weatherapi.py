@@ -0,0 +1,42 @@
+import pytest
+import requests
+import weatherapi
+
+
+def response(status_code, body = b'{"result": []}'):
+    answer = requests.Response()
+    answer.status_code = status_code
+    answer._content = body
+    answer.url = 'https://example.invalid/mythenquai'
+    return answer
+
+def client_with(monkeypatch, answers):
+    client = weatherapi.MeasurementsClient('https://example.invalid/', max_retries = 3, backoff_base = 0, backoff_max = 0)
+    calls = []
+    def get(url, params = None, timeout = None):
+        calls.append(url)
+        answer = answers[len(calls) - 1]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+    monkeypatch.setattr(client.session, 'get', get)
+    return client, calls
+
+@pytest.mark.parametrize('status_code', [400, 404])
+def test_client_error_is_not_retried(monkeypatch, status_code):
+    client, calls = client_with(monkeypatch, [response(status_code)])
+    with pytest.raises(requests.HTTPError):
+        client.get('unknown')
+    assert len(calls) == 1 and client.stats()['retries'] == 0
+
+@pytest.mark.parametrize('error', [response(429), response(503), requests.ConnectionError('refused'), requests.Timeout('timeout')])
+def test_transient_error_is_retried(monkeypatch, error):
+    client, calls = client_with(monkeypatch, [error, response(200)])
+    assert client.get('mythenquai') == {'result': []}
+    assert len(calls) == 2 and client.stats()['retries'] == 1
+
+def test_retries_are_limited(monkeypatch):
+    client, calls = client_with(monkeypatch, [response(500)] * 4)
+    with pytest.raises(requests.HTTPError):
+        client.get('mythenquai')
+    assert len(calls) == 4 #first request + max_retries
@@ -0,0 +1,57 @@
+import os
+import numpy as np
+import pandas as pd
+import weatherarchive
+
+COLUMNS = ['air_temperature', 'water_temperature']
+
+
+def frame(start, periods, offset = 0.0):
+    index = pd.date_range(start, periods = periods, freq = '10min', tz = 'UTC')
+    return pd.DataFrame({column: np.arange(periods, dtype = np.float64) + offset for column in COLUMNS}, index = index)
+
+def files(path):
+    return sorted(os.path.join(directory, file) for directory, directories, names in os.walk(path) for file in names if file.endswith('.parquet'))
+
+def test_append_writes_new_files(tmp_path):
+    archive = weatherarchive.Archive(str(tmp_path), COLUMNS)
+    archive.append('mythenquai', frame('2021-01-01', 6))
+    written = files(tmp_path)
+    modified = os.path.getmtime(written[0])
+
+    archive.append('mythenquai', frame('2021-01-01 01:00', 6))
+
+    assert len(files(tmp_path)) == 2 and os.path.getmtime(written[0]) == modified #the first file isn't rewritten
+    pd.testing.assert_frame_equal(archive.read('mythenquai', COLUMNS, '2021-01-01', '2021-01-01 01:50'), pd.concat([frame('2021-01-01', 6), frame('2021-01-01 01:00', 6)]), check_freq = False)
+
+def test_newer_entries_overwrite_older_ones(tmp_path):
+    archive = weatherarchive.Archive(str(tmp_path), COLUMNS)
+    archive.append('mythenquai', frame('2021-01-01', 6))
+    archive.append('mythenquai', frame('2021-01-01 00:30', 6, offset = 100))
+
+    data = archive.read('mythenquai', ['air_temperature'], '2021-01-01', '2021-01-02')
+
+    assert len(data.index) == 9
+    assert data['air_temperature'].tolist() == [0, 1, 2] + [100 + i for i in range(6)]
+
+def test_compaction(tmp_path):
+    archive = weatherarchive.Archive(str(tmp_path), COLUMNS, compact_after = 3)
+    for hour in range(3):
+        archive.append('mythenquai', frame(pd.Timestamp('2021-01-01') + pd.Timedelta(hours = hour), 6))
+    assert len(files(tmp_path)) == 3
+
+    archive.append('mythenquai', frame('2021-01-01 02:30', 3, offset = 100)) #4 files -> merged, overwrites the last 3 entries
+
+    assert len(files(tmp_path)) == 1
+    data = archive.read('mythenquai', ['air_temperature'], '2021-01-01', '2021-01-02')
+    assert data['air_temperature'].tolist() == list(range(6)) * 2 + [0, 1, 2, 100, 101, 102]
+
+def test_reset(tmp_path):
+    archive = weatherarchive.Archive(str(tmp_path), COLUMNS)
+    archive.append('mythenquai', frame('2021-01-01', 6))
+
+    archive.reset()
+
+    assert archive.get_range('mythenquai') is None and not archive.covers('mythenquai', '2021-01-01', '2021-01-01 00:50')
+    assert files(tmp_path) == [] and not os.path.exists(tmp_path / 'ranges.json')
+    assert weatherarchive.Archive(str(tmp_path), COLUMNS).get_range('mythenquai') is None #also after a restart
@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+import weatherbuffer
+
+COLUMNS = ['air_temperature', 'water_temperature', 'wind_direction']
+
+
+def buffer_with(data):
+    buffer = weatherbuffer.RecentBuffer(1, COLUMNS)
+    buffer.warm('mythenquai', data, data.index[0])
+    return buffer
+
+def test_read_drops_empty_fields():
+    index = pd.date_range('2021-01-01', periods = 6, freq = '10min', tz = 'UTC')
+    data = pd.DataFrame({'air_temperature': np.arange(6.0), 'water_temperature': np.nan}, index = index) #water_temperature without values
+    buffer = buffer_with(data)
+
+    result = buffer.read('mythenquai', COLUMNS, index[0], index[-1])
+
+    assert list(result.columns) == ['air_temperature'] #like the storage backends (dropna(axis = 1, how = 'all'))
+    np.testing.assert_array_equal(result['air_temperature'].to_numpy(), np.arange(6.0))
+
+def test_read_without_values():
+    index = pd.date_range('2021-01-01', periods = 6, freq = '10min', tz = 'UTC')
+    buffer = buffer_with(pd.DataFrame({'air_temperature': np.arange(6.0)}, index = index))
+
+    assert buffer.read('mythenquai', ['water_temperature', 'wind_direction'], index[0], index[-1]) is None
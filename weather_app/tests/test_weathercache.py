@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+import weathercache
+
+KEY = ('2021-01-01', '2021-01-02', ('air_temperature',))
+
+
+def result(values = 6):
+    index = pd.date_range('2021-01-01', periods = values, freq = '10min', tz = 'UTC')
+    return pd.DataFrame({'air_temperature': np.arange(values, dtype = np.float64)}, index = index)
+
+def size(data):
+    return int(data.memory_usage(deep = True).sum())
+
+def test_get_returns_copy():
+    cache = weathercache.QueryCache(1024 * 1024, ttl = 600)
+    cache.put('mythenquai', cache.version('mythenquai'), KEY, result())
+
+    hit, cached = cache.get('mythenquai', KEY)
+    cached['air_temperature'] = 0.0
+
+    assert hit
+    pd.testing.assert_frame_equal(cache.get('mythenquai', KEY)[1], result())
+
+def test_invalidate_during_query():
+    cache = weathercache.QueryCache(1024 * 1024, ttl = 600)
+    version = cache.version('mythenquai') #query sent
+    cache.invalidate('mythenquai') #new data written while querying
+    cache.put('mythenquai', version, KEY, result()) #outdated result
+
+    assert cache.get('mythenquai', KEY) == (False, None)
+    assert cache.stats()['entries'] == 0
+
+def test_invalidate_all_during_query():
+    cache = weathercache.QueryCache(1024 * 1024, ttl = 600)
+    version = cache.version('mythenquai')
+    cache.invalidate() #e.g. database dropped
+    cache.put('mythenquai', version, KEY, result())
+
+    assert cache.get('mythenquai', KEY) == (False, None)
+
+def test_invalidate_other_station():
+    cache = weathercache.QueryCache(1024 * 1024, ttl = 600)
+    cache.put('mythenquai', cache.version('mythenquai'), KEY, result())
+    cache.invalidate('tiefenbrunnen')
+
+    assert cache.get('mythenquai', KEY)[0]
+    assert cache.stats()['invalidations'] == 0
+
+def test_ttl_expiry(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(weathercache.time, 'monotonic', lambda: now[0])
+    cache = weathercache.QueryCache(1024 * 1024, ttl = 600)
+    cache.put('mythenquai', cache.version('mythenquai'), KEY, result())
+
+    now[0] += 600
+    assert cache.get('mythenquai', KEY)[0] #valid until the ttl passed
+    now[0] += 1
+    assert cache.get('mythenquai', KEY) == (False, None)
+
+    stats = cache.stats()
+    assert stats['expirations'] == 1 and stats['entries'] == 0 and stats['bytes'] == 0
+
+def test_lru_eviction_under_byte_budget():
+    data = result()
+    cache = weathercache.QueryCache(2 * size(data), ttl = 600)
+    keys = [('2021-01-0' + str(day),) for day in range(1, 4)]
+    cache.put('mythenquai', cache.version('mythenquai'), keys[0], data)
+    cache.put('mythenquai', cache.version('mythenquai'), keys[1], data)
+    cache.get('mythenquai', keys[0]) #keys[1] is the least recently used now
+    cache.put('mythenquai', cache.version('mythenquai'), keys[2], data)
+
+    assert cache.get('mythenquai', keys[0])[0]
+    assert not cache.get('mythenquai', keys[1])[0]
+    assert cache.get('mythenquai', keys[2])[0]
+    stats = cache.stats()
+    assert stats['evictions'] == 1 and stats['bytes'] == 2 * size(data) <= cache.max_bytes
+
+def test_result_larger_than_budget():
+    cache = weathercache.QueryCache(size(result()) - 1, ttl = 600)
+    cache.put('mythenquai', cache.version('mythenquai'), KEY, result())
+
+    assert cache.get('mythenquai', KEY) == (False, None)
+    assert cache.stats()['bytes'] == 0
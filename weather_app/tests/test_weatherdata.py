@@ -0,0 +1,167 @@
+import os
+from datetime import datetime
+import pandas as pd
+import pytest
+import pytz
+import weatherdata as wd
+
+get_retention_tiers = getattr(wd, '__get_retention_tiers')
+split_tiers = getattr(wd, '__split_tiers')
+SECOND = pd.Timedelta(seconds = 1)
+
+
+def api_result(day, station, tz = 'UTC'):
+    # one entry every 10 minutes of the day (in the timezone tz) in the format of the measurements API
+    fields = [key.split('.')[1] for key in wd.Config.keys_mapping if key.startswith('values.')]
+    return {'result': [{
+        'station': station,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S.000Z'),
+        'values': {field: {'value': 10.0, 'unit': '', 'status': 'ok'} for field in fields}
+    } for time in pd.date_range(day.strftime('%Y-%m-%d'), day.strftime('%Y-%m-%d') + ' 23:50', freq = '10min', tz = tz).tz_convert('UTC')]}
+
+def grid(start, stop):
+    index = pd.date_range(start, stop, freq = '10min', tz = 'UTC')
+    return pd.DataFrame({'air_temperature': 10.0}, index = index)
+
+class FlakyApi:
+    """Fails once for every day in fail_days"""
+    backoff_max = 0
+    tz = 'UTC'
+
+    def __init__(self, fail_days):
+        self.fail_days = set(fail_days)
+        self.requests = []
+
+    def get_data_of_day(self, day, station):
+        day = pd.Timestamp(day).floor('1d')
+        self.requests.append(day)
+        if day in self.fail_days:
+            self.fail_days.remove(day)
+            raise ConnectionError('API not available')
+        return api_result(day, station, self.tz)
+
+def test_import_latest_data_retries_failed_day(config, monkeypatch):
+    monkeypatch.setattr(wd.time, 'sleep', lambda seconds: None)
+    today = pd.Timestamp(datetime.now(pytz.utc)).floor('1d')
+    yesterday = today - pd.Timedelta(days = 1)
+    start = today - pd.Timedelta(days = 2)
+    config.storage.write('mythenquai', pd.DataFrame({'air_temperature': [1.0]}, index = pd.DatetimeIndex([start])))
+    config.api = FlakyApi([yesterday])
+
+    wd.import_latest_data(config, periodic_read = False, backfill = False, stations = ['mythenquai'])
+
+    assert config.api.requests.count(yesterday) == 2 #fetched again after the failure
+    counts = config.storage.count('mythenquai', 'air_temperature', start, today - pd.Timedelta(minutes = 10), '1d')
+    assert counts['count'].tolist() == [144, 144] #no day skipped
+
+def test_apply_retention_prunes_archive(config):
+    config.raw_retention_years = 1
+    config.hourly_retention_years = 0
+    today = pd.Timestamp(datetime.now(pytz.utc)).floor('1d')
+    raw_first = today - pd.DateOffset(years = 1)
+    index = pd.date_range(today - pd.DateOffset(months = 15), today, freq = '1h', tz = 'UTC')
+    data = pd.DataFrame({'air_temperature': range(len(index))}, index = index, dtype = float)
+    config.storage.write('mythenquai', data)
+    config.archive.append('mythenquai', data)
+    config.watermarks.set_rollups_first('mythenquai', index[0])
+    old = (index[0], raw_first - pd.Timedelta(hours = 1))
+    assert getattr(wd, '__read_archive')(config, ['air_temperature'], 'mythenquai', *old) is None #older than the raw tier -> rollups
+
+    wd.apply_retention(config, ['mythenquai'])
+
+    assert config.storage.first_time('mythenquai') >= raw_first
+    assert config.archive.get_range('mythenquai') == (raw_first, index[-1])
+    assert not config.archive.covers('mythenquai', *old)
+    archived = config.archive.read('mythenquai', ['air_temperature'], index[0], index[-1])
+    pd.testing.assert_frame_equal(archived, data[data.index >= raw_first], check_freq = False)
+    station_directory = os.path.join(config.archive.path, 'mythenquai')
+    months = {os.path.join(year, month) for year in os.listdir(station_directory) for month in os.listdir(os.path.join(station_directory, year))}
+    expected = {os.path.join(f'year={month.year}', f'month={month.month}') for month in pd.date_range(raw_first.replace(day = 1), today, freq = 'MS')}
+    assert months == expected #older months removed
+
+def test_plan_gaps(config):
+    data = grid('2021-01-01', '2021-01-03 23:50')
+    holes = pd.DatetimeIndex(['2021-01-01 03:00', '2021-01-01 03:10', '2021-01-01 12:40'], tz = 'UTC')
+    missing_day = pd.date_range('2021-01-02', '2021-01-02 23:50', freq = '10min', tz = 'UTC')
+    config.storage.write('mythenquai', data.drop(holes.append(missing_day)))
+
+    missing_slots = wd.plan_gaps(config, 'mythenquai', pd.Timestamp('2021-01-01 02:55', tz = 'UTC'), pd.Timestamp('2021-01-03 23:50', tz = 'UTC'))
+
+    pd.testing.assert_index_equal(missing_slots, holes.append(missing_day))
+
+def test_plan_gaps_without_holes(config):
+    config.storage.write('mythenquai', grid('2021-01-01', '2021-01-02 23:50'))
+
+    missing_slots = wd.plan_gaps(config, 'mythenquai', pd.Timestamp('2021-01-01 12:00', tz = 'UTC'), pd.Timestamp('2021-01-02 06:00', tz = 'UTC'))
+
+    assert missing_slots.empty and str(missing_slots.tz) == 'UTC'
+
+def test_repair_gaps(config):
+    today = pd.Timestamp(datetime.now(pytz.utc)).floor('1d')
+    data = grid(today - pd.Timedelta(days = 6), today - pd.Timedelta(minutes = 10))
+    holes = pd.DatetimeIndex([today - pd.Timedelta(days = 3) + pd.Timedelta(hours = 11), today - pd.Timedelta(days = 3) + pd.Timedelta(hours = 11, minutes = 10)])
+    missing_day = pd.date_range(today - pd.Timedelta(days = 2), today - pd.Timedelta(days = 1, minutes = 10), freq = '10min')
+    config.storage.write('mythenquai', data.drop(holes.append(missing_day)))
+    config.api = FlakyApi([])
+    config.api.tz = 'Europe/Zurich' #the API delivers local days
+
+    assert wd.repair_gaps(config, ['mythenquai'], lookback_days = 5) == len(holes) + len(missing_day)
+
+    counts = config.storage.count('mythenquai', 'air_temperature', today - pd.Timedelta(days = 6), today - pd.Timedelta(minutes = 10), '1d')
+    assert counts['count'].tolist() == [144] * 6
+
+@pytest.fixture
+def tiers(config):
+    """config with 1 year raw entries, 2 years hourly rollups -> (config, first raw entry, first hourly rollup)"""
+    config.raw_retention_years = 1
+    config.hourly_retention_years = 2
+    config.watermarks.set_rollups_first('mythenquai', pd.Timestamp('2000-01-01', tz = 'UTC'))
+    today = pd.Timestamp.now(tz = 'UTC').floor('1d')
+    return config, today - pd.DateOffset(years = 1), today - pd.DateOffset(years = 2)
+
+def test_retention_tiers(tiers):
+    config, raw_first, hourly_first = tiers
+    assert get_retention_tiers(config, 'mythenquai') == [(raw_first, None), (hourly_first, '1h'), (None, '1d')]
+
+    config.hourly_retention_years = 0 #hourly rollups kept forever
+    assert get_retention_tiers(config, 'mythenquai') == [(raw_first, None), (None, '1h')]
+
+def test_rollups_not_synced(tiers):
+    config, raw_first, hourly_first = tiers
+    config.watermarks.set_rollups_first('mythenquai', raw_first + SECOND) #rollups don't cover the range of the deleted raw entries yet
+    assert get_retention_tiers(config, 'mythenquai') == [(None, None)]
+    assert get_retention_tiers(config, 'tiefenbrunnen') == [(None, None)]
+
+def test_raw_years_zero(tiers):
+    config, raw_first, hourly_first = tiers
+    config.raw_retention_years = 0 #raw entries kept forever
+    start = hourly_first - pd.DateOffset(years = 1)
+
+    assert get_retention_tiers(config, 'mythenquai') == [(None, None)]
+    assert split_tiers(config, 'mythenquai', start, raw_first + SECOND) == [(start, raw_first + SECOND, None)]
+    assert split_tiers(config, 'mythenquai', start, None) == [(start, None, None)]
+
+def test_range_in_one_tier(tiers):
+    config, raw_first, hourly_first = tiers
+    assert split_tiers(config, 'mythenquai', raw_first, raw_first + pd.Timedelta(days = 7)) == [(raw_first, raw_first + pd.Timedelta(days = 7), None)]
+    assert split_tiers(config, 'mythenquai', raw_first, None) == [(raw_first, None, None)]
+    assert split_tiers(config, 'mythenquai', hourly_first, raw_first - SECOND) == [(hourly_first, raw_first - SECOND, '1h')]
+    start = hourly_first - pd.Timedelta(days = 30)
+    assert split_tiers(config, 'mythenquai', start, hourly_first - SECOND) == [(start, hourly_first - SECOND, '1d')]
+
+def test_range_in_all_tiers(tiers):
+    config, raw_first, hourly_first = tiers
+    start = hourly_first - pd.Timedelta(days = 30)
+    stop = raw_first + pd.Timedelta(days = 30)
+
+    assert split_tiers(config, 'mythenquai', start, stop) == [
+        (start, hourly_first - SECOND, '1d'),
+        (hourly_first, raw_first - SECOND, '1h'),
+        (raw_first, stop, None)
+    ]
+    assert split_tiers(config, 'mythenquai', start, None)[-1] == (raw_first, None, None)
+
+def test_range_across_one_boundary(tiers):
+    config, raw_first, hourly_first = tiers
+    assert split_tiers(config, 'mythenquai', raw_first - SECOND, raw_first) == [(raw_first - SECOND, raw_first - SECOND, '1h'), (raw_first, raw_first, None)]
+    assert split_tiers(config, 'mythenquai', (raw_first - SECOND).tz_localize(None), raw_first.tz_localize(None))[0][2] == '1h' #utc without timezone
@@ -0,0 +1,50 @@
+import numpy as np
+import pandas as pd
+import weatherimport as wi
+
+
+def frame(start, periods, columns, freq = '10min'):
+    index = pd.date_range(start, periods = periods, freq = freq, tz = 'UTC')
+    return pd.DataFrame({column: np.arange(periods, dtype = np.float64) for column in columns}, index = index)
+
+def test_align_to_grid_without_entries():
+    assert wi.align_to_grid(None) is None
+    empty = frame('2021-01-01', 0, ['air_temperature'])
+    assert wi.align_to_grid(empty) is empty
+
+def test_align_to_grid_fills_missing_slots():
+    df = frame('2021-01-01', 6, ['air_temperature']).drop(pd.Timestamp('2021-01-01 00:20', tz = 'UTC'))
+    aligned = wi.align_to_grid(df)
+    assert len(aligned.index) == 6 and np.isnan(aligned['air_temperature'].iloc[2])
+
+def test_to_arrays_without_entries():
+    timestamps, values = wi._to_arrays(None, wi.wind_measurements)
+    assert timestamps.dtype == np.dtype('datetime64[ns]') and len(timestamps) == 0
+    assert set(values) == set(wi.wind_measurements)
+    assert all(len(array) == 0 and array.dtype == np.float64 for array in values.values())
+
+def test_to_arrays_missing_measurement():
+    # fields without values are dropped by the query
+    df = frame('2021-01-01', 6, [wi.Measurement.Air_temp.value])
+    timestamps, values = wi._to_arrays(df, [wi.Measurement.Air_temp, wi.Measurement.Water_temp])
+    assert len(timestamps) == 6
+    np.testing.assert_array_equal(values[wi.Measurement.Air_temp], np.arange(6))
+    assert np.isnan(values[wi.Measurement.Water_temp]).all() and len(values[wi.Measurement.Water_temp]) == 6
+
+def test_station_graph_jobs_without_data(monkeypatch):
+    wi.setup()
+    stations = ['mythenquai', 'tiefenbrunnen']
+    data = {
+        'mythenquai': {
+            'wind': frame('2021-01-01', 144, [measurement.value for measurement in wi.wind_measurements]),
+            'simple': frame('2021-01-01', 144, [measurement.value for measurement, unit_symbols, ylim in wi.simple_graphs.values()])
+        },
+        'tiefenbrunnen': {'wind': None, 'simple': None} #no entries in the requested range
+    }
+    monkeypatch.setattr(wi, '_query_measurements_batch', lambda requests: [data[request[0]]['wind' if request[1] is wi.wind_measurements else 'simple'] for request in requests])
+
+    fetched = wi.fetch_station_graphs(stations, '1d')
+    jobs = {station: wi.station_graph_jobs(station, 'today', '1d', '%H:%M', fetched[station]) for station in stations}
+
+    assert jobs['tiefenbrunnen'] == []
+    assert {name for name, function, kwargs in jobs['mythenquai']} == {f'mythenquai_{name}_today' for name in ['wind'] + [category for category in wi.config.station_registry['mythenquai']['categories'] if category in wi.simple_graphs]}
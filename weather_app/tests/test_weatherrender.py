@@ -0,0 +1,26 @@
+import os
+import numpy as np
+import weatherrender
+
+
+def write_pid(path, values):
+    # render job: writes the id of the rendering process
+    with open(path, 'w') as file:
+        file.write(str(os.getpid()))
+
+def fail(path, values):
+    raise ValueError('render failed')
+
+def test_single_job_is_rendered_in_a_worker(tmp_path):
+    engine = weatherrender.RenderEngine(1)
+    try:
+        path = str(tmp_path / 'pid')
+        assert engine.render([('graph', write_pid, {'path': path, 'values': np.arange(3)})]) == 1
+        with open(path) as file:
+            assert int(file.read()) != os.getpid() #never in the calling process
+
+        assert engine.render([('graph', write_pid, {'path': path, 'values': np.arange(3)})]) == 0 #unchanged -> skipped
+        assert engine.render([('graph', fail, {'path': path, 'values': np.arange(3)})]) == 0
+        assert engine.stats() == {'rendered': 1, 'skipped': 1, 'failed': 1, 'skip_ratio': 0.5}
+    finally:
+        engine.shutdown()
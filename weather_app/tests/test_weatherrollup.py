@@ -0,0 +1,66 @@
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import pytest
+import pytz
+import weatherdata as wd
+import weatherrollup
+
+add_data_to_db = getattr(wd, '__add_data_to_db')
+
+
+def entries(start, stop, seed):
+    index = pd.date_range(start, stop, freq = '10min')
+    rng = np.random.default_rng(seed)
+    data = pd.DataFrame({'air_temperature': rng.normal(10, 5, len(index)), 'humidity': rng.normal(60, 10, len(index))}, index = index)
+    data.iloc[::4, 1] = np.nan #missing values
+    return data
+
+def assert_rollups_recomputed(config, station):
+    # the incremental rollups equal the rollups of all raw entries
+    raw = config.storage.read(station, None, pd.Timestamp(0, tz = 'UTC'))
+    for resolution in weatherrollup.RESOLUTIONS:
+        rollup = config.storage.read(weatherrollup.get_table(station, resolution), None, pd.Timestamp(0, tz = 'UTC'))
+        expected = weatherrollup.aggregate(raw, resolution)
+        pd.testing.assert_frame_equal(rollup[expected.columns], expected, check_freq = False)
+
+@pytest.mark.parametrize('day', [
+    pd.Timestamp(datetime.now(pytz.utc)).floor('1d') - pd.Timedelta(days = 2), #raw entries of the recent buffer
+    pd.Timestamp('2021-01-01', tz = 'UTC') #raw entries of the database
+])
+def test_incremental_rollups(config, day):
+    add_data_to_db(config, entries(day, day + pd.Timedelta(minutes = 20), 1), 'mythenquai') #partial hour
+    hourly = config.storage.read(weatherrollup.get_table('mythenquai', '1h'), None, day)
+    assert list(hourly.index) == [day]
+
+    add_data_to_db(config, entries(day + pd.Timedelta(minutes = 30), day + pd.Timedelta(minutes = 50), 2), 'mythenquai') #same hour
+    add_data_to_db(config, entries(day + pd.Timedelta(hours = 23), day + pd.Timedelta(hours = 25), 3), 'mythenquai') #day boundary
+
+    assert_rollups_recomputed(config, 'mythenquai')
+    daily = config.storage.read(weatherrollup.get_table('mythenquai', '1d'), None, day)
+    assert list(daily.index) == [day, day + pd.Timedelta(days = 1)]
+
+def test_spooled_entries_rolled_up_on_replay(config, monkeypatch):
+    day = pd.Timestamp('2021-01-01', tz = 'UTC')
+    add_data_to_db(config, entries(day, day + pd.Timedelta(minutes = 20), 1), 'mythenquai')
+
+    write = config.storage.write
+    def failing_write(station, data, batch_size = None):
+        if station == 'mythenquai':
+            raise ConnectionError('database not available')
+        write(station, data, batch_size)
+    monkeypatch.setattr(config.storage, 'write', failing_write)
+    add_data_to_db(config, entries(day + pd.Timedelta(minutes = 30), day + pd.Timedelta(hours = 2), 2), 'mythenquai') #spooled
+    monkeypatch.setattr(config.storage, 'write', write)
+
+    assert not config.spool.is_empty()
+    hourly = config.storage.read(weatherrollup.get_table('mythenquai', '1h'), None, day)
+    assert list(hourly.index) == [day] #not rolled up while spooled
+
+    config.spool.next_retry = 0 #backoff passed
+    assert wd.replay_spool(config)
+
+    assert config.spool.is_empty()
+    assert_rollups_recomputed(config, 'mythenquai')
+    hourly = config.storage.read(weatherrollup.get_table('mythenquai', '1h'), None, day)
+    assert list(hourly.index) == list(pd.date_range(day, periods = 3, freq = '1h'))
@@ -0,0 +1,91 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import weatherspool
+
+
+def frame(start, periods = 6):
+    index = pd.date_range(start, periods = periods, freq = '10min', tz = 'UTC')
+    data = pd.DataFrame({'air_temperature': np.arange(periods, dtype = np.float64), 'water_temperature': np.arange(periods, dtype = np.float64) / 2}, index = index)
+    data.iloc[1, 1] = np.nan #missing value
+    return data
+
+class Writer:
+    """Collects the replayed data, raises while failing is True"""
+    def __init__(self, failing = False):
+        self.failing = failing
+        self.written = []
+
+    def __call__(self, station, data):
+        if self.failing:
+            raise ConnectionError('database not available')
+        self.written.append((station, data))
+
+def test_append_replay_round_trip(tmp_path):
+    spool = weatherspool.Spool(str(tmp_path))
+    spool.append('mythenquai', frame('2021-01-01 00:00'))
+    spool.append('tiefenbrunnen', frame('2021-01-01 00:00'))
+    spool.append('mythenquai', frame('2021-01-01 01:00'))
+    assert not spool.is_empty()
+
+    writer = Writer()
+    assert spool.replay(writer) == 18
+
+    written = dict(writer.written)
+    assert sorted(written) == ['mythenquai', 'tiefenbrunnen']
+    pd.testing.assert_frame_equal(written['mythenquai'], pd.concat([frame('2021-01-01 00:00'), frame('2021-01-01 01:00')]), check_freq = False)
+    pd.testing.assert_frame_equal(written['tiefenbrunnen'], frame('2021-01-01 00:00'), check_freq = False)
+    assert spool.is_empty() and os.listdir(tmp_path) == []
+
+def test_crash_during_replay(tmp_path):
+    spool = weatherspool.Spool(str(tmp_path))
+    spool.append('mythenquai', frame('2021-01-01 00:00'))
+
+    with pytest.raises(ConnectionError):
+        spool.replay(Writer(failing = True)) #e.g. database down again (or the process killed) while replaying
+    assert os.listdir(tmp_path) == ['replay.jsonl'] #kept for the next replay
+
+    spool = weatherspool.Spool(str(tmp_path)) #restart
+    spool.append('mythenquai', frame('2021-01-01 01:00')) #appended to a new file, not to the file being replayed
+    assert sorted(os.listdir(tmp_path)) == ['replay.jsonl', 'spool.jsonl']
+
+    writer = Writer()
+    assert spool.replay(writer) == 12
+    assert [station for station, data in writer.written] == ['mythenquai', 'mythenquai']
+    pd.testing.assert_frame_equal(writer.written[0][1], frame('2021-01-01 00:00'), check_freq = False) #interrupted replay first
+    pd.testing.assert_frame_equal(writer.written[1][1], frame('2021-01-01 01:00'), check_freq = False)
+    assert spool.is_empty()
+
+    writer = Writer()
+    assert spool.replay(writer) == 0 and writer.written == [] #nothing replayed twice
+
+def test_skips_corrupt_entry(tmp_path):
+    spool = weatherspool.Spool(str(tmp_path))
+    spool.append('mythenquai', frame('2021-01-01 00:00'))
+    with open(spool.file, 'a') as file:
+        file.write('{"station": "mythenquai", "ind') #power loss while appending
+
+    writer = Writer()
+    assert spool.replay(writer) == 6
+
+def test_backoff(tmp_path, monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(weatherspool.time, 'monotonic', lambda: now[0])
+    spool = weatherspool.Spool(str(tmp_path), retry_base = 5, retry_max = 12)
+    assert spool.is_due()
+
+    delays = []
+    for attempt in range(4):
+        spool.failed()
+        delays.append(spool.next_retry - now[0])
+        assert not spool.is_due()
+        now[0] = spool.next_retry
+        assert spool.is_due()
+    assert delays == [5, 10, 12, 12] #doubled up to retry_max
+
+    spool.failed()
+    spool.succeeded()
+    assert spool.is_due()
+    spool.failed()
+    assert spool.next_retry - now[0] == 5 #backoff reset
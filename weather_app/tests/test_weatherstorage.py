@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import weatherstorage
+
+WIND = ['wind_speed_avg_10min', 'wind_gust_max_10min']
+SIMPLE = ['air_temperature', 'water_temperature']
+
+
+class Response:
+    def __init__(self, content):
+        self.headers = {'Content-Type': 'application/csv'}
+        self.content = content
+
+class FakeClient:
+    # answers every statement with the entries of the station in frames (empty statements are left out like InfluxDB does)
+    def __init__(self, frames):
+        self.frames = frames
+        self.requests = []
+        self.queries = []
+
+    def request(self, endpoint, params, headers):
+        self.requests.append(params['q'])
+        blocks = []
+        for statement in params['q'].split(';'):
+            fields = statement.split('SELECT ')[1].split(' FROM ')[0].split(',')
+            station = statement.split(' FROM ')[1].split(' ')[0]
+            data = self.frames.get(station, {}).get(tuple(fields))
+            if data is None:
+                continue
+            block = data.copy()
+            block.insert(0, 'time', data.index.asi8)
+            block.insert(0, 'tags', '')
+            block.insert(0, 'name', station)
+            blocks.append(block.to_csv(index = False))
+        return Response('\n'.join(blocks).encode())
+
+    def query(self, query):
+        self.queries.append(query)
+        answers = [{} for statement in query.split(';')]
+        return answers[0] if len(answers) == 1 else iter(answers)
+
+
+def frame(columns, start = '2021-01-01', periods = 6):
+    index = pd.date_range(start, periods = periods, freq = '10min', tz = 'UTC')
+    return pd.DataFrame({column: np.arange(periods, dtype = np.float64) for column in columns}, index = index)
+
+def storage(frames):
+    influx = weatherstorage.InfluxStorage('localhost', 8086, 'test')
+    influx.client = FakeClient(frames)
+    return influx
+
+def test_decode_csv():
+    data = frame(SIMPLE)
+    influx = storage({'mythenquai': {tuple(SIMPLE): data}})
+    result = influx.read('mythenquai', SIMPLE, data.index[0], data.index[-1])
+    pd.testing.assert_frame_equal(result, data, check_freq = False)
+
+def test_read_many_empty_leading_statement():
+    # no wind entries -> the first statement is left out, the block belongs to the second request of the same range
+    data = frame(SIMPLE)
+    influx = storage({'mythenquai': {tuple(SIMPLE): data}})
+    start, stop = data.index[0], data.index[-1]
+
+    wind, simple = influx.read_many([('mythenquai', WIND, start, stop), ('mythenquai', SIMPLE, start, stop)])
+
+    assert wind is None
+    pd.testing.assert_frame_equal(simple, data, check_freq = False)
+    assert influx.client.queries == [] #csv
+
+def test_read_many_same_range_overlapping_fields_reads_json():
+    data = frame(SIMPLE)
+    influx = storage({'mythenquai': {tuple(SIMPLE): data}})
+    start, stop = data.index[0], data.index[-1]
+
+    influx.read_many([('mythenquai', SIMPLE, start, stop), ('mythenquai', None, start, stop)])
+
+    assert influx.client.requests == [] and len(influx.client.queries) == 1 #blocks can't be assigned -> json
+
+def test_quote_identifier():
+    assert weatherstorage._quote_identifier('air_temperature') == '"air_temperature"'
+    assert weatherstorage._quote_identifier('a"b') == '"a""b"'
+
+def test_sqlite_identifiers_with_quotes(tmp_path):
+    sqlite = weatherstorage.SQLiteStorage(str(tmp_path / 'weather.sqlite'))
+    sqlite.create()
+    data = frame(['air_temperature', 'odd "field"'])
+
+    sqlite.write('station "x"', data)
+
+    pd.testing.assert_frame_equal(sqlite.read('station "x"', None, data.index[0], data.index[-1]), data, check_freq = False)
+    pd.testing.assert_frame_equal(sqlite.last_entry('station "x"'), data.tail(1), check_freq = False)
+    assert sqlite.field_keys('station "x"') == ['air_temperature', 'odd "field"']
@@ -0,0 +1,54 @@
+import json
+import os
+import pandas as pd
+import pytest
+import weatherwatermarks
+
+
+def test_write_and_reload(tmp_path):
+    file_name = str(tmp_path / 'state' / 'watermarks.json')
+    store = weatherwatermarks.WatermarkStore(file_name)
+    store.set_last_entry('mythenquai', pd.Timestamp('2021-01-01 13:10', tz = 'Europe/Zurich'))
+    store.set_csv_imported('mythenquai', True)
+    store.set_rollups_first('tiefenbrunnen', pd.Timestamp('2020-01-01', tz = 'UTC'))
+
+    store = weatherwatermarks.WatermarkStore(file_name) #restart
+    assert store.get_last_entry('mythenquai') == pd.Timestamp('2021-01-01 12:10', tz = 'UTC')
+    assert store.get_csv_imported('mythenquai') is True
+    assert store.get_rollups_first('tiefenbrunnen') == pd.Timestamp('2020-01-01', tz = 'UTC')
+    assert store.get_last_entry('tiefenbrunnen') is None and store.get_csv_imported('tiefenbrunnen') is None
+
+    store.reset('mythenquai')
+    store = weatherwatermarks.WatermarkStore(file_name)
+    assert store.get_last_entry('mythenquai') is None
+    assert store.get_rollups_first('tiefenbrunnen') is not None
+
+@pytest.mark.parametrize('content', ['{"mythenquai": {"last_entry": "2021-01-01T12:', '', 'no json'])
+def test_corrupt_file_ignored(tmp_path, content):
+    file_name = str(tmp_path / 'watermarks.json')
+    with open(file_name, 'w') as file:
+        file.write(content) #e.g. written by an older version without atomic save
+
+    store = weatherwatermarks.WatermarkStore(file_name)
+    assert store.get_last_entry('mythenquai') is None #fallback: search the last entry in the database
+
+    store.set_last_entry('mythenquai', pd.Timestamp('2021-01-01 12:10', tz = 'UTC'))
+    assert weatherwatermarks.WatermarkStore(file_name).get_last_entry('mythenquai') == pd.Timestamp('2021-01-01 12:10', tz = 'UTC')
+
+def test_interrupted_save_keeps_file(tmp_path, monkeypatch):
+    file_name = str(tmp_path / 'watermarks.json')
+    store = weatherwatermarks.WatermarkStore(file_name)
+    store.set_last_entry('mythenquai', pd.Timestamp('2021-01-01 12:10', tz = 'UTC'))
+
+    def interrupted_dump(state, file, **kwargs):
+        file.write('{"mythenquai": {"last_en') #power loss while writing
+        raise OSError('interrupted')
+    monkeypatch.setattr(weatherwatermarks.json, 'dump', interrupted_dump)
+    with pytest.raises(OSError):
+        store.set_last_entry('mythenquai', pd.Timestamp('2021-01-01 12:20', tz = 'UTC'))
+    monkeypatch.undo()
+
+    with open(file_name) as file:
+        json.load(file) #still complete
+    assert os.path.isfile(file_name + '.tmp')
+    assert weatherwatermarks.WatermarkStore(file_name).get_last_entry('mythenquai') == pd.Timestamp('2021-01-01 12:10', tz = 'UTC')
@@ -0,0 +1,139 @@
+""" Client for the tecdottir measurements API
+
+The API publishes the measurements of the weather stations of the
+Wasserschutzpolizei Zurich (the service URL is set in config.ini).
+
+A single keep-alive session is used for all requests, so the TLS connection
+is only established once. Requests failing with a transient error (connection
+error, timeout, 429 or 5xx) are retried with an exponential backoff (with jitter)
+up to a maximum number of retries. Other errors (e.g. 404 for an unknown station)
+are raised immediately.
+"""
+
+import logging
+import random
+import threading
+import time
+import requests
+from requests.adapters import HTTPAdapter
+
+
+class MeasurementsClient:
+    def __init__(self, base_url, connect_timeout = 5, read_timeout = 30, max_retries = 5, backoff_base = 1, backoff_max = 60, pool_size = 8):
+        """
+        Parameters:
+        base_url (string): url of the service, the station name is appended
+        connect_timeout (float): seconds to wait for the connection to be established
+        read_timeout (float): seconds to wait for the response
+        max_retries (int): number of retries after the first failed request
+        backoff_base (float): seconds to wait before the first retry (doubled on every retry)
+        backoff_max (float): maximum seconds to wait between two retries
+        pool_size (int): number of kept alive connections (at least the number of concurrent requests)
+        """
+        self.base_url = base_url
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections = 1, pool_maxsize = pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.__lock = threading.Lock()
+        self.__stats = {
+            'requests': 0, #number of sent requests (including retries)
+            'failures': 0, #number of failed requests
+            'retries': 0, #number of retries
+            'latency_total': 0.0, #seconds spent waiting for successful responses
+            'latency_max': 0.0,
+            'latency_last': 0.0
+        }
+
+    def get_data_of_day(self, day, station):
+        """Get all measurements of a station at a specific day
+
+        Parameters:
+        day (datetime): day to query
+        station (string): station name
+
+        Returns:
+        dict: parsed json of the response
+
+        Raises:
+        requests.RequestException: if the request still fails after all retries or fails with a 4xx status (except 429)
+        """
+        day_str = day.strftime('%Y-%m-%d')
+        payload = {
+            'startDate': day_str,
+            'endDate': day_str
+        }
+        return self.get(station, payload)
+
+    def get(self, path, params = None):
+        """Send a GET request to the service (retried with exponential backoff)
+
+        Parameters:
+        path (string): path relative to the base url
+        params (dict): query parameters
+
+        Returns:
+        dict: parsed json of the response
+        """
+        url = f'{self.base_url}{path}'
+        attempt = 0
+        while True:
+            start_time = time.perf_counter()
+            try:
+                response = self.session.get(url, params = params, timeout = self.timeout)
+                response.raise_for_status()
+                data = response.json()
+                self.__count(time.perf_counter() - start_time)
+                return data
+
+            except (requests.RequestException, ValueError) as e:
+                self.__count(None)
+                if not self.__is_transient(e):
+                    logging.error(f'Request for \'{url}\' failed. ({e})')
+                    raise
+                if attempt >= self.max_retries:
+                    logging.error(f'Request for \'{url}\' failed {attempt + 1} times. ({e})')
+                    raise
+
+                delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt)) #full jitter
+                attempt += 1
+                with self.__lock:
+                    self.__stats['retries'] += 1
+                logging.warning(f'Request for \'{url}\' failed. ({e})\nTrying again in {delay:.1f} seconds...')
+                time.sleep(delay)
+
+    def stats(self):
+        """Returns the request counters
+
+        Returns:
+        dict: requests, failures, retries, latency_total, latency_mean, latency_max, latency_last (latencies in seconds)
+        """
+        with self.__lock:
+            stats = dict(self.__stats)
+        successful = stats['requests'] - stats['failures']
+        stats['latency_mean'] = stats['latency_total'] / successful if successful > 0 else 0.0
+        return stats
+
+    def __is_transient(self, error):
+        # errors which may succeed on a retry: no connection, timeout, rate limit (429) or server error (5xx)
+        if isinstance(error, (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError)):
+            return True
+        if isinstance(error, requests.HTTPError) and error.response is not None:
+            return error.response.status_code == 429 or error.response.status_code >= 500
+        return False
+
+    def __count(self, latency):
+        with self.__lock:
+            self.__stats['requests'] += 1
+            if latency is None: #failed request
+                self.__stats['failures'] += 1
+            else:
+                self.__stats['latency_total'] += latency
+                self.__stats['latency_max'] = max(self.__stats['latency_max'], latency)
+                self.__stats['latency_last'] = latency
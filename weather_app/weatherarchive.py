@@ -0,0 +1,234 @@
+""" Local columnar archive of the measurements
+
+Mirrors the measurements of the database into parquet files on the local disk,
+partitioned by station, year and month (<path>/<station>/year=<yyyy>/month=<m>/part-<sequence>.parquet).
+Historic ranges can be read with column projection and a time filter, only the
+partitions and row groups inside the range are read (memory mapped).
+
+Every append writes a new small file into the partitions of its entries instead of
+rewriting the whole month (the live import appends every 10 minutes). Files with a
+higher sequence overwrite entries of older files. When a month has more than
+compact_after files, they are merged into one file.
+
+Requires pyarrow. If pyarrow isn't installed, the archive is disabled and all
+reads go to the database.
+"""
+
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+
+def to_utc(time):
+    """Converts a datetime to a pd.Timestamp in utc (datetimes without timezone are utc, like in the database queries)"""
+    time = pd.Timestamp(time)
+    return time.tz_localize('UTC') if time.tzinfo is None else time.tz_convert('UTC')
+
+class Archive:
+    def __init__(self, path, columns, enabled = True, compact_after = 144):
+        """
+        Parameters:
+        path (string): root directory of the archive
+        columns (list of string): fields stored in the archive (all partitions share this schema)
+        enabled (bool): False disables the archive
+        compact_after (int -> default: 144): max. number of files per month, more files are merged into one
+        """
+        self.path = path
+        self.columns = list(columns)
+        self.compact_after = compact_after
+        self.enabled = enabled and pa is not None
+        if enabled and pa is None:
+            logging.warning('pyarrow is not installed, the local archive is disabled')
+
+        self.__lock = threading.Lock()
+        self.__ranges = self.__load_ranges() if self.enabled else {}
+        self.__last_sequence = 0 #sequence of the last written file
+
+    def get_range(self, station):
+        """Returns (first, last) timestamps (utc) of the archived data of a station or None"""
+        with self.__lock:
+            archived = self.__ranges.get(station, None)
+        return (pd.Timestamp(archived['first']), pd.Timestamp(archived['last'])) if archived else None
+
+    def covers(self, station, start_time, stop_time):
+        """Returns True if the range [start_time, stop_time] of a station can be read from the archive"""
+        archived = self.get_range(station) if self.enabled else None
+        return archived is not None and archived[0] <= to_utc(start_time) and to_utc(stop_time) <= archived[1]
+
+    def append(self, station, data : pd.DataFrame):
+        """Adds (or overwrites) entries of a station
+
+        Parameters:
+        station (string): station name
+        data (pd.DataFrame): measurements with a utc timestamp index
+        """
+        if not self.enabled or data.empty:
+            return
+
+        data = data.reindex(columns = self.columns).astype('float64')
+        data.index = data.index.tz_localize('UTC') if data.index.tz is None else data.index.tz_convert('UTC')
+        data.index.name = 'time'
+
+        with self.__lock:
+            for (year, month), partition in data.groupby([data.index.year, data.index.month]):
+                self.__write_partition(station, year, month, partition)
+            self.__extend_range(station, data.index.min(), data.index.max())
+
+    def reset(self):
+        """Removes all archived entries and ranges (e.g. after the database was dropped)"""
+        with self.__lock:
+            for station in self.__ranges:
+                shutil.rmtree(os.path.join(self.path, station), ignore_errors = True)
+            self.__ranges = {}
+
+            file_name = os.path.join(self.path, 'ranges.json')
+            if os.path.isfile(file_name):
+                os.remove(file_name)
+
+    def prune(self, station, before):
+        """Removes the entries of a station older than before (e.g. after the retention deleted them in the database)
+
+        Parameters:
+        station (string): station name
+        before (datetime): entries before this time are removed (utc if no timezone is set)
+        """
+        if not self.enabled:
+            return
+
+        before = to_utc(before)
+        with self.__lock:
+            station_directory = os.path.join(self.path, station)
+            for year_directory in os.listdir(station_directory) if os.path.isdir(station_directory) else []:
+                for month_directory in os.listdir(os.path.join(station_directory, year_directory)):
+                    year = int(year_directory.split('=', 1)[1])
+                    month = int(month_directory.split('=', 1)[1])
+                    month_start = pd.Timestamp(year = year, month = month, day = 1, tz = 'UTC')
+                    if month_start + pd.DateOffset(months = 1) <= before: #whole month is older
+                        shutil.rmtree(self.__partition_directory(station, year, month))
+                    elif month_start < before: #month of the boundary -> keep the newer entries only
+                        self.__prune_partition(self.__partition_files(station, year, month), before)
+
+            archived = self.__ranges.get(station, None)
+            if archived is None:
+                return
+            if pd.Timestamp(archived['last']) < before:
+                del self.__ranges[station]
+            elif pd.Timestamp(archived['first']) < before:
+                archived['first'] = before.isoformat()
+            self.__save_ranges()
+
+    def read(self, station, columns, start_time, stop_time) -> pd.DataFrame:
+        """Reads the entries of a station in the range [start_time, stop_time]
+
+        Parameters:
+        station (string): station name
+        columns (list of string): fields to read (only these columns are loaded)
+        start_time (datetime): start of the range (utc if no timezone is set)
+        stop_time (datetime): end of the range (utc if no timezone is set)
+
+        Returns:
+        pd.DataFrame: measurements with the utc timestamp as index (like the database client), None if no entries found
+        """
+        start_time = to_utc(start_time)
+        stop_time = to_utc(stop_time)
+        columns = ['time'] + [column for column in columns if column in self.columns]
+        time_filter = [('time', '>=', start_time), ('time', '<=', stop_time)]
+
+        # only the months inside the range, the files in the order they were written (newer entries overwrite older ones)
+        tables = []
+        for month_start in pd.date_range(start_time.replace(day = 1).floor('D'), stop_time, freq = 'MS'):
+            for file_name in self.__partition_files(station, month_start.year, month_start.month):
+                tables.append(pq.read_table(file_name, columns = columns, filters = time_filter, memory_map = True))
+
+        tables = [table for table in tables if table.num_rows > 0]
+        if not tables:
+            return None
+
+        data = pa.concat_tables(tables).to_pandas().set_index('time')
+        if data.index.has_duplicates:
+            data = data[~data.index.duplicated(keep = 'last')]
+        data = data.sort_index()
+        data.index.name = None
+        return data
+
+    def __partition_directory(self, station, year, month):
+        return os.path.join(self.path, station, f'year={year}', f'month={month}')
+
+    def __partition_files(self, station, year, month):
+        # files of a month sorted by sequence (part.parquet of older versions first)
+        directory = self.__partition_directory(station, year, month)
+        if not os.path.isdir(directory):
+            return []
+        files = [file for file in os.listdir(directory) if file.startswith('part') and file.endswith('.parquet')]
+        return [os.path.join(directory, file) for file in sorted(files, key = self.__sequence)]
+
+    def __sequence(self, file):
+        name = file[:-len('.parquet')]
+        return int(name.split('-', 1)[1]) if '-' in name else 0
+
+    def __write_partition(self, station, year, month, data):
+        # new file per append, the existing files of the month aren't read or rewritten
+        directory = self.__partition_directory(station, year, month)
+        os.makedirs(directory, exist_ok = True)
+        self.__last_sequence = max(time.time_ns(), self.__last_sequence + 1) #unique and increasing (also after a restart)
+        self.__write_file(os.path.join(directory, f'part-{self.__last_sequence:020d}.parquet'), data.sort_index())
+
+        files = self.__partition_files(station, year, month)
+        if len(files) > self.compact_after:
+            self.__compact(files)
+
+    def __compact(self, files):
+        # merges the files of a month into the newest one: if the old files can't be removed, they are overwritten by it anyway
+        data = pa.concat_tables([pq.read_table(file_name) for file_name in files]).to_pandas().set_index('time')
+        data = data[~data.index.duplicated(keep = 'last')]
+        self.__write_file(files[-1], data.sort_index())
+        for file_name in files[:-1]:
+            os.remove(file_name)
+
+    def __prune_partition(self, files, before):
+        # merges the newer entries of a month into the newest file (like __compact)
+        data = pa.concat_tables([pq.read_table(file_name) for file_name in files]).to_pandas().set_index('time')
+        data = data[~data.index.duplicated(keep = 'last')]
+        data = data[data.index >= before]
+        if data.empty:
+            shutil.rmtree(os.path.dirname(files[-1]))
+            return
+        self.__write_file(files[-1], data.sort_index())
+        for file_name in files[:-1]:
+            os.remove(file_name)
+
+    def __write_file(self, file_name, data):
+        table = pa.Table.from_pandas(data.reset_index(), preserve_index = False)
+        pq.write_table(table, file_name + '.tmp')
+        os.replace(file_name + '.tmp', file_name) #never leave a half written file
+
+    def __extend_range(self, station, first, last):
+        archived = self.__ranges.get(station, None)
+        if archived is not None:
+            first = min(first, pd.Timestamp(archived['first']))
+            last = max(last, pd.Timestamp(archived['last']))
+        self.__ranges[station] = {'first': first.isoformat(), 'last': last.isoformat()}
+        self.__save_ranges()
+
+    def __save_ranges(self):
+        file_name = os.path.join(self.path, 'ranges.json')
+        with open(file_name + '.tmp', 'w') as file:
+            json.dump(self.__ranges, file, indent = 4)
+        os.replace(file_name + '.tmp', file_name)
+
+    def __load_ranges(self):
+        file_name = os.path.join(self.path, 'ranges.json')
+        if not os.path.isfile(file_name):
+            return {}
+        with open(file_name) as file:
+            return json.load(file)
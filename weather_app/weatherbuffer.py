@@ -0,0 +1,160 @@
+""" In-memory buffer of the recent measurements
+
+Keeps the measurements of the last days of every station in a ring buffer on a
+fixed 10-minute grid (one slot per 10 minutes). New data is added by the import,
+so the graphs of the last day / week can be generated without querying the
+database again.
+
+The buffer only answers ranges it holds completely: after a start it is filled
+once from the database (warm), older ranges are read from the database.
+"""
+
+import threading
+import numpy as np
+import pandas as pd
+from weatherarchive import to_utc
+
+
+SLOT_SECONDS = 600 #10 minutes
+
+
+class RecentBuffer:
+    def __init__(self, days, columns, enabled = True):
+        """
+        Parameters:
+        days (int): number of days kept per station
+        columns (list of string): fields stored in the buffer
+        enabled (bool): False disables the buffer
+        """
+        self.days = days
+        self.columns = list(columns)
+        self.enabled = enabled and days > 0
+        self.capacity = days * 24 * 3600 // SLOT_SECONDS #number of slots per station
+
+        self.__column_index = {column: i for i, column in enumerate(self.columns)}
+        self.__lock = threading.Lock()
+        self.__stations = {}
+
+    def append(self, station, data : pd.DataFrame):
+        """Adds (or updates) entries of a station, entries older than the buffered days are ignored
+
+        Parameters:
+        station (string): station name
+        data (pd.DataFrame): measurements with a utc timestamp index
+        """
+        if not self.enabled or data.empty:
+            return
+
+        ticks = data.index.asi8 // 10**9 // SLOT_SECONDS #slot number since epoch
+        values = data.reindex(columns = self.columns).to_numpy(dtype = np.float64)
+
+        with self.__lock:
+            buffer = self.__get_buffer(station)
+            buffer['newest'] = max(buffer['newest'], int(ticks.max()))
+            oldest = buffer['newest'] - self.capacity + 1
+            keep = ticks >= oldest
+            ticks, values = ticks[keep], values[keep]
+
+            slots = ticks % self.capacity
+            stored = buffer['ticks'][slots]
+            keep = stored <= ticks #never overwrite a newer entry with an older one
+            ticks, values, slots, stored = ticks[keep], values[keep], slots[keep], stored[keep]
+
+            same = stored == ticks #existing entry -> only update the given fields (like the database does)
+            values[same] = np.where(np.isnan(values[same]), buffer['values'][slots[same]], values[same])
+
+            buffer['values'][slots] = values
+            buffer['ticks'][slots] = ticks
+            if buffer['first'] is not None:
+                buffer['first'] = max(buffer['first'], oldest)
+
+    def warm(self, station, data : pd.DataFrame, start_time):
+        """Fills the buffer of a station with the entries of the database
+
+        Parameters:
+        station (string): station name
+        data (pd.DataFrame): all entries of the database since start_time (None if there are no entries)
+        start_time (datetime): start of the range of data -> the buffer answers all ranges starting at or after it
+        """
+        if not self.enabled:
+            return
+
+        if data is not None:
+            self.append(station, data)
+
+        with self.__lock:
+            buffer = self.__get_buffer(station)
+            first = -(-int(to_utc(start_time).value // 10**9) // SLOT_SECONDS) #first slot after start_time
+            buffer['first'] = max(first, buffer['newest'] - self.capacity + 1)
+
+    def covers(self, station, start_time):
+        """Returns True if all entries of a station since start_time are in the buffer"""
+        if not self.enabled:
+            return False
+
+        with self.__lock:
+            first = self.__stations.get(station, {}).get('first', None)
+        return first is not None and first * SLOT_SECONDS <= to_utc(start_time).value // 10**9
+
+    def read(self, station, columns, start_time, stop_time = None, include_start = True):
+        """Reads the entries of a station in the range [start_time, stop_time]
+
+        Parameters:
+        station (string): station name
+        columns (list of string): fields to read
+        start_time (datetime): start of the range (utc if no timezone is set)
+        stop_time (datetime -> default: None): end of the range (utc if no timezone is set), None: up to the newest entry
+        include_start (bool -> default: True): False excludes entries at start_time (like time > start_time)
+
+        Returns:
+        pd.DataFrame: measurements with the utc timestamp as index (like the database client, fields without values are left out), None if the range isn't buffered or no entries found
+        """
+        if not self.covers(station, start_time):
+            return None
+
+        start = to_utc(start_time).value // 10**9
+        with self.__lock:
+            buffer = self.__stations[station]
+            stop = to_utc(stop_time).value // 10**9 if stop_time is not None else buffer['newest'] * SLOT_SECONDS
+            ticks = np.arange(-(-start // SLOT_SECONDS), min(stop // SLOT_SECONDS, buffer['newest']) + 1)
+            if not include_start:
+                ticks = ticks[ticks * SLOT_SECONDS > start]
+
+            slots = ticks % self.capacity
+            found = buffer['ticks'][slots] == ticks
+            values = buffer['values'][slots[found]]
+
+        if not found.any():
+            return None
+
+        indices = [self.__column_index.get(column, None) for column in columns]
+        block = np.full((len(values), len(columns)), np.nan)
+        for i, index in enumerate(indices):
+            if index is not None:
+                block[:, i] = values[:, index]
+
+        # no empty fields (like the storage backends), no field with values -> no entries
+        filled = ~np.isnan(block).all(axis = 0)
+        if not filled.any():
+            return None
+
+        index = pd.to_datetime(ticks[found] * SLOT_SECONDS, unit = 's', utc = True)
+        return pd.DataFrame(block[:, filled], index = index, columns = [column for column, keep in zip(columns, filled) if keep])
+
+    def reset(self, station = None):
+        """Removes the entries of a station (all stations if None), e.g. after the database was dropped"""
+        with self.__lock:
+            if station is None:
+                self.__stations.clear()
+            else:
+                self.__stations.pop(station, None)
+
+    def __get_buffer(self, station):
+        if station not in self.__stations:
+            self.__stations[station] = {
+                'values': np.full((self.capacity, len(self.columns)), np.nan),
+                'ticks': np.full(self.capacity, -1, dtype = np.int64), #slot number since epoch of the entry in each slot, -1: empty
+                'newest': -1, #newest slot number
+                'first': None #first slot number of the range which is held completely, None: not warmed yet
+            }
+        return self.__stations[station]
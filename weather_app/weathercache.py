@@ -0,0 +1,137 @@
+""" Cache of query results
+
+Results of database queries are kept in memory for a limited time (ttl), so the
+same range isn't queried several times per render cycle. The least recently used
+results are removed when the cache exceeds its size (in bytes).
+
+Every station has a data version. It is increased when new data of the station
+is written (invalidate), so cached results of the station are never outdated.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
+
+
+class QueryCache:
+    def __init__(self, max_bytes, ttl, enabled = True):
+        """
+        Parameters:
+        max_bytes (int): maximum size of all cached results in bytes
+        ttl (float): seconds a result stays valid
+        enabled (bool): False disables the cache
+        """
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.enabled = enabled and max_bytes > 0
+
+        self.__lock = threading.Lock()
+        self.__entries = OrderedDict() #key -> (station, expiry, size, result), least recently used first
+        self.__versions = {} #station -> data version
+        self.__epoch = 0 #increased when the results of all stations are invalidated
+        self.__bytes = 0
+        self.__stats = {
+            'hits': 0,
+            'misses': 0,
+            'evictions': 0, #removed because the cache was full
+            'expirations': 0, #removed because the ttl passed
+            'invalidations': 0 #removed because new data was written
+        }
+
+    def version(self, station):
+        """Returns the data version of a station (part of the cache key)"""
+        with self.__lock:
+            return self.__version(station)
+
+    def get(self, station, key):
+        """Returns (True, copy of the result) if key is cached, (False, None) otherwise
+
+        Parameters:
+        station (string): station name
+        key (tuple): key of the query (normalized range and columns), without the data version
+        """
+        if not self.enabled:
+            return False, None
+
+        now = time.monotonic()
+        with self.__lock:
+            key = (station, self.__version(station)) + key
+            entry = self.__entries.get(key, None)
+            if entry is not None and entry[1] < now:
+                self.__remove(key)
+                self.__stats['expirations'] += 1
+                entry = None
+
+            if entry is None:
+                self.__stats['misses'] += 1
+                return False, None
+
+            self.__entries.move_to_end(key)
+            self.__stats['hits'] += 1
+            result = entry[3]
+
+        return True, result.copy() if result is not None else None #callers may change the result
+
+    def put(self, station, version, key, result : pd.DataFrame):
+        """Adds a result
+
+        Parameters:
+        station (string): station name
+        version (tuple): data version of the station when the query was sent (see version), outdated results are ignored
+        key (tuple): key of the query (normalized range and columns), without the data version
+        result (pd.DataFrame): result of the query (None if no entries found)
+        """
+        if not self.enabled:
+            return
+
+        size = int(result.memory_usage(deep = True).sum()) if result is not None else 0
+        if size > self.max_bytes:
+            return
+
+        with self.__lock:
+            if version != self.__version(station): #new data was written while querying
+                return
+
+            key = (station, version) + key
+            if key in self.__entries:
+                self.__remove(key)
+            self.__entries[key] = (station, time.monotonic() + self.ttl, size, result.copy() if result is not None else None)
+            self.__bytes += size
+
+            while self.__bytes > self.max_bytes:
+                self.__remove(next(iter(self.__entries)))
+                self.__stats['evictions'] += 1
+
+    def invalidate(self, station = None):
+        """Removes the results of a station (all stations if None), call after writing new data"""
+        with self.__lock:
+            if station is None:
+                self.__epoch += 1
+            else:
+                self.__versions[station] = self.__versions.get(station, 0) + 1
+
+            for key in [key for key, entry in self.__entries.items() if station is None or entry[0] == station]:
+                self.__remove(key)
+                self.__stats['invalidations'] += 1
+
+    def stats(self):
+        """Returns the counters of the cache
+
+        Returns:
+        dict: hits, misses, evictions, expirations, invalidations, entries, bytes, hit_ratio
+        """
+        with self.__lock:
+            stats = dict(self.__stats)
+            stats['entries'] = len(self.__entries)
+            stats['bytes'] = self.__bytes
+        requests = stats['hits'] + stats['misses']
+        stats['hit_ratio'] = stats['hits'] / requests if requests > 0 else 0.0
+        return stats
+
+    def __version(self, station):
+        return (self.__epoch, self.__versions.get(station, 0))
+
+    def __remove(self, key):
+        entry = self.__entries.pop(key)
+        self.__bytes -= entry[2]
@@ -11,9 +11,7 @@ Fabian Märki, Jelle Schutter, Lucas Brönnimann
 
 import logging
 import pandas as pd
-from pandas import json_normalize
 import numpy as np
-from influxdb import DataFrameClient
 import pandas
 import requests
 from requests.exceptions import ConnectionError
@@ -24,22 +22,102 @@ from datetime import datetime, timedelta
 import time
 import os
 import threading
+import multiprocessing
+import queue
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, Future
 from collections import deque
 from requests.models import HTTPError
 import calendar
-import main as update
+import weatherapi
+import weatherspool
+import weatherwatermarks
+import weatherarchive
+import weatherbuffer
+import weathercache
+import weatherstorage
+import weatherrollup
 import pytz
 import configparser
 config = configparser.ConfigParser()
 config.read(os.path.join(os.path.dirname(__file__), 'config.ini'))
 
+def load_station_registry(config):
+    """Reads all stations from the [Station:<name>] sections of the config
+
+    Parameters:
+    config (configparser.ConfigParser): parsed config.ini
+
+    Returns:
+    dict: station name -> {'label': display name, 'categories': list of graph categories, 'csv_file': path of historic data relative to the project root or None}
+    """
+    registry = {}
+    for section in config.sections():
+        if section.startswith('Station:'):
+            name = section.split(':', 1)[1].strip()
+            registry[name] = {
+                'label': config[section].get('Label', name),
+                'categories': [category.strip() for category in config[section].get('Categories', '').split(',') if category.strip()],
+                'csv_file': config[section].get('CSV_File', None)
+            }
+    return registry
+
+def load_render_profiles(config):
+    """Reads all render profiles from the [Profile:<name>] sections of the config
+
+    Parameters:
+    config (configparser.ConfigParser): parsed config.ini
+
+    Returns:
+    dict: profile name -> {'width': width of a graph in pixel, 'format': image format [png, webp, jpg], 'compress_level': png compression [0-9], 'quality': webp / jpg quality [1-100]}
+    """
+    profiles = {}
+    for section in config.sections():
+        if section.startswith('Profile:'):
+            name = section.split(':', 1)[1].strip()
+            profiles[name] = {
+                'width': config[section].getint('Width', 800),
+                'format': config[section].get('Format', 'png').lower(),
+                'compress_level': config[section].getint('PNG_Compression', 1),
+                'quality': config[section].getint('Quality', 80)
+            }
+    return profiles
+
+class _Lazy:
+    """Stateful member of Config (API session, spool, state files, archive, buffers), created on first access
+
+    Nothing is created on import, so processes which only import this module (render and csv parse
+    workers, tools, tests) don't open sessions or touch the state files. Once created, the object
+    replaces the descriptor on the class and is shared by all Config instances (an instance can still
+    assign its own object, e.g. in tests).
+    """
+    def __init__(self, create):
+        self.create = create #function(Config class) -> object
+        self.lock = threading.Lock()
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner):
+        with self.lock:
+            value = owner.__dict__[self.name]
+            if value is self: #not created yet
+                value = self.create(owner)
+                setattr(owner, self.name, value)
+        return value
+
 class Config:
     db_host = config['Database']['DB_Host'] #database host
     db_port = config['Database']['DB_Port'] #port from database
     db_name = config['Database']['DB_Name'] #database name
-    stations = ['mythenquai', 'tiefenbrunnen'] #table names
+    db_backend = config.get('Database', 'Backend', fallback = 'influx').lower() #storage backend [influx, sqlite]
+    db_read_format = config.get('Database', 'Read_Format', fallback = 'csv').lower() #format of query results of the influx backend [csv, json]
+    sqlite_file = os.path.join(os.path.dirname(__file__), config.get('Database', 'SQLite_File', fallback = 'state/weather.sqlite')) #database file of the sqlite backend
+    station_registry = load_station_registry(config) #stations from config.ini
+    stations = list(station_registry.keys()) #table names
+    default_station = config['Stations'].get('Default', stations[0]) #station shown on startup
     stations_force_query_last_entry = False
     stations_last_entries = {} #last entries in database
+    stations_first_entries = {} #time of the first entries in database
     keys_mapping = { 
         'timestamp': 'timestamp',
         'values.air_temperature.value': 'air_temperature',
@@ -56,8 +134,46 @@ class Config:
         'values.wind_speed_avg_10min.value': 'wind_speed_avg_10min',
         'values.windchill.value': 'windchill'
     }
-    historic_data_chunksize = 10000 #csv file of historic data is read in chunks -> this is the size
-    client = None #database client
+    columns = [column for key, column in keys_mapping.items() if key != 'timestamp'] #fields of the measurements
+    historic_data_chunksize = config.getint('Import', 'CSV_Chunksize', fallback = 10000) #csv file of historic data is read in chunks -> this is the size
+    historic_data_workers = config.getint('Import', 'CSV_Workers', fallback = os.cpu_count()) #number of processes parsing csv chunks
+    historic_data_queue_size = config.getint('Import', 'CSV_Queue_Size', fallback = 8) #max. number of parsed chunks waiting to be written
+    historic_data_batch_size = config.getint('Import', 'CSV_Batch_Size', fallback = 5000) #number of rows per write request (line protocol)
+    backfill_workers = config.getint('Import', 'Backfill_Workers', fallback = 4) #number of concurrent API requests while catching up missing days
+    gap_lookback_days = config.getint('Import', 'Gap_Lookback_Days', fallback = 30) #holes in the history of the last x days are repaired
+    watermark_file = os.path.join(os.path.dirname(__file__), config.get('Import', 'Watermark_File', fallback = 'state/watermarks.json')) #persisted last entries and import state
+    render_workers = config.getint('Render', 'Workers', fallback = os.cpu_count()) #number of processes rendering the graphs (at least 1, never rendered in the main process)
+    render_profiles = load_render_profiles(config) #render profiles from config.ini
+    render_profile = render_profiles[config.get('Render', 'Profile', fallback = 'kiosk')] #size and format of the graphs
+    query_chunk_size = config.getint('Database', 'Query_Chunk_Size', fallback = 10000) #max. number of entries per chunk of streamed queries
+    spool_batch_size = config.getint('Spool', 'Batch_Size', fallback = 5000) #number of rows per write request while replaying the spool
+    rollups_enabled = config.getboolean('Rollup', 'Enabled', fallback = True) #hourly and daily statistics are updated while importing (see weatherrollup)
+    raw_retention_years = config.getint('Retention', 'Raw_Years', fallback = 0) #raw entries older than x years are deleted (the rollups are kept), 0: keep forever
+    hourly_retention_years = config.getint('Retention', 'Hourly_Years', fallback = 0) #hourly rollups older than x years are deleted (the daily rollups are kept), 0: keep forever
+    storage = None #storage backend (see weatherstorage), created by connect_db
+
+    # stateful members, created on first access (see _Lazy)
+    watermarks = _Lazy(lambda cls: weatherwatermarks.WatermarkStore(cls.watermark_file)) #persisted last entries and import state
+    api = _Lazy(lambda cls: weatherapi.MeasurementsClient(config['Service']['URL'],
+        connect_timeout = config.getfloat('Service', 'Connect_Timeout', fallback = 5),
+        read_timeout = config.getfloat('Service', 'Read_Timeout', fallback = 30),
+        max_retries = config.getint('Service', 'Max_Retries', fallback = 5),
+        backoff_base = config.getfloat('Service', 'Backoff_Base', fallback = 1),
+        backoff_max = config.getfloat('Service', 'Backoff_Max', fallback = 60),
+        pool_size = max(cls.backfill_workers * len(cls.stations), 1))) #measurements API client (keep-alive session)
+    spool = _Lazy(lambda cls: weatherspool.Spool(os.path.join(os.path.dirname(__file__), config.get('Spool', 'Path', fallback = 'spool')),
+        retry_base = config.getfloat('Spool', 'Retry_Base', fallback = 5),
+        retry_max = config.getfloat('Spool', 'Retry_Max', fallback = 300))) #data which couldn't be written to the database
+    archive = _Lazy(lambda cls: weatherarchive.Archive(os.path.join(os.path.dirname(__file__), config.get('Archive', 'Path', fallback = 'archive')),
+        columns = cls.columns,
+        enabled = config.getboolean('Archive', 'Enabled', fallback = True),
+        compact_after = config.getint('Archive', 'Compact_After', fallback = 144))) #local columnar mirror of the database for historic reads
+    recent = _Lazy(lambda cls: weatherbuffer.RecentBuffer(config.getint('Cache', 'Recent_Days', fallback = 8),
+        columns = cls.columns,
+        enabled = config.getboolean('Cache', 'Recent_Enabled', fallback = True))) #last days of every station in memory
+    query_cache = _Lazy(lambda cls: weathercache.QueryCache(config.getint('Cache', 'Query_Max_MB', fallback = 64) * 1024 * 1024,
+        ttl = config.getfloat('Cache', 'Query_TTL', fallback = 600),
+        enabled = config.getboolean('Cache', 'Query_Enabled', fallback = True))) #results of recent queries
 
 def say_goodbye():
     logging.info('bye')
@@ -66,10 +182,9 @@ def __set_last_db_entry(config, station, entry):
     current_last_time = __extract_last_db_day(config.stations_last_entries.get(station, None), station, None) #get date of "stations_last_entries" from "station"
     entry_time = __extract_last_db_day(entry, station, None) #get last date of uploaded chunk
 
-    if current_last_time is None and entry_time is not None: #not written to "stations_last_entries" yet
-        config.stations_last_entries[station] = entry
-    elif current_last_time is not None and entry_time is not None and current_last_time < entry_time: #newer last time found
+    if entry_time is not None and (current_last_time is None or current_last_time < entry_time): #not written to "stations_last_entries" yet or newer last time found
         config.stations_last_entries[station] = entry
+        config.watermarks.set_last_entry(station, entry_time) #persist -> no query of the last entry after a restart
 
 def __get_last_db_entry(config, station):
     last_entry = None
@@ -77,20 +192,152 @@ def __get_last_db_entry(config, station):
         # speedup for Raspberry Pi - last entry query takes > 2 Sec.!
         last_entry = config.stations_last_entries.get(station, None) #get entry for "station"
 
+        if last_entry is None: #not queried since startup
+            last_entry = __get_persisted_last_db_entry(config, station)
+
     if last_entry is None: #if no entry found or force query last entry enabled
-        try:
-            # we are only interested in time, however need to provide any field to make query work
-            query = f'SELECT air_temperature FROM {station} ORDER BY time DESC LIMIT 1'
-            last_entry = config.client.query(query)
-        except:
-            # There are influxDB versions which have an issue with above query
-            logging.error('An exception occurred while querying last entry from DB for ' + station + '. Try alternative approach.')
-            query = f'SELECT * FROM {station} ORDER BY time DESC LIMIT 1'
-            last_entry = config.client.query(query)
+        last_entry = config.storage.last_entry(station)
 
     __set_last_db_entry(config, station, last_entry)
     return last_entry
 
+def __get_persisted_last_db_entry(config, station):
+    watermark = config.watermarks.get_last_entry(station)
+    if watermark is None:
+        return None
+
+    # validate the persisted last entry, only the newest data (after the watermark) has to be scanned
+    try:
+        last_entry = config.storage.last_entry(station, since = watermark)
+    except Exception as e:
+        logging.error(f'An exception occurred while validating the persisted last entry of {station} ({e}).')
+        return None
+
+    if __extract_last_db_day(last_entry, station, None) is None: #database doesn't contain the persisted last entry (e.g. database dropped)
+        logging.warning(f'Persisted last entry of {station} ({watermark}) not found in DB.')
+        config.watermarks.reset(station)
+        return None
+
+    return last_entry
+
+def __get_first_db_time(config, station):
+    # the first entry never changes (only by dropping the database) -> query it once
+    first_time = config.stations_first_entries.get(station, None)
+    if first_time is None:
+        first_time = config.storage.first_time(station)
+        if first_time is None: #database empty
+            return None
+        config.stations_first_entries[station] = first_time
+    return first_time
+
+def __get_first_time(config, station):
+    # oldest entry of all tiers (after the retention older entries are only in the daily rollups)
+    first_time = __get_first_db_time(config, station)
+    if len(__get_retention_tiers(config, station)) == 1: #all entries are raw
+        return first_time
+
+    table = weatherrollup.get_table(station, '1d')
+    first_day = config.stations_first_entries.get(table, None)
+    if first_day is None:
+        first_rollup = config.storage.read(table, [weatherrollup.get_column('air_temperature', 'mean')], pd.Timestamp(0, tz = 'UTC'), limit = 1)
+        if first_rollup is None:
+            return first_time
+        first_day = config.stations_first_entries[table] = first_rollup.index[0]
+    return min(first_day, first_time) if first_time is not None else first_day
+
+def __get_retention_tiers(config, station):
+    # (first time, resolution) of the tiers of a station, newest first: raw entries (resolution None), hourly and daily rollups
+    # the rollups are only read once they cover the whole range older than the raw retention (until then the raw entries are kept)
+    if not config.rollups_enabled or config.raw_retention_years <= 0:
+        return [(None, None)]
+
+    today = pd.Timestamp.now(tz = 'UTC').floor('1d')
+    raw_first = today - pd.DateOffset(years = config.raw_retention_years)
+    rollups_first = config.watermarks.get_rollups_first(station)
+    if rollups_first is None or rollups_first > raw_first: #not rolled up yet
+        return [(None, None)]
+
+    if config.hourly_retention_years <= 0:
+        return [(raw_first, None), (None, '1h')]
+    return [(raw_first, None), (today - pd.DateOffset(years = max(config.hourly_retention_years, config.raw_retention_years)), '1h'), (None, '1d')]
+
+def __split_tiers(config, station, start_time, stop_time):
+    # splits a range into the parts of each tier -> list of (start_time, stop_time, resolution), oldest first
+    start_time = weatherarchive.to_utc(start_time)
+    stop_time = weatherarchive.to_utc(stop_time) if stop_time is not None else None
+
+    parts = []
+    for tier_first, resolution in __get_retention_tiers(config, station):
+        if tier_first is not None and stop_time is not None and stop_time < tier_first: #range ends before this tier
+            continue
+        parts.insert(0, (max(start_time, tier_first) if tier_first is not None else start_time, stop_time, resolution))
+        if tier_first is None or start_time >= tier_first:
+            break
+        stop_time = tier_first - pd.Timedelta(seconds = 1)
+    return parts
+
+def __read_entries(config, requests):
+    # reads the ranges like storage.read_many (a single request), parts older than the raw retention are read from the rollups (mean per bucket)
+    reads = []
+    parts = [] #(index of the read, resolution) of every request
+    for station, fields, start_time, stop_time in requests:
+        parts.append([])
+        for part_start, part_stop, resolution in __split_tiers(config, station, start_time, stop_time):
+            if resolution is None:
+                reads.append((station, fields, part_start, part_stop))
+            else:
+                reads.append((weatherrollup.get_table(station, resolution), [weatherrollup.get_column(field, 'mean') for field in fields] if fields else None, part_start, part_stop))
+            parts[-1].append((len(reads) - 1, resolution))
+
+    answers = config.storage.read_many(reads)
+    results = []
+    for request_parts in parts:
+        tables = [__to_entries(answers[index], resolution) for index, resolution in request_parts]
+        tables = [table for table in tables if table is not None]
+        results.append(pd.concat(tables) if len(tables) > 1 else (tables[0] if tables else None))
+    return results
+
+def __to_entries(rollup, resolution):
+    # means of the rollups -> columns named like the fields (like the raw entries)
+    if rollup is None or resolution is None:
+        return rollup
+    suffix = '_mean'
+    rollup = rollup[[column for column in rollup.columns if column.endswith(suffix)]]
+    rollup.columns = [column[:-len(suffix)] for column in rollup.columns]
+    return rollup
+
+def apply_retention(config, stations = None):
+    """Deletes the raw entries (also in the archive) and hourly rollups older than the retention of config.ini ([Retention])
+
+    Raw entries are only deleted once the rollups cover them, the queries read older ranges from the rollups.
+
+    Parameters:
+    config (Config): The Config containing the DB connection info
+    stations (list of string -> default: None): stations to clean up (all stations of the config if None)
+    """
+    if config.raw_retention_years <= 0:
+        return
+    if not config.rollups_enabled:
+        logging.warning('Retention needs the rollups ([Rollup] Enabled), raw entries are kept')
+        return
+
+    for station in stations or config.stations:
+        tiers = __get_retention_tiers(config, station)
+        if len(tiers) == 1:
+            if __get_first_db_time(config, station) is None: #database empty
+                continue
+            logging.warning(f'Rollups of {station} are not synced yet, raw entries are kept')
+            continue
+
+        for tier_first, resolution in tiers[:-1]: #the oldest tier is kept forever
+            table = station if resolution is None else weatherrollup.get_table(station, resolution)
+            config.storage.delete(table, tier_first)
+            if resolution is None:
+                config.archive.prune(station, tier_first) #the archive mirrors the raw entries
+            config.query_cache.invalidate(table)
+            logging.info(f'Deleted entries of {table} before {tier_first}')
+        config.stations_first_entries.pop(station, None) #oldest raw entry changed
+
 def __extract_last_db_day(last_entry, station, default_last_db_day):
     if last_entry is not None: #last_entry contains data
         val = None
@@ -105,32 +352,9 @@ def __extract_last_db_day(last_entry, station, default_last_db_day):
 
     return default_last_db_day
 
-def __get_data_of_day(day, station, periodic_retry = False):
-    # convert to local time of station
-    base_url = config['Service']['URL']
-    day_str = day.strftime('%Y-%m-%d')
-    logging.info('Query ' + station + ' at ' + day_str)
-    payload = {
-        'startDate': day_str,
-        'endDate': day_str
-    }
-    url = f'{base_url}{station}'
-    while True:
-        try:
-            response = requests.get(url, params = payload)
-            if(response.ok):
-                jData = json.loads(response.content)
-                return jData
-            else:
-                response.raise_for_status()
-                raise ConnectionError(response.status_code)
-
-        except Exception as e:
-            if periodic_retry:
-                raise e
-
-            logging.warning(f'Request for \'{e.request.url}\' failed. ({e})\nTrying again in 10 seconds...')
-            time.sleep(10)
+def __get_data_of_day(config, day, station):
+    logging.info('Query ' + station + ' at ' + day.strftime('%Y-%m-%d'))
+    return config.api.get_data_of_day(day, station) #retried with backoff, raises if all retries failed
 
 def __define_types(data : pandas.DataFrame, date_format):
     '''Description:
@@ -156,59 +380,157 @@ def __define_types(data : pandas.DataFrame, date_format):
 
     return data
 
-def __clean_data(config, data_of_last_day, last_db_entry, station):
-    normalized = json_normalize(data_of_last_day['result'])
+def decode_measurements(config, result, last_db_time = None):
+    """Converts the result of the measurements API into a DataFrame in a single pass
+
+    Only the fields of config.keys_mapping are kept, missing values (represented as .) are set to 0
+    and all values are converted to float64 at once.
+
+    Parameters:
+    config (Config): The Config containing the keys mapping
+    result (list of dict): 'result' of the API response
+    last_db_time (datetime -> default: None): only entries newer than this time are kept
+
+    Returns:
+    pd.DataFrame: measurements with the utc timestamp as index
+    """
+    fields = [(key.split('.')[1], column) for key, column in config.keys_mapping.items() if key.startswith('values.')]
 
-    for column in normalized.columns[0:]:
-        mapping = config.keys_mapping.get(column, None)
-        if mapping is not None:
-            normalized[mapping] = normalized[column]
-        if mapping != column:
-            normalized.drop(columns = column, inplace = True)
+    # the API uses iso timestamps in utc -> entries can be filtered without parsing the timestamps
+    if last_db_time is not None:
+        last_db_time_str = last_db_time.astimezone(pytz.utc).strftime('%Y-%m-%dT%H:%M:%S')
+        result = [entry for entry in result if entry['timestamp'][:19] > last_db_time_str]
 
-    normalized = __define_types(normalized, '%Y-%m-%dT%H:%M:%S.%fZ')
+    rows = [[(entry['values'].get(field) or {}).get('value') for field, _ in fields] for entry in result]
+    block = np.array(rows, dtype = object).reshape(len(rows), len(fields))
+    block[block == '.'] = 0 #replace all the missing values (represented as .) with a 0
+    block = block.astype(np.float64) #None -> NaN
 
-    # remove all entries older than last element
-    if last_db_entry is not None: #if database isn't empty
-        last_db_entry_time = None
-        if isinstance(last_db_entry, pd.DataFrame):
-            last_db_entry_time = last_db_entry
-        elif isinstance(last_db_entry, dict):
-            last_db_entry_time = last_db_entry.get(station, None)
-        last_db_entry_time = last_db_entry_time.index[0]
-        normalized.drop(normalized[normalized.index <= last_db_entry_time].index, inplace = True)
+    index = pd.DatetimeIndex(pd.to_datetime([entry['timestamp'] for entry in result], format = '%Y-%m-%dT%H:%M:%S.%fZ', utc = True), name = 'timestamp')
+    data = pd.DataFrame(block, index = index, columns = [column for _, column in fields])
 
-    return normalized
+    return data.loc[:, data.notna().any(axis = 0)] #remove fields not delivered by the API
+
+def __clean_data(config, data_of_last_day, last_db_entry, station):
+    last_db_time = __extract_last_db_day(last_db_entry, station, None) #remove all entries older than last element
+    return decode_measurements(config, data_of_last_day['result'], last_db_time)
 
 def __add_data_to_db(config, data, station):
-    config.client.write_points(data, station, time_precision = 's', database = config.db_name) #write rows (params: data = DataFrame, station = name of measurement, time_precision = seconds, database = db_name)
+    written = False
+    try:
+        if not replay_spool(config): #older data is still waiting in the spool
+            raise ConnectionError('Database not available')
+        config.storage.write(station, data) #write rows (params: station = name of measurement, data = DataFrame)
+        written = True
+    except Exception as e:
+        logging.error(f'Writing {station} to DB failed ({e}). Data is spooled.')
+        config.spool.append(station, data) #don't lose the data, it is written when the database is reachable again
+        if config.spool.is_due():
+            config.spool.failed()
+
+    __add_data_to_archive(config, data, station)
+    config.recent.append(station, data) #recent graphs are generated from memory
+    config.query_cache.invalidate(station) #cached results of the station are outdated
+    if written: #spooled data is rolled up when it is replayed
+        __update_rollups(config, station, data)
     __set_last_db_entry(config, station, data.tail(1)) #get last value from data (newest entry) and store it
 
+def __update_rollups(config, station, data):
+    # recompute the buckets of the written entries from all raw entries of these buckets
+    if not config.rollups_enabled or data.empty:
+        return
+
+    try:
+        for resolution, length in weatherrollup.RESOLUTIONS.items():
+            first_bucket = weatherarchive.to_utc(data.index.min()).floor(length)
+            stop_time = weatherarchive.to_utc(data.index.max()).floor(length) + length - pd.Timedelta(seconds = 1)
+            raw = config.recent.read(station, config.columns, first_bucket, stop_time) #recent buckets -> memory
+            if raw is None:
+                raw = config.storage.read(station, None, first_bucket, stop_time)
+            if raw is not None:
+                __write_rollups(config, station, resolution, raw)
+    except Exception as e:
+        logging.error(f'Updating the rollups of {station} failed ({e}).')
+
+def __write_rollups(config, station, resolution, raw):
+    table = weatherrollup.get_table(station, resolution)
+    config.storage.write(table, weatherrollup.aggregate(raw, resolution))
+    config.query_cache.invalidate(table)
+
+def __add_data_to_archive(config, data, station):
+    try:
+        config.archive.append(station, data) #mirror to the local archive
+    except Exception as e:
+        logging.error(f'Writing {station} to the archive failed ({e}).')
+
+def replay_spool(config):
+    """Writes the data of the spool (data which couldn't be written before) to the database
+
+    Replay attempts back off exponentially while the database isn't available.
+
+    Parameters:
+    config (Config): The Config containing the DB connection info
+
+    Returns:
+    True: If the spool is empty (all data written)
+    False: Data is still waiting in the spool
+    """
+    if config.spool.is_empty():
+        return True
+    if not config.spool.is_due(): #wait until the backoff delay has passed
+        return False
+
+    try:
+        config.storage.ping() #health check
+        entries = config.spool.replay(lambda station, data: __write_spooled_data(config, station, data))
+    except Exception as e:
+        logging.warning(f'Replaying the spool failed ({e})')
+        config.spool.failed()
+        return False
+
+    config.spool.succeeded()
+    logging.info(f'Replayed {entries} spooled entries to DB')
+    return True
+
+def __write_spooled_data(config, station, data):
+    config.storage.write(station, data, batch_size = config.spool_batch_size)
+    config.query_cache.invalidate(station)
+    __update_rollups(config, station, data)
+
 def __signal_handler(sig, frame):
     sys.exit(0)
 
 
 def connect_db(config):
-    """Connects to the database and initializes the client
+    """Connects to the database and initializes the storage backend (Backend of config.ini)
 
     Parameters:
     config (Config): The Config containing the DB connection info
 
    """
-    if config.client is None: #if you havent already created a client
-        # https://www.influxdata.com/blog/getting-started-python-influxdb/
-        config.client = DataFrameClient(host = config.db_host, port = config.db_port) #connect to database
+    if config.storage is None: #if you havent already created a storage
+        if config.db_backend == 'sqlite':
+            config.storage = weatherstorage.SQLiteStorage(config.sqlite_file) #embedded database file
+        elif config.db_backend == 'influx':
+            # https://www.influxdata.com/blog/getting-started-python-influxdb/
+            config.storage = weatherstorage.InfluxStorage(config.db_host, config.db_port, config.db_name, config.db_read_format) #connect to database
+        else:
+            raise Exception(f'Unknown database backend {config.db_backend} (influx or sqlite)')
+
         # influxdb may not have finished startup yet
-        influx_is_running = False
-        while not influx_is_running:
+        db_is_running = False
+        retry_delay = config.spool.retry_base
+        while not db_is_running:
             try:
-                logging.info("InfluxDB is up and running. InfluxDB Version: " + str(config.client.ping()))
-                influx_is_running = True
+                logging.info(f"{config.db_backend} is up and running. Version: " + str(config.storage.ping()))
+                db_is_running = True
             except:
-                logging.warning("InfluxDB is not running")
+                logging.warning(f"{config.db_backend} is not running. Trying again in {retry_delay}s")
+                time.sleep(retry_delay) #back off instead of busy waiting
+                retry_delay = min(retry_delay * 2, config.spool.retry_max)
 
-        config.client.create_database(config.db_name) #create a new database
-        config.client.switch_database(config.db_name) #select created database
+        config.storage.create() #create a new database (if not existing)
+        apply_retention(config) #delete entries older than the retention
     logging.info("Successfully connected to DB")
 
 def clean_db(config):
@@ -218,9 +540,13 @@ def clean_db(config):
     config (Config): The Config containing the DB connection info
 
    """
-    config.client.drop_database(config.db_name) #drop the database
-    config.client.create_database(config.db_name) #create a new database
+    config.storage.drop() #drop the database and create it again
     config.stations_last_entries.clear() #clear the variable "stations_last_entries" in the config
+    config.stations_first_entries.clear()
+    config.watermarks.reset() #clear the persisted last entries and import state
+    config.archive.reset() #clear the archived entries (otherwise historic reads would still be answered by the archive)
+    config.recent.reset() #clear the buffered recent entries
+    config.query_cache.invalidate() #clear the cached results
 
 def try_import_csv_file(config, station, file_name):
     """Imports data from a .csv file
@@ -232,50 +558,254 @@ def try_import_csv_file(config, station, file_name):
 
     Returns:
     True: If csv already importet or csv successfully importet
-    False: CSV failed to import (csv file not found)
+    False: CSV failed to import (csv file not found, parse or write error -> logged)
     """
-    if __is_csv_imported(config, station):
-        logging.info(file_name + ' already imported.')
-        return True
+    return try_import_csv_files(config, {station: file_name})
+
+def try_import_csv_files(config, files):
+    """Imports data from multiple .csv files at once (bulk load)
+
+    Every station is loaded in its own thread. The chunks of all files are parsed
+    in a shared process pool while the already parsed chunks are written to the database.
+    If a binary snapshot of a csv file exists (see create_snapshot), the snapshot is loaded instead.
 
-    if os.path.isfile(file_name): #does the path point to a file?
-        logging.info('\tLoad ' + file_name)
-        for chunk in pd.read_csv(file_name, delimiter = ',', chunksize = config.historic_data_chunksize): #read the csv file in chunks
-            chunk = __define_types(chunk, '%Y-%m-%dT%H:%M:%S%z') #preprocess data
-            logging.info('Add ' + station + ' from ' + str(chunk.index[0]) + ' to ' + str(chunk.index[-1]))
-            __add_data_to_db(config, chunk, station) #add data to database
+    Parameters:
+    config (Config): The Config containing the DB connection info
+    files (dict): station name -> path to the file from which the data shall be imported
+
+    Returns:
+    True: If all csv files already importet or successfully importet
+    False: At least one csv file failed to import (neither csv file nor snapshot found, parse or write error -> logged)
+    """
+    pending = {}
+    for station, file_name in files.items():
+        if __is_csv_imported(config, station):
+            logging.info(file_name + ' already imported.')
+        elif os.path.isfile(file_name) or os.path.isfile(get_snapshot_file(file_name)): #does the path point to a file?
+            pending[station] = file_name
+        else:
+            logging.error(file_name + ' does not seem to exist.')
+            return False
 
+    if not pending: #nothing left to import
         return True
-    else:
-        logging.error(file_name + ' does not seem to exist.')
-        return False
 
+    errors = []
+    # spawn: the reader and writer threads (and the threads of main.py) may hold locks (e.g. logging) while a process would be forked
+    with ProcessPoolExecutor(max_workers = config.historic_data_workers, mp_context = multiprocessing.get_context('spawn')) as pool:
+        threads = [threading.Thread(target = __bulk_load_csv_file, args = (config, pool, station, file_name, errors)) for station, file_name in pending.items()]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    for error in errors:
+        logging.error('CSV import failed', exc_info = error)
+
+    return not errors
+
+def __bulk_load_csv_file(config, pool, station, file_name, errors):
+    # parsed chunks (futures) are passed in order to the writer -> the queue size limits the number of chunks in memory
+    parsed_chunks = queue.Queue(maxsize = config.historic_data_queue_size)
+    writer = threading.Thread(target = __write_parsed_chunks, args = (config, station, parsed_chunks, errors))
+    writer.start()
+    config.watermarks.set_csv_imported(station, False) #import is continued after an interruption
+
+    snapshot_file = get_snapshot_file(file_name)
+    try:
+        if os.path.isfile(snapshot_file): #pre-typed snapshot -> no parsing needed
+            logging.info('\tLoad ' + snapshot_file)
+            for chunk in __read_snapshot(snapshot_file, config.historic_data_chunksize):
+                if errors: #writer failed -> stop reading
+                    break
+                parsed_chunks.put(chunk)
+        else:
+            logging.info('\tLoad ' + file_name)
+            for chunk in pd.read_csv(file_name, delimiter = ',', chunksize = config.historic_data_chunksize): #read the csv file in chunks
+                if errors: #writer failed -> stop reading
+                    break
+                parsed_chunks.put(pool.submit(__define_types, chunk, '%Y-%m-%dT%H:%M:%S%z')) #preprocess data in a worker process
+    except Exception as e:
+        errors.append(e)
+    finally:
+        parsed_chunks.put(None) #tell the writer that all chunks are read
+        writer.join()
+
+    if not errors:
+        config.watermarks.set_csv_imported(station, True)
+
+def __write_parsed_chunks(config, station, parsed_chunks, errors):
+    start_time = time.time()
+    rows = 0
+    while True:
+        parsed_chunk = parsed_chunks.get()
+        if parsed_chunk is None: #all chunks read
+            break
+        if errors: #drain the queue after a failure, so the reader isn't blocked
+            if isinstance(parsed_chunk, Future):
+                parsed_chunk.cancel()
+            continue
+
+        try:
+            chunk = parsed_chunk.result() if isinstance(parsed_chunk, Future) else parsed_chunk #chunks of a snapshot are already typed
+            config.storage.write(station, chunk, batch_size = config.historic_data_batch_size) #write rows in batches
+            __add_data_to_archive(config, chunk, station)
+            config.query_cache.invalidate(station)
+            if config.watermarks.get_rollups_first(station) is not None: #otherwise the whole history is rolled up by sync_rollups
+                __update_rollups(config, station, chunk)
+            __set_last_db_entry(config, station, chunk.tail(1)) #get last value from chunk (newest entry) and store it
+        except Exception as e:
+            errors.append(e)
+            continue
+
+        rows += len(chunk.index)
+        rows_per_second = rows / max(time.time() - start_time, 1e-6)
+        logging.info('Add ' + station + ' from ' + str(chunk.index[0]) + ' to ' + str(chunk.index[-1]) + f' ({rows} rows, {rows_per_second:.0f} rows/s)')
+
+def get_snapshot_file(file_name):
+    """Returns the path of the binary snapshot of a csv file (same name with the extension .npz)"""
+    return os.path.splitext(file_name)[0] + '.npz'
+
+def create_snapshot(file_name, snapshot_file = None, chunksize = 100000, decimals = 3):
+    """Converts a csv file with historic data into a compact pre-typed binary snapshot
+
+    The snapshot contains the utc timestamps as int64 (epoch seconds) and all measurements as float32.
+    It is loaded by try_import_csv_files instead of parsing the csv file.
+
+    Parameters:
+    file_name (String): Path to the csv file
+    snapshot_file (String -> default: None): Path of the snapshot (see get_snapshot_file if None)
+    chunksize (int): number of rows parsed at once
+    decimals (int): decimals of the measurements (float32 values are rounded to this when loaded)
+
+    Returns:
+    String: Path of the snapshot
+    """
+    snapshot_file = snapshot_file or get_snapshot_file(file_name)
+    chunks = [__define_types(chunk, '%Y-%m-%dT%H:%M:%S%z') for chunk in pd.read_csv(file_name, delimiter = ',', chunksize = chunksize)]
+    data = pd.concat(chunks)
+
+    with open(snapshot_file + '.tmp', 'wb') as file:
+        np.savez(file,
+            time = data.index.asi8 // 10**9,
+            columns = np.array(data.columns, dtype = str),
+            values = data.to_numpy(dtype = np.float32),
+            decimals = np.array(decimals))
+    os.replace(snapshot_file + '.tmp', snapshot_file)
+    logging.info(f'Snapshot {snapshot_file} created ({len(data.index)} rows)')
+    return snapshot_file
+
+def __read_snapshot(snapshot_file, chunksize):
+    with np.load(snapshot_file) as snapshot:
+        times = snapshot['time']
+        columns = list(snapshot['columns'])
+        values = snapshot['values']
+        decimals = int(snapshot['decimals'])
+
+    for start in range(0, len(times), chunksize):
+        index = pd.to_datetime(times[start:start + chunksize], unit = 's', utc = True)
+        chunk_values = np.round(values[start:start + chunksize].astype(np.float64), decimals) #float32 -> original values
+        chunk = pd.DataFrame(chunk_values, index = index, columns = columns)
+        chunk.index.name = 'timestamp'
+        yield chunk
 
 def __is_csv_imported(config, station):
+    if config.watermarks.get_csv_imported(station) is False: #import was started but not finished
+        return False
+
     last_db_entry = __get_last_db_entry(config, station)
     last_db_day = __extract_last_db_day(last_db_entry, station, None)
-    return last_db_day != None and last_db_day > datetime(2007, 7, 31, tzinfo=pytz.utc)
+    if last_db_day is None: #database empty
+        return False
+
+    # import state is unknown for databases imported by older versions
+    return config.watermarks.get_csv_imported(station) or last_db_day > datetime(2007, 7, 31, tzinfo=pytz.utc)
+
+
+def __backfill(config, stations, last_db_days, current_day):
+    #collect all missing (day, station) pairs before the current day
+    missing_days = []
+    for idx, station in enumerate(stations):
+        day = last_db_days[idx].replace(hour = 0, minute = 0, second = 0, microsecond = 0)
+        while day < current_day:
+            missing_days.append((day, station))
+            day = day + pd.DateOffset(1) #add day
+
+    if not missing_days: #nothing to catch up
+        return False
+
+    logging.info('Backfill ' + str(len(missing_days)) + ' missing days with ' + str(config.backfill_workers) + ' workers')
+    missing_days.sort(key = lambda missing_day: missing_day[0]) #oldest day first -> data is written in order
+
+    new_data = False
+    failed_stations = set()
+    with ThreadPoolExecutor(max_workers = config.backfill_workers) as pool:
+        pending = deque() #requests in flight (bounded, so not all days are kept in memory)
+        for day, station in missing_days:
+            pending.append((day, station, pool.submit(__get_data_of_day, config, day, station)))
+            if len(pending) > 2 * config.backfill_workers:
+                new_data |= __write_backfilled_day(config, *pending.popleft(), failed_stations)
 
+        while pending:
+            new_data |= __write_backfilled_day(config, *pending.popleft(), failed_stations)
 
-def import_latest_data(config, periodic_read = False, callback = update.update_data):
+    stats = config.api.stats()
+    logging.info(f'Backfill finished. API requests: {stats["requests"]} (failed: {stats["failures"]}), mean latency: {stats["latency_mean"]:.2f}s, max latency: {stats["latency_max"]:.2f}s')
+    return new_data
+
+def __write_backfilled_day(config, day, station, request, failed_stations):
+    if station in failed_stations: #an older day is missing -> newer days would hide it, leave it to the live polling
+        request.cancel()
+        return False
+
+    try:
+        data_of_day = request.result()
+    except Exception as e:
+        logging.warning(f'Backfill of station {station} at {day.strftime("%Y-%m-%d")} failed ({e})... continue with live polling')
+        failed_stations.add(station)
+        return False
+
+    last_db_entry = __get_last_db_entry(config, station)
+    normalized_data = __clean_data(config, data_of_day, last_db_entry, station) #extract data, that is not stored yet
+
+    if normalized_data.size > 0: #if new data is available
+        __add_data_to_db(config, normalized_data, station) #add data to database
+        logging.info('Handle ' + station + ' from ' + str(normalized_data.index[0]) + ' to ' + str(normalized_data.index[-1]))
+        return True
+
+    return False
+
+def import_latest_data(config, periodic_read = False, callback = None, backfill = True, stations = None):
     """Reads the latest data from the Wasserschutzpolizei Zurich weather API
 
     Parameters:
     config (Config): The Config containing the DB connection info
     periodic_read (bool): Defines if the function should keep reading after it imported the latest data (blocking through a sleep)
-    callback (function): will be executed, when new data is uploaded to database
+    callback (function(list of string) -> default: None): will be executed with the updated stations, when new data is uploaded to database
+    backfill (bool): Fetch all missing days (e.g. after an outage) concurrently before the live polling starts
+    stations (list of string -> default: None): stations to import (all stations of the config if None)
 
    """
     # access API for current data
     current_time = datetime.now(pytz.utc)
     current_day = current_time.replace(hour = 0, minute = 0, second = 0, microsecond = 0)
-    last_db_days = [current_day] * len(config.stations)
+    stations = stations or config.stations
+    last_db_days = [current_day] * len(stations)
 
     #get last date (day) of last db entry
-    for idx, station in enumerate(config.stations):
+    for idx, station in enumerate(stations):
         last_db_entry = __get_last_db_entry(config, station)
         last_db_days[idx] = __extract_last_db_day(last_db_entry, station, last_db_days[idx])
 
+    #catch up missing days first, the live polling continues after the backlog is drained
+    if backfill and __backfill(config, stations, last_db_days, current_day):
+        for idx, station in enumerate(stations):
+            last_db_entry = __get_last_db_entry(config, station)
+            last_db_days[idx] = __extract_last_db_day(last_db_entry, station, last_db_days[idx])
+
+        if callback:
+            callback(stations)
+
     #set signal handler if periodic read available
     if periodic_read and threading.current_thread() is threading.main_thread():
         signal.signal(signal.SIGINT, __signal_handler)
@@ -306,17 +836,21 @@ def import_latest_data(config, periodic_read = False, callback = update.update_d
             last_cycle = True
 
 
-        for idx, station in enumerate(config.stations):
+        replay_spool(config) #write data of a previous DB outage
+
+        failed = False #True if the data of a station couldn't be fetched -> the day is fetched again
+        for idx, station in enumerate(stations):
             if last_db_days[idx].replace(hour = 0, minute = 0, second = 0, microsecond = 0) > check_db_day: #if newest data of station is already stored -> continue with other station
                 continue
             last_db_entry = __get_last_db_entry(config, station)
             last_db_days[idx] = __extract_last_db_day(last_db_entry, station, last_db_days[idx])
 
             try:
-                data_of_last_db_day = __get_data_of_day(check_db_day, station, periodic_read) #get data of station (whole day)
+                data_of_last_db_day = __get_data_of_day(config, check_db_day, station) #get data of station (whole day)
 
             except Exception as e:
                 logging.warning(f"Connection to station {station} failed... skipped!")
+                failed = True
                 continue
 
             normalized_data = __clean_data(config, data_of_last_db_day, last_db_entry, station) #extract data, that is not stored yet
@@ -327,12 +861,15 @@ def import_latest_data(config, periodic_read = False, callback = update.update_d
 
                 #do a callback if vailable
                 if callback:
-                    callback()
+                    callback([station])
 
             else:
                 logging.info('No new data received for ' + station)
 
-        if check_db_day < current_day: #new day arrived
+        if failed and check_db_day < current_day: #never skip a past day, the API client already retried with backoff -> wait and fetch the day again
+            logging.warning(f'Data of {check_db_day.strftime("%Y-%m-%d")} incomplete, trying again in {config.api.backoff_max:.0f}s')
+            time.sleep(config.api.backoff_max)
+        elif check_db_day < current_day: #new day arrived
             check_db_day = check_db_day + pd.DateOffset(1) #add day 
         elif periodic_read and check_db_day >= current_day: #if periodic read enabled and it is the same day
             check_db_day = datetime.now(pytz.utc) #update day (get current date)
@@ -340,6 +877,98 @@ def import_latest_data(config, periodic_read = False, callback = update.update_d
         if first_cycle:
             first_cycle = False
 
+def plan_gaps(config, station, start_time : datetime, stop_time : datetime) -> pd.DatetimeIndex:
+    """Builds an index of all missing 10-minute slots of a station
+
+    The number of entries per day is counted first, only days with holes are counted per 10-minute slot.
+
+    Parameters:
+    config (Config): The Config containing the DB connection info
+    station (string): station name
+    start_time (datetime): first slot to check
+    stop_time (datetime): last slot to check (usually the last entry in the database)
+
+    Returns:
+    pd.DatetimeIndex: utc timestamps of the missing slots
+    """
+    start_time = pd.Timestamp(start_time).tz_convert('UTC').ceil('10min')
+    stop_time = pd.Timestamp(stop_time).tz_convert('UTC').floor('10min')
+    missing_slots = [pd.DatetimeIndex([], tz = 'UTC')]
+
+    days = config.storage.count(station, 'air_temperature', start_time, stop_time, '1d') #number of entries per day
+    if days is None:
+        return missing_slots[0]
+
+    for day in days.index[days['count'] < 144]: #day with holes (or only partially in the range)
+        day_start = max(day, start_time)
+        day_stop = min(day + pd.Timedelta(days = 1) - pd.Timedelta(minutes = 10), stop_time)
+        slots = config.storage.count(station, 'air_temperature', day_start, day_stop, '10m') #number of entries per 10-minute slot
+        if slots is None: #whole day missing
+            missing_slots.append(pd.date_range(day_start, day_stop, freq = '10min'))
+        else:
+            missing_slots.append(slots.index[slots['count'] == 0])
+
+    return missing_slots[0].append(missing_slots[1:])
+
+def repair_gaps(config, stations = None, lookback_days = None, callback = None):
+    """Fills holes in the history (e.g. after an API outage)
+
+    Only the days containing missing 10-minute slots are fetched from the API and only the missing entries are written.
+
+    Parameters:
+    config (Config): The Config containing the DB connection info
+    stations (list of string -> default: None): stations to repair (all stations of the config if None)
+    lookback_days (int -> default: None): number of days to check (config.gap_lookback_days if None)
+    callback (function(list of string) -> default: None): will be executed with the repaired stations, when missing data is uploaded to database
+
+    Returns:
+    int: number of written entries
+    """
+    stations = stations or config.stations
+    start_time = datetime.now(pytz.utc) - timedelta(days = lookback_days or config.gap_lookback_days)
+    zurich = pytz.timezone('Europe/Zurich')
+
+    written_entries = 0
+    repaired_stations = []
+    for station in stations:
+        last_db_time = __extract_last_db_day(__get_last_db_entry(config, station), station, None)
+        if last_db_time is None or last_db_time <= start_time: #newer data is imported by import_latest_data
+            continue
+
+        missing_slots = plan_gaps(config, station, start_time, last_db_time)
+        if missing_slots.empty:
+            continue
+
+        # the API delivers local days
+        days = [datetime.strptime(day, '%Y-%m-%d') for day in missing_slots.tz_convert(zurich).strftime('%Y-%m-%d').unique()]
+        logging.info(f'{len(missing_slots)} entries of {station} missing in {len(days)} days')
+
+        filled_entries = 0
+        with ThreadPoolExecutor(max_workers = config.backfill_workers) as pool:
+            days_requested = [(day, pool.submit(__get_data_of_day, config, day, station)) for day in days]
+            for day, request in days_requested:
+                try:
+                    data_of_day = request.result()
+                except Exception as e:
+                    logging.warning(f'Repair of station {station} at {day.strftime("%Y-%m-%d")} failed ({e})')
+                    continue
+
+                data = decode_measurements(config, data_of_day['result'])
+                data = data[data.index.isin(missing_slots)] #write just the missing entries
+                if data.size > 0:
+                    __add_data_to_db(config, data, station)
+                    filled_entries += len(data.index)
+
+        logging.info(f'Filled {filled_entries} of {len(missing_slots)} missing entries of {station}')
+        if filled_entries > 0:
+            written_entries += filled_entries
+            repaired_stations.append(station)
+
+    if repaired_stations and callback:
+        callback(repaired_stations)
+
+    return written_entries
+
 def get_entries(config, station, start_time : str, stop_time : str = None) -> pd.DataFrame:
     """
     query all fields from station in a specific time range -> today to specific time in the past / specific time in the past to specific time in the past
@@ -350,15 +979,146 @@ def get_entries(config, station, start_time : str, stop_time : str = None) -> pd
     start_time (str / dateTime): start time of data as string [1d, 1m, 1w...] or dateTime -> only if stop_time != None
     stop_time (dateTime -> default: None): specifies end time 
     """
-    if not stop_time: #if stop_time not defined
-        query = f'SELECT * FROM {station} WHERE time > now() - {start_time}'
+    val = __read_recent(config, config.columns, station, start_time, stop_time) #recent range -> memory
+    if val is not None:
+        return val
+
+    val = __read_archive(config, config.columns, station, start_time, stop_time) #historic range -> local archive
+    if val is not None:
+        return val
+
+    return __query_range(config, None, station, start_time, stop_time)
+
+def __range_query(fields, station, start_time, stop_time):
+    # returns the read request of a range (station, fields, start_time, stop_time) and its cache key
+    # the range is normalized to the 10-minute grid of the measurements -> the same range has the same key within 10 minutes
+    if not stop_time and isinstance(start_time, str): #relative range (time > now() - start_time)
+        start_time = (pd.Timestamp.now(tz = 'UTC') - pd.Timedelta(start_time)).floor('10min') + timedelta(minutes = 10)
+    start_time = weatherarchive.to_utc(start_time)
+    stop_time = weatherarchive.to_utc(stop_time) if stop_time else None
+
+    return (station, fields, start_time, stop_time), (tuple(fields) if fields else None, start_time.isoformat(), stop_time.isoformat() if stop_time is not None else None)
+
+def __query_range(config, fields, station, start_time, stop_time):
+    request, key = __range_query(fields, station, start_time, stop_time)
+    cached, val = config.query_cache.get(station, key)
+    if cached:
+        return val
+
+    version = config.query_cache.version(station)
+    val = __read_entries(config, [request])[0] #pd.DataFrame, None if no entries found
+    config.query_cache.put(station, version, key, val)
+    return val
+
+def __read_recent(config, attributes, station, start_time, stop_time):
+    # only ranges completely contained in the buffer are read from it
+    if not stop_time: #relative range like the query: time > now() - start_time
+        try:
+            start_time = datetime.now(pytz.utc) - pd.Timedelta(start_time)
+        except ValueError:
+            return None
+        return config.recent.read(station, attributes, start_time, include_start = False)
 
-    else:
-        query = f'SELECT * FROM {station} WHERE time >= \'{start_time.strftime("%Y-%m-%dT%H:%M:%SZ")}\' AND time <= \'{stop_time.strftime("%Y-%m-%dT%H:%M:%SZ")}\''
+    return config.recent.read(station, attributes, start_time, stop_time)
 
-    answer = config.client.query(query) #query entries -> dictionary
-    val = answer.get(station, None) #get pd.dataframe from key "station", return "None" if key not found
-    return val
+def warm_recent(config, stations = None):
+    """Fills the in-memory buffer of the recent entries from the database
+
+    Parameters:
+    config (Config): The Config containing the DB connection info
+    stations (list of string -> default: None): stations to load, all if None
+    """
+    if not config.recent.enabled:
+        return
+
+    for station in stations or config.stations:
+        start_time = datetime.now(pytz.utc) - timedelta(days = config.recent.days)
+        try:
+            config.recent.warm(station, config.storage.read(station, None, start_time), start_time)
+        except Exception as e:
+            logging.error(f'Loading the recent entries of {station} failed ({e}). Query DB instead.')
+            continue
+        logging.info(f'Recent entries of {station} ({config.recent.days} days) loaded into memory')
+
+def stream_entries(config, attributes, station, start_time, stop_time = None, chunk_size: int = None):
+    """
+    query fields from station in a specific time range in time ordered chunks (generator) -> long ranges are never loaded at once
+
+    Historic ranges are read from the local archive in slices, all other ranges are queried page by page
+    (every page continues after the last entry of the previous page). Parts older than the raw retention are
+    read from the rollups.
+
+    Parameters:
+    config (Config): The Config containing the DB connection info
+    attributes (list of string): field names, None: all fields of the station
+    station (string): station name
+    start_time (str / dateTime): start time of data as string [1d, 1m, 1w...] or dateTime -> only if stop_time != None
+    stop_time (dateTime -> default: None): specifies end time 
+    chunk_size (int -> default: None): max. number of entries per chunk (Query_Chunk_Size of config.ini if None)
+
+    Yields:
+    pd.DataFrame: entries with the utc timestamp as index (same columns in every chunk)
+    """
+    chunk_size = chunk_size or config.query_chunk_size
+    if not stop_time: #relative range -> now - start_time to now
+        stop_time = pd.Timestamp.now(tz = 'UTC')
+        start_time = stop_time - pd.Timedelta(start_time)
+    start_time = weatherarchive.to_utc(start_time)
+    stop_time = weatherarchive.to_utc(stop_time)
+
+    if attributes is None:
+        attributes = get_field_keys(config, station)
+
+    if config.archive.covers(station, start_time, stop_time): #historic range -> local archive
+        span = pd.Timedelta(minutes = 10 * chunk_size) #10-minute grid -> max. chunk_size entries per slice
+        while start_time <= stop_time:
+            chunk = __read_archive(config, attributes, station, start_time, min(start_time + span - pd.Timedelta(seconds = 1), stop_time))
+            if chunk is not None:
+                yield chunk.reindex(columns = attributes)
+            start_time += span
+        return
+
+    for start_time, stop_time, resolution in __split_tiers(config, station, start_time, stop_time):
+        if resolution is not None: #older than the raw retention -> means of the rollups (few entries)
+            rollup = __read_entries(config, [(station, attributes, start_time, stop_time)])[0]
+            for i in range(0, len(rollup.index) if rollup is not None else 0, chunk_size):
+                yield rollup.iloc[i:i + chunk_size].reindex(columns = attributes)
+            continue
+
+        include_start = True
+        while True:
+            chunk = config.storage.read(station, attributes, start_time, stop_time, include_start = include_start, limit = chunk_size) #oldest chunk_size entries, None if no entries found
+            if chunk is None:
+                break
+
+            yield chunk.reindex(columns = attributes) #empty columns are dropped by the storage
+            if len(chunk.index) < chunk_size: #last page
+                break
+            start_time, include_start = chunk.index[-1], False #continue after the last entry
+
+def get_field_keys(config, station):
+    """
+    returns the names of all fields of a station in the database
+
+    Parameters:
+    config (Config): The Config containing the DB connection info
+    station (string): station name
+    """
+    return config.storage.field_keys(station)
+
+def __read_archive(config, attributes, station, start_time, stop_time):
+    # only ranges completely contained in the archive and in the raw tier are read from it (older ranges are read from the rollups)
+    if not stop_time or not config.archive.covers(station, start_time, stop_time):
+        return None
+    raw_first = __get_retention_tiers(config, station)[0][0]
+    if raw_first is not None and weatherarchive.to_utc(start_time) < raw_first:
+        return None
+
+    try:
+        return config.archive.read(station, attributes, start_time, stop_time)
+    except Exception as e:
+        logging.error(f'Reading {station} from the archive failed ({e}). Query DB instead.')
+        return None
 
 def get_attr_entries(config, attribute, station, start_time : str, stop_time : str = None) -> pd.DataFrame:
     """
@@ -371,15 +1131,12 @@ def get_attr_entries(config, attribute, station, start_time : str, stop_time : s
     start_time (str / dateTime): start time of data as string [1d, 1m, 1w...] or dateTime -> only if stop_time != None
     stop_time (dateTime -> default: None): specifies end time 
     """
-    if not stop_time: #if stop_time not defined
-        query = f'SELECT {attribute} FROM {station} WHERE time > now() - {start_time}'
+    val = __read_recent(config, [attribute], station, start_time, stop_time) #recent range -> memory
+    if val is None:
+        val = __read_archive(config, [attribute], station, start_time, stop_time) #historic range -> local archive
 
-    else:
-        query = f'SELECT {attribute} FROM {station} WHERE time >= \'{start_time.strftime("%Y-%m-%dT%H:%M:%SZ")}\' AND time <= \'{stop_time.strftime("%Y-%m-%dT%H:%M:%SZ")}\''
-
-    
-    answer = config.client.query(query) #query entries -> dictionary
-    val = answer.get(station, None) #get pd.dataframe from key "station", return "None" if key not found
+    if val is None:
+        val = __query_range(config, [attribute], station, start_time, stop_time)
 
     #add empty column if not existent
     if attribute not in val:
@@ -399,14 +1156,12 @@ def get_multible_attr_entries(config, attributes, station, start_time : str, sto
     stop_time (dateTime -> default: None): specifies end time 
     """
 
-    if not stop_time: #if stop_time not defined
-        query = f'SELECT {",".join(attributes)} FROM {station} WHERE time > now() - {start_time}'
+    val = __read_recent(config, attributes, station, start_time, stop_time) #recent range -> memory
+    if val is None:
+        val = __read_archive(config, attributes, station, start_time, stop_time) #historic range -> local archive
 
-    else:
-        query = f'SELECT {",".join(attributes)} FROM {station} WHERE time >= \'{start_time.strftime("%Y-%m-%dT%H:%M:%SZ")}\' AND time <= \'{stop_time.strftime("%Y-%m-%dT%H:%M:%SZ")}\''
-    
-    answer = config.client.query(query) #query entries -> dictionary
-    val = answer.get(station, None) #get pd.dataframe from key "station", return "None" if key not found
+    if val is None:
+        val = __query_range(config, attributes, station, start_time, stop_time)
 
     #add empty column if not existent
     for attribute in attributes:
@@ -415,30 +1170,60 @@ def get_multible_attr_entries(config, attributes, station, start_time : str, sto
 
     return val
 
-def get_multible_attr_entries_yearlyWindow(config, attributes, station, targetDate: datetime, timeArea_months: int = 2) -> pd.DataFrame:
+def get_multible_attr_entries_batch(config, requests) -> list:
     """
-    query specific fields from station in a specific time range every year (targetDate (month, day) +- x months)
+    query specific fields of multiple stations / time ranges at once
+
+    Ranges in memory, in the local archive or in the query cache are read locally, all other
+    ranges are queried in a single request (one statement per range) -> one round trip for all.
 
     Parameters:
     config (Config): The Config containing the DB connection info
-    attributes (list of string): field names
-    station (string): station name
-    targetDate (datetime): target date 
-    timeArea_months (int, default: 2): time window around targetTime
+    requests (list of tuple(list of string, string, str / dateTime, dateTime)): (attributes, station, start_time, stop_time) like get_multible_attr_entries
+
+    Returns:
+    list of pd.DataFrame: entries of every request in the order of requests (None if no entries found)
     """
+    results = [None] * len(requests)
+    pending = {} #cache key -> (read request, version, indices of the requests)
+    for i, (attributes, station, start_time, stop_time) in enumerate(requests):
+        val = __read_recent(config, attributes, station, start_time, stop_time) #recent range -> memory
+        if val is None:
+            val = __read_archive(config, attributes, station, start_time, stop_time) #historic range -> local archive
+
+        if val is None:
+            request, key = __range_query(attributes, station, start_time, stop_time)
+            cached, val = config.query_cache.get(station, key)
+            if not cached:
+                pending.setdefault((station,) + key, (request, key, config.query_cache.version(station), []))[3].append(i)
+                continue
+
+        results[i] = val
+
+    if pending:
+        answers = __read_entries(config, [request for request, key, version, indices in pending.values()]) #influx: one request (one statement per range)
+        for (request, key, version, indices), val in zip(pending.values(), answers):
+            config.query_cache.put(request[0], version, key, val)
+            for n, i in enumerate(indices):
+                results[i] = val if n == 0 or val is None else val.copy() #every request gets its own frame
+
+    #add empty column if not existent
+    for (attributes, station, start_time, stop_time), val in zip(requests, results):
+        for attribute in attributes:
+            if val is not None and attribute not in val:
+                val[attribute] = None
 
-    query = f'SELECT first(air_temperature) FROM {station}'
-    answer = config.client.query(query) #query entries -> dictionary
-    df_first = answer.get(station, None) #get pd.dataframe from key "station", return "None" if key not found
-    oldest_timestamp = str(df_first.index.values[0])
+    return results
 
-    query = f'SELECT last(air_temperature) FROM {station}'
-    answer = config.client.query(query) #query entries -> dictionary
-    df_first = answer.get(station, None) #get pd.dataframe from key "station", return "None" if key not found
-    newest_timestamp = str(df_first.index.values[0])
+def __get_yearly_windows(config, station, targetDate: datetime, timeArea_months: int):
+    # time ranges (targetDate (month, day) +- timeArea_months) of every year with data
+    oldest_timestamp = __get_first_time(config, station) #cached
+    newest_timestamp = __extract_last_db_day(__get_last_db_entry(config, station), station, None) #cached
+    if oldest_timestamp is None or newest_timestamp is None:
+        raise Exception(f"No measurements of {station} in Database")
 
-    oldest_date = datetime.strptime(oldest_timestamp.split("T")[0], '%Y-%m-%d')
-    newest_date = datetime.strptime(newest_timestamp.split("T")[0], '%Y-%m-%d')
+    oldest_date = datetime(oldest_timestamp.year, oldest_timestamp.month, oldest_timestamp.day)
+    newest_date = datetime(newest_timestamp.year, newest_timestamp.month, newest_timestamp.day)
 
     if oldest_date > newest_date:
         raise Exception("Oldest timestamp in Database is newer than newest timestamp???")
@@ -489,19 +1274,215 @@ def get_multible_attr_entries_yearlyWindow(config, attributes, station, targetDa
 
         if buffer > newest_date:
             break
-    
+
+    return dateTimeRange
+
+def get_multible_attr_entries_yearlyWindow(config, attributes, station, targetDate: datetime, timeArea_months: int = 2) -> pd.DataFrame:
+    """
+    query specific fields from station in a specific time range every year (targetDate (month, day) +- x months)
+
+    Parameters:
+    config (Config): The Config containing the DB connection info
+    attributes (list of string): field names
+    station (string): station name
+    targetDate (datetime): target date 
+    timeArea_months (int, default: 2): time window around targetTime
+
+    Returns:
+    pd.DataFrame: entries of all windows sorted by time (windows which aren't archived are queried in a single request)
+    """
+
+    dateTimeRange = __get_yearly_windows(config, station, targetDate, timeArea_months)
+
     tables = []
+    requests = []
     for range1, range2 in dateTimeRange:
-        query = f'SELECT {",".join(attributes)} FROM {station} WHERE time >= \'{range1.strftime("%Y-%m-%dT%H:%M:%SZ")}\' AND time <= \'{range2.strftime("%Y-%m-%dT%H:%M:%SZ")}\''
-        answer = config.client.query(query) #query entries -> dictionary
-        
-        #add empty column if not existent
-        for attribute in attributes:
-            if attribute not in answer:
-                answer[attribute] = None
+        archived = __read_archive(config, attributes, station, range1, range2) #historic range -> local archive
+        if archived is not None:
+            tables.append(archived)
+            continue
 
-        tables.append(answer.get(station, None)) #get pd.dataframe from key "station", return "None" if key not foundcand add to table
+        requests.append((station, attributes, range1, range2))
 
-    
-    return tables
+    # all windows in one request (influx: one statement per year) -> a single round trip
+    tables += __read_entries(config, requests) #pd.DataFrame per window, None if no entries found
+
+    tables = [table for table in tables if table is not None]
+    if not tables:
+        raise Exception(f"No measurements of {station} in the yearly windows")
+
+    table = pd.concat(tables).sort_index()
+    return table[~table.index.duplicated()] #windows of large time areas may overlap
+
+def stream_multible_attr_entries_yearlyWindow(config, attributes, station, targetDate: datetime, timeArea_months: int = 2, chunk_size: int = None):
+    """
+    query specific fields from station in a specific time range every year (targetDate (month, day) +- x months) in time ordered chunks (generator)
+
+    Parameters:
+    config (Config): The Config containing the DB connection info
+    attributes (list of string): field names
+    station (string): station name
+    targetDate (datetime): target date 
+    timeArea_months (int, default: 2): time window around targetTime
+    chunk_size (int -> default: None): max. number of entries per chunk (Query_Chunk_Size of config.ini if None)
+
+    Yields:
+    pd.DataFrame: entries with the utc timestamp as index, oldest window first
+    """
+    for range1, range2 in __get_yearly_windows(config, station, targetDate, timeArea_months):
+        yield from stream_entries(config, attributes, station, range1, range2, chunk_size)
+
+def get_rollup_entries(config, attributes, station, resolution, start_time, stop_time = None, statistics = 'mean') -> pd.DataFrame:
+    """
+    query hourly / daily statistics of specific fields from station in a specific time range
+
+    Parameters:
+    config (Config): The Config containing the DB connection info
+    attributes (list of string): field names
+    station (string): station name
+    resolution (string): length of the buckets [1h, 1d]
+    start_time (str / dateTime): start time of data as string [1d, 1m, 1w...] or dateTime -> only if stop_time != None
+    stop_time (dateTime -> default: None): specifies end time 
+    statistics (string or dict -> default: mean): statistic of all fields [min, mean, max, median] or field name -> statistic
+
+    Returns:
+    pd.DataFrame: one row per bucket (utc start of the bucket as index), columns named like the fields, None if no entries found
+    """
+    return get_rollup_entries_batch(config, [(attributes, station, start_time, stop_time, resolution, statistics)])[0]
+
+def get_rollup_entries_batch(config, requests) -> list:
+    """
+    query hourly / daily statistics of multiple stations / time ranges at once
 
+    Ranges covered by the rollups are read from the rollup tables, all other ranges (e.g. while the rollups
+    are synced) are aggregated from the raw entries. All ranges are read like get_multible_attr_entries_batch
+    (a single request).
+
+    Parameters:
+    config (Config): The Config containing the DB connection info
+    requests (list of tuple(list of string, string, str / dateTime, dateTime, string, string / dict)): (attributes, station, start_time, stop_time, resolution, statistics) like get_rollup_entries, resolution None: raw entries
+
+    Returns:
+    list of pd.DataFrame: entries of every request in the order of requests (None if no entries found)
+    """
+    reads = []
+    plans = [] #(resolution, statistics, read from the rollup table) of every request, None: raw entries
+    for attributes, station, start_time, stop_time, resolution, statistics in requests:
+        if resolution is None:
+            reads.append((attributes, station, start_time, stop_time))
+            plans.append(None)
+            continue
+
+        if resolution not in weatherrollup.RESOLUTIONS:
+            raise Exception(f"Unknown resolution: {resolution}")
+        if not isinstance(statistics, dict):
+            statistics = {attribute: statistics for attribute in attributes}
+
+        # whole buckets, the bucket of stop_time (e.g. the current hour) is included
+        length = weatherrollup.RESOLUTIONS[resolution]
+        if not stop_time: #relative range -> buckets of the entries after now - start_time (like the raw entries)
+            stop_time = pd.Timestamp.now(tz = 'UTC')
+            start_time = (stop_time - pd.Timedelta(start_time)).floor('10min') + timedelta(minutes = 10)
+        start_time = weatherarchive.to_utc(start_time).floor(length)
+        stop_time = weatherarchive.to_utc(stop_time).floor(length) + length - pd.Timedelta(seconds = 1)
+
+        rollups_first = config.watermarks.get_rollups_first(station) if config.rollups_enabled else None
+        stored = rollups_first is not None and rollups_first <= start_time
+        if stored:
+            reads.append(([weatherrollup.get_column(attribute, statistic) for attribute, statistic in statistics.items()], weatherrollup.get_table(station, resolution), start_time, stop_time))
+        else:
+            reads.append((attributes, station, start_time, stop_time))
+        plans.append((resolution, statistics, stored))
+
+    results = []
+    for plan, val in zip(plans, get_multible_attr_entries_batch(config, reads)):
+        if plan is not None and val is not None:
+            resolution, statistics, stored = plan
+            if not stored: #not rolled up yet -> aggregate the raw entries
+                val = weatherrollup.aggregate(val.astype(np.float64), resolution, list(dict.fromkeys(statistics.values())))
+            val = weatherrollup.select(val, statistics)
+        results.append(val)
+
+    return results
+
+def get_rollup_entries_yearlyWindow(config, attributes, station, resolution, targetDate: datetime, timeArea_months: int = 2, statistics = 'mean') -> pd.DataFrame:
+    """
+    query hourly / daily statistics of specific fields from station in a specific time range every year (targetDate (month, day) +- x months)
+
+    Parameters:
+    config (Config): The Config containing the DB connection info
+    attributes (list of string): field names
+    station (string): station name
+    resolution (string): length of the buckets [1h, 1d]
+    targetDate (datetime): target date 
+    timeArea_months (int, default: 2): time window around targetTime
+    statistics (string or dict -> default: mean): statistic of all fields [min, mean, max, median] or field name -> statistic
+
+    Returns:
+    pd.DataFrame: buckets of all windows sorted by time (only whole buckets, the end of a window is excluded)
+    """
+    requests = [(attributes, station, range1, range2 - timedelta(seconds = 1), resolution, statistics) for range1, range2 in __get_yearly_windows(config, station, targetDate, timeArea_months)]
+    tables = [table for table in get_rollup_entries_batch(config, requests) if table is not None]
+    if not tables:
+        raise Exception(f"No measurements of {station} in the yearly windows")
+
+    table = pd.concat(tables).sort_index()
+    return table[~table.index.duplicated()] #windows of large time areas may overlap
+
+def sync_rollups(config, stations = None):
+    """Rolls up the data of the database which is not yet rolled up (e.g. after the csv import or on an existing installation)
+
+    Parameters:
+    config (Config): The Config containing the DB connection info
+    stations (list of string -> default: None): stations to sync (all stations of the config if None)
+    """
+    if not config.rollups_enabled:
+        return
+
+    for station in stations or config.stations:
+        oldest_time = __get_first_db_time(config, station)
+        if oldest_time is None: #database empty
+            continue
+
+        rollups_first = config.watermarks.get_rollups_first(station)
+        newest_time = rollups_first if rollups_first is not None else datetime.now(pytz.utc) #newer data is rolled up while importing
+        if oldest_time >= newest_time:
+            continue
+
+        logging.info(f'Roll up {station} from {oldest_time} to {newest_time}')
+        months = pd.date_range(oldest_time.replace(day = 1, hour = 0, minute = 0, second = 0, microsecond = 0), newest_time, freq = 'MS')
+        for month_start in reversed(months[months < newest_time]): #newest month first -> the rolled up range stays contiguous
+            month_stop = min(month_start + pd.DateOffset(months = 1), newest_time)
+            data = config.storage.read(station, None, month_start, month_stop, include_stop = False)
+            if data is not None:
+                for resolution in weatherrollup.RESOLUTIONS:
+                    __write_rollups(config, station, resolution, data)
+            config.watermarks.set_rollups_first(station, month_start)
+
+def sync_archive(config, stations = None):
+    """Copies the data of the database which is not yet in the local archive (e.g. archive enabled on an existing installation)
+
+    Parameters:
+    config (Config): The Config containing the DB connection info
+    stations (list of string -> default: None): stations to sync (all stations of the config if None)
+    """
+    if not config.archive.enabled:
+        return
+
+    for station in stations or config.stations:
+        oldest_time = __get_first_db_time(config, station)
+        if oldest_time is None: #database empty
+            continue
+
+        archived = config.archive.get_range(station)
+        newest_time = archived[0] if archived is not None else datetime.now(pytz.utc) #archive contains everything after its first entry
+        if oldest_time >= newest_time:
+            continue
+
+        logging.info(f'Copy {station} from {oldest_time} to {newest_time} to the archive')
+        months = pd.date_range(oldest_time.replace(day = 1, hour = 0, minute = 0, second = 0, microsecond = 0), newest_time, freq = 'MS')
+        for month_start in reversed(months): #newest month first -> the archived range stays contiguous while copying
+            month_stop = min(month_start + pd.DateOffset(months = 1), newest_time)
+            data = config.storage.read(station, None, month_start, month_stop, include_stop = False)
+            if data is not None:
+                config.archive.append(station, data)
@@ -7,6 +7,8 @@ from pandas.core.frame import DataFrame
 import schedule
 import numpy as np
 import weatherdata as wd
+import weatherrender
+import weatherstatistics
 import matplotlib.pyplot as plt
 import matplotlib.dates as mdates
 import pandas as pd
@@ -15,9 +17,13 @@ import locale
 from pathlib import Path
 from windrose import WindroseAxes
 import shutil
+from PIL import Image
 import pytz
 import matplotlib
 from matplotlib import dates as mpl_dates
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+import threading
 
 
 class Measurement(enum.Enum):
@@ -36,42 +42,104 @@ class Measurement(enum.Enum):
   Radiation = "global_radiation"
 
 
-config = wd.Config()
+config = None #wd.Config, loaded by setup() (not on import, the render processes and tools import this module too)
 systemInitialized = False #True if database successfully initialized 
+render_engine = None #renders the graphs in a process pool, created by setup()
 
-def init():
+def setup():
   """
-  connect to db, import historic data if not imported, import latest data (no periodic read)
+  loads the config.ini and creates the render engine, has to be called before the other functions (done by init())
+
+  returns:
+  wd.Config: the loaded config
   """
-  global systemInitialized
+  global config, render_engine
+
+  if config is None:
+    config = wd.Config()
+    render_engine = weatherrender.RenderEngine(config.render_workers)
+  return config
 
+def init_plotting():
+  """
+  locale and timezone of the plots (main process and render processes)
+  """
   try:
     locale.setlocale(locale.LC_ALL, 'de_DE') # formats dates on plots correct
   except:
     pass # ignore
   matplotlib.rcParams['timezone'] = 'Europe/Zurich'
 
+def init():
+  """
+  connect to db, import historic data if not imported, import latest data (no periodic read)
+  """
+  global systemInitialized
+
+  setup()
+  init_plotting()
+
   wd.connect_db(config)
 
   root = str(Path(os.path.dirname(os.path.realpath(__file__))).parent)
   
-  if (wd.try_import_csv_file(config, 'mythenquai',    root + "/Messwerte/messwerte_mythenquai_2007-2020.csv") and
-      wd.try_import_csv_file(config, 'tiefenbrunnen', root + "/Messwerte/messwerte_tiefenbrunnen_2007-2020.csv")):
+  csv_files = {station: root + "/" + settings["csv_file"] for station, settings in config.station_registry.items() if settings["csv_file"]}
+
+  if wd.try_import_csv_files(config, csv_files):
     wd.import_latest_data(config, periodic_read=False)
+    wd.warm_recent(config) # graphs of the last days are generated from memory
     logging.info("Database successfully initialized.")
     systemInitialized = True
     return systemInitialized
   else:
-    raise Exception("Couldn't find csv files to import")
+    raise Exception("Couldn't import the csv files (see log)")
   
 
 
-def read_data_continuesly():
+def read_data_continuesly(callback = None):
+  """
+  start importing with periodic read (every station is imported by its own worker, so a slow station doesn't delay the others)
+
+  Parameters:
+  callback (function(list of string) -> default: None): executed with the updated stations, when new data is imported
+  """
+
+  workers = [threading.Thread(target = wd.import_latest_data, kwargs = {"config": config, "periodic_read": True, "callback": callback, "stations": [station]}, name = f"import-{station}") for station in config.stations]
+  for worker in workers:
+    worker.start()
+  for worker in workers:
+    worker.join()
+
+def repair_gaps(callback = None):
+  """
+  fill holes in the history of all stations (only the missing 10-minute slots are fetched and written)
+
+  Parameters:
+  callback (function(list of string) -> default: None): executed with the repaired stations
+  """
+
+  wd.repair_gaps(config, callback = callback)
+
+def sync_archive():
   """
-  start importing with periodic read
+  copy the data of the database which is not yet in the local archive
   """
 
-  wd.import_latest_data(config, periodic_read=True)
+  wd.sync_archive(config)
+
+def sync_rollups():
+  """
+  roll up the data of the database which is not yet rolled up (hourly and daily statistics)
+  """
+
+  wd.sync_rollups(config)
+
+def apply_retention():
+  """
+  delete the raw entries and hourly rollups older than the retention of config.ini
+  """
+
+  wd.apply_retention(config)
 
 #functional
 def _get_fmt(axis): #from https://stackoverflow.com/questions/49106889/get-the-date-format-on-a-matplotlib-plots-x-axis
@@ -84,6 +152,77 @@ def _get_fmt(axis): #from https://stackoverflow.com/questions/49106889/get-the-d
     return fmt
 
 #get entries
+def _split_time_range(time_range):
+  # returns (start_time, stop_time) of a time range as string or tuple
+  if type(time_range) is tuple:
+    return time_range
+  elif type(time_range) is str:
+    return time_range, None
+  else:
+    raise Exception("time_range has to be a string or a tuple")
+
+def _query_measurements(fields, station : str, time_range, resolution = None, aggregation = "mean"):
+  # fields: list of field names, None -> all fields
+  start_time, stop_time = _split_time_range(time_range)
+
+  if resolution is not None:
+    return wd.get_rollup_entries(config, fields, station, resolution, start_time, stop_time, _get_statistics(aggregation))
+  if fields is None:
+    return wd.get_entries(config, station, start_time, stop_time)
+  return wd.get_multible_attr_entries(config, fields, station, start_time, stop_time)
+
+def _get_statistics(aggregation):
+  # aggregation: statistic of all measurements or dict Measurement -> statistic
+  if isinstance(aggregation, dict):
+    return {measurement.value: statistic for measurement, statistic in aggregation.items()}
+  return aggregation
+
+def align_to_grid(df : DataFrame, start = None, freq = "10min"):
+  """
+  align entries to the 10 minute grid of the measurements, missing measurements are filled with NaN (like resample("10min").asfreq())
+
+  Parameters:
+  df (DataFrame): entries with a timezone aware index (None: no entries)
+  start (Timestamp -> default: None): first slot of the grid (e.g. continues the grid of a previous chunk), None: first entry
+  freq (string -> default: 10min): interval of the grid (resolution of the entries)
+
+  returns:
+  DataFrame: aligned entries (df itself if it is None, empty or already complete)
+  """
+  if df is None or df.empty:
+    return df
+
+  if not df.index.is_monotonic_increasing:
+    df = df.sort_index()
+  if df.index.has_duplicates:
+    df = df[~df.index.duplicated()]
+
+  grid = pd.date_range(df.index[0].floor(freq) if start is None else start, df.index[-1].floor(freq), freq = freq)
+  if len(grid) == len(df.index) and (grid.asi8 == df.index.asi8).all(): #already complete -> no copy
+    return df
+  return df.reindex(grid)
+
+def normalize_measurements(df : DataFrame, timeFilling = True, keepIndex = False, resolution = None):
+  """
+  shared normalization of queried entries: align to the 10 minute grid, convert the time to Europe/Zurich (vectorized) and set it as column "time"
+
+  Parameters:
+  df (DataFrame): entries with an utc index (as returned by weatherdata)
+  timeFilling (bool -> default: True): fill up missing measurements with NaN
+  keepIndex (Boolean, default: False): keep the time as index instead of the column "time"
+  resolution (string -> default: None): grid of rolled up entries [1h, 1d], None: 10 minutes
+  """
+  if timeFilling:
+    df = align_to_grid(df, freq = resolution or "10min")
+
+  df.index = df.index.tz_convert("Europe/Zurich")
+
+  if not keepIndex:
+    df["time"] = df.index
+    df.index = pd.RangeIndex(len(df.index)) #like reset_index(drop = True) without copying the data
+
+  return df
+
 def get_all_measurements(station : str, time_range, timeFilling = True):
   """
   get all entries in a specific time range 
@@ -94,28 +233,12 @@ def get_all_measurements(station : str, time_range, timeFilling = True):
   timeFilling (bool -> default: True): fill up missing measurements with NaN
   """
 
-  if type(time_range) is tuple:
-    df = wd.get_entries(config, station, start_time = time_range[0], stop_time = time_range[1])
-
-  elif type(time_range) is str:
-    df = wd.get_entries(config, station, time_range)
-
-  else:
-    raise Exception("time_range has to be a string or a tuple")
+  df = _query_measurements(None, station, time_range)
 
   if df is None:
     raise Exception("Measurements not available for this day!")
 
-  if timeFilling:
-    df = df.resample("10min").asfreq()#resample (zeitlücken mit NaN füllen)
-
-  zurich = pytz.timezone('Europe/Zurich')
-  df.index = df.index.map(lambda date: date.astimezone(zurich))
-
-  df["time"] = df.index
-  df = df.reset_index(drop = True)
-
-  return df
+  return normalize_measurements(df, timeFilling)
 
 def get_measurement(measurment : Measurement, station : str, time_range, timeFilling = True):
   """
@@ -128,57 +251,102 @@ def get_measurement(measurment : Measurement, station : str, time_range, timeFil
   timeFilling (bool -> default: True): fill up missing measurements with NaN
   """
 
-  if type(time_range) is tuple:
-    df = wd.get_attr_entries(config, str(measurment.value), station, start_time = time_range[0], stop_time = time_range[1])
+  return get_measurements([measurment], station, time_range, timeFilling)
 
-  elif type(time_range) is str:
-    df = wd.get_attr_entries(config, str(measurment.value), station, time_range)
+def get_measurements(measurements : list(Measurement), station : str, time_range, timeFilling = True, keepIndex = False, resolution = None, aggregation = "mean"):
+  """
+  get a specific entries in a specific time range 
 
-  else:
-    raise Exception("time_range has to be a string or a tuple")
+  Parameters:
+  measurements (list(Measurement)): select measurements from Measurement [list(Measurement.air_temp, ...)]
+  station (string): station name
+  time_range (string or tuple of dateTime): timerange as string -> now to specific time in the past [1d, 2w, 5m...], timerage as tuple -> specific time in the pas to specific time in the past [tuple(dateTime, dateTime)]
+  timeFilling (bool -> default: True): fill up missing measurements with NaN
+  refactorIndex (Boolean, default: True): set index as column "time" and resets if true
+  resolution (string -> default: None): hourly or daily statistics from the rollups [1h, 1d], None: raw 10 minute measurements
+  aggregation (string or dict -> default: mean): statistic of the rollups [min, mean, max, median] for all measurements or dict(Measurement -> statistic)
+  """
 
-  if timeFilling:
-    df = df.resample("10min").asfreq()#resample (zeitlücken mit NaN füllen)
+  df = _query_measurements([measurement.value for measurement in measurements], station, time_range, resolution, aggregation)
 
-  zurich = pytz.timezone('Europe/Zurich')
-  df.index = df.index.map(lambda date: date.astimezone(zurich))
+  return normalize_measurements(df, timeFilling, keepIndex, resolution)
 
-  df["time"] = df.index
-  df = df.reset_index(drop = True)
+def stream_measurements(measurements : list(Measurement), station : str, time_range, timeFilling = True, chunk_size = None):
+  """
+  get specific entries in a specific time range in time ordered chunks (generator), every chunk is normalized like get_measurements -> long ranges are never loaded at once
 
-  return df
+  Parameters:
+  measurements (list(Measurement)): select measurements from Measurement [list(Measurement.air_temp, ...)], None: all measurements
+  station (string): station name
+  time_range (string or tuple of dateTime): timerange as string -> now to specific time in the past [1d, 2w, 5m...], timerage as tuple -> specific time in the pas to specific time in the past [tuple(dateTime, dateTime)]
+  timeFilling (bool -> default: True): fill up missing measurements with NaN (also between chunks)
+  chunk_size (int -> default: None): max. number of entries per chunk (Query_Chunk_Size of config.ini if None)
+  """
+
+  start_time, stop_time = _split_time_range(time_range)
+  fields = [measurement.value for measurement in measurements] if measurements is not None else None
+
+  next_slot = None
+  for df in wd.stream_entries(config, fields, station, start_time, stop_time, chunk_size):
+    if timeFilling:
+      df = align_to_grid(df, next_slot)
+      next_slot = df.index[-1] + pd.Timedelta("10min")
+
+    yield normalize_measurements(df, timeFilling = False)
 
-def get_measurements(measurements : list(Measurement), station : str, time_range, timeFilling = True, keepIndex = False):
+def get_measurements_batch(requests : list, timeFilling = True, keepIndex = False):
   """
-  get a specific entries in a specific time range 
+  get specific entries of multiple stations / time ranges at once (all ranges which aren't in memory or archived are queried in a single request)
+
+  Parameters:
+  requests (list(tuple(string, list(Measurement), string or tuple of dateTime[, string, string or dict]))): (station, measurements, time_range[, resolution, aggregation]) like get_measurements
+  timeFilling (bool -> default: True): fill up missing measurements with NaN
+  keepIndex (Boolean, default: False): keep the time as index instead of the column "time"
+
+  returns:
+  list(DataFrame): entries of every request in the order of requests (None if no entries found)
+  """
+
+  frames = _query_measurements_batch(requests)
+  return [normalize_measurements(df, timeFilling, keepIndex, request[3] if len(request) > 3 else None) if df is not None else None for request, df in zip(requests, frames)]
+
+def _query_measurements_batch(requests : list):
+  # requests: list of (station, measurements, time_range[, resolution, aggregation]) -> list of DataFrame (utc index, not normalized)
+  batch = []
+  for station, measurements, time_range, *rollup in requests:
+    resolution, aggregation = rollup if rollup else (None, "mean")
+    batch.append(([measurement.value for measurement in measurements], station) + tuple(_split_time_range(time_range)) + (resolution, _get_statistics(aggregation)))
+  return wd.get_rollup_entries_batch(config, batch)
+
+def get_measurement_arrays(measurements : list(Measurement), station : str, time_range, timeFilling = True):
+  """
+  get specific entries in a specific time range as numpy arrays (for plotting)
 
   Parameters:
   measurements (list(Measurement)): select measurements from Measurement [list(Measurement.air_temp, ...)]
   station (string): station name
   time_range (string or tuple of dateTime): timerange as string -> now to specific time in the past [1d, 2w, 5m...], timerage as tuple -> specific time in the pas to specific time in the past [tuple(dateTime, dateTime)]
   timeFilling (bool -> default: True): fill up missing measurements with NaN
-  refactorIndex (Boolean, default: True): set index as column "time" and resets if true
-  """
 
-  if type(time_range) is tuple:
-    df = wd.get_multible_attr_entries(config, [measurement.value for measurement in measurements], station, start_time = time_range[0], stop_time = time_range[1])
+  returns:
+  tuple(numpy array, dict): timestamps (datetime64 in utc, matplotlib shows them in Europe/Zurich) and the values of each measurement (float64, missing -> NaN)
+  """
 
-  elif type(time_range) is str:
-    df = wd.get_multible_attr_entries(config, [measurement.value for measurement in measurements], station, time_range)
-  else:
-    raise Exception("time_range has to be a string or a tuple")
-  
-  if timeFilling:
-    df = df.resample("10min").asfreq()#resample (zeitlücken mit NaN füllen)
+  df = _query_measurements([measurement.value for measurement in measurements], station, time_range)
+  return _to_arrays(df, measurements, timeFilling)
 
-  zurich = pytz.timezone('Europe/Zurich')
-  df.index = df.index.map(lambda date: date.astimezone(zurich))
+def _to_arrays(df : DataFrame, measurements : list(Measurement), timeFilling = True, freq = "10min"):
+  # DataFrame (utc index) -> timestamps and values of each measurement as numpy arrays
+  # no entries (None) -> empty arrays, measurements without values (column dropped by the query) -> NaN
+  if df is None:
+    return np.array([], dtype = "datetime64[ns]"), {measurement: np.array([], dtype = np.float64) for measurement in measurements}
 
-  if not keepIndex:
-    df["time"] = df.index
-    df = df.reset_index(drop = True)
+  if timeFilling:
+    df = align_to_grid(df, freq = freq)
 
-  return df
+  timestamps = df.index.tz_convert(None).to_numpy() #view of the index, no copy
+  values = {measurement: df[measurement.value].to_numpy(dtype = np.float64) if measurement.value in df.columns else np.full(len(timestamps), np.nan) for measurement in measurements} #no copy for float columns
+  return timestamps, values
 
 # generate plots 
 
@@ -197,55 +365,131 @@ wind_measurements = [Measurement.Wind_speed_avg_10min,
                      Measurement.Wind_gust_max_10min,
                      Measurement.Wind_force_avg_10min,
                      Measurement.Wind_direction] # currently not plotted, since plotting is not that easy and therefore out of scope
+wind_history_aggregation = {Measurement.Wind_speed_avg_10min: "mean", # statistics of the hourly rollups in the wind history graph
+                            Measurement.Wind_gust_max_10min : "max",
+                            Measurement.Wind_force_avg_10min: "median",
+                            Measurement.Wind_direction      : "median"}
 
 def get_graph_location():
   return str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images/graphs"
 
+def get_graph_path(station, category, type, profile = None):
+  # path of a graph, the extension is the format of the render profile
+  return f"{get_graph_location()}/{station}_{category}_{type}.{(profile or config.render_profile)['format']}"
+
+graph_categories = ["wind", "temperature", "watertemp", "dewpoint", "waterlevel", "pressure"]
+graph_types = ["today", "tomorrow", "history"]
+
+# simple plots: category -> (measurement, unit_symbols, ylim)
+simple_graphs = {
+  "temperature": (Measurement.Air_temp,    ["Temperatur", "T", "°C"],       None),
+  "dewpoint":    (Measurement.Dew_point,   ["Taupunkt", "T", "°C"],         None),
+  "waterlevel":  (Measurement.Water_level, ["Wasserstand", "", "m.ü.m"],    None),
+  "watertemp":   (Measurement.Water_temp,  ["Wassertemperatur", "T", "°C"], None),
+  "pressure":    (Measurement.Pressure,    ["Luftdruck", "P", "Pa"],        (900, 1000))
+}
+
 def reset_graphs():
   # replace possible old graphs with a message
   static_images = str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images"
-  for station in ["tiefenbrunnen", "mythenquai"]:
-      for category in ["wind", "temperature", "watertemp", "dewpoint", "waterlevel", "pressure"]:
-          for type in ["today", "tomorrow", "history"]:
-              shutil.copyfile(static_images+"/generating_plot.png", f"{get_graph_location()}/{station}_{category}_{type}.png")
-
-def generate_wind_graph(station, type, time_range = None):
+  placeholder = Image.open(static_images+"/generating_plot.png").convert("RGB") if config.render_profile["format"] != "png" else None
+  for station in config.stations:
+      for category in graph_categories:
+          for type in graph_types:
+              if placeholder is None:
+                shutil.copyfile(static_images+"/generating_plot.png", get_graph_path(station, category, type))
+              else:
+                placeholder.save(get_graph_path(station, category, type)) #same format as the graphs
+  render_engine.reset() #the placeholders have to be replaced by all graphs
+
+_figure_templates = {} #key (e.g. station_category_type) -> figure template of this process, see _get_figure_template
+
+def _get_figure_template(key, layout, build):
+  # returns the cached figure template of key if its layout (everything except the data) is unchanged, otherwise a new one
+  # template: dict with the figure, its artists and the layout, the data is replaced with set_data
+  template = _figure_templates.get(key) if key is not None else None
+  if template is None or template["layout"] != layout:
+    template = build()
+    template["layout"] = layout
+    template["yticks"] = None
+    if key is not None:
+      _figure_templates[key] = template
+  return template
+
+def _update_figure_layout(template, axes):
+  # tight_layout only for a new figure or if the ticks of the y axes changed (width of the tick labels)
+  yticks = [tuple(ax.get_yticks()) for ax in axes]
+  if template["yticks"] != yticks:
+    template["fig"].tight_layout()
+    template["yticks"] = yticks
+
+def _autoscale(ax, scaley = True, margin_to = None):
+  # rescale the axes to the data of its lines after set_data, scaley: False keeps fixed y limits, margin_to: (bottom, top) that must be on the y axis
+  if scaley:
+    ax.set_autoscaley_on(True)
+  ax.relim()
+  ax.autoscale_view()
+  if margin_to is not None:
+    bottom, top = ax.get_ylim()
+    ax.set_ylim(bottom if bottom < margin_to[0] else margin_to[0], top if top > margin_to[1] else margin_to[1])
+
+def generate_wind_graph(station, type, time_range = None, data = None):
   if type != "history" and type != "today" and type != "tomorrow":
     raise Exception(f"Unknown type: {type}")
   
-  if type == "tomorrow":
-    wind = get_measurements(wind_measurements, station, time_range)
-  else:
-    wind = get_measurements(wind_measurements, station, "7d" if type == "history" else "1d")
+  if data is None:
+    if type == "tomorrow":
+      data = _query_measurements([measurement.value for measurement in wind_measurements], station, time_range)
+    elif type == "history":
+      # hourly statistics (rollups)
+      data = _query_measurements([measurement.value for measurement in wind_measurements], station, "7d", "1h", wind_history_aggregation)
+    else:
+      data = _query_measurements([measurement.value for measurement in wind_measurements], station, "1d")
+
+  timestamps, values = _to_arrays(data, wind_measurements, freq = "1h" if type == "history" else "10min")
+  plot_wind_graph(station, type, timestamps, values)
+
+def plot_wind_graph(station, type, timestamps, values, profile = None, imagepath = None, template = None):
+  """
+  render the wind graph (render job, see weatherrender)
 
-  if type == "history":
-    # aggregate window every 1 hour
-    wind = wind.resample('H', on='time').agg(
-      { Measurement.Wind_speed_avg_10min.value:'mean',
-        Measurement.Wind_gust_max_10min .value:'max',
-        Measurement.Wind_force_avg_10min.value:'median',
-        Measurement.Wind_direction      .value:'median'})
+  Parameters:
+  station (string): station name
+  type (string): today, tomorrow or history
+  timestamps (numpy array): timestamps (datetime64 in utc)
+  values (dict): Measurement -> numpy array of the wind measurements (same length as timestamps)
+  profile (dict -> default: None): render profile (size and format), None: Profile of config.ini
+  imagepath (string -> default: None): path of the image, None: graph location
+  template (string -> default: None): key of the figure template to reuse (e.g. station_wind_type), None: new figure
+  """
+  profile = profile or config.render_profile
+  graph = _get_figure_template(template, (type,), lambda: _build_wind_graph(type, timestamps, values))
+
+  graph["speed"].set_data(timestamps, values[Measurement.Wind_speed_avg_10min])
+  graph["gust"].set_data(timestamps, values[Measurement.Wind_gust_max_10min])
+  graph["force"].set_data(timestamps, values[Measurement.Wind_force_avg_10min])
+  # expand the limits to make sure y=0, y=10 / y=7 are on the axis
+  _autoscale(graph["ax1"], margin_to = (0, 10))
+  _autoscale(graph["ax2"], margin_to = (0, 7))
+  _update_figure_layout(graph, [graph["ax1"], graph["ax2"]])
 
-    wind["time"] = wind.index
-    wind = wind.reset_index(drop = True)
+  weatherrender.save_figure(graph["fig"], imagepath or get_graph_path(station, "wind", type, profile), profile, bbox_inches='tight')
 
-  fig, ax1 = plt.subplots(figsize=(12,5))
+def _build_wind_graph(type, timestamps, values):
+  # figure template of the wind graph (see plot_wind_graph)
+  fig = Figure(figsize=(12,5))
+  FigureCanvasAgg(fig)
+  ax1 = fig.subplots()
 
   # first y-Axis
-  ax1.plot(wind['time'], wind[Measurement.Wind_speed_avg_10min.value], color=colors["blue"])
-  ax1.plot(wind['time'], wind[Measurement.Wind_gust_max_10min .value], color=colors["turquoise"])
-  # expand the limits to make sure y=0, y=10 are on the axis
-  bottom, top = ax1.get_ylim()
-  ax1.set_ylim(bottom if bottom < 0 else 0, top if top > 10 else 10)
+  speed, = ax1.plot(timestamps, values[Measurement.Wind_speed_avg_10min], color=colors["blue"])
+  gust, = ax1.plot(timestamps, values[Measurement.Wind_gust_max_10min ], color=colors["turquoise"])
   ax1.set_ylabel('m/s')
   ax1.legend(["Durchschnittliche Windgeschwindigkeit", "Maximale Geschwindigkeit Windböen"], loc="upper left")
 
   # second y-Axis
   ax2 = ax1.twinx()
-  ax2.plot(wind['time'], wind[Measurement.Wind_force_avg_10min.value], color=colors["yellow"], alpha=0.75)
-  # expand the limits to make sure y=0, y=7 are on the axis
-  bottom, top = ax2.get_ylim()
-  ax2.set_ylim(bottom if bottom < 0 else 0, top if top > 7 else 7)
+  force, = ax2.plot(timestamps, values[Measurement.Wind_force_avg_10min], color=colors["yellow"], alpha=0.75)
   ax2.set_ylabel('Beaufortskala')
   ax2.legend(["Windstärke"], loc="upper right")
 
@@ -259,389 +503,150 @@ def generate_wind_graph(station, type, time_range = None):
   for label in ax1.get_xticklabels(which='major'):
       label.set(rotation=30, horizontalalignment='right')
 
-  fig.tight_layout()
-  fig.savefig(get_graph_location() + f"/{station}_wind_{type}.png", bbox_inches='tight')
-  plt.close(fig)
+  return {"fig": fig, "ax1": ax1, "ax2": ax2, "speed": speed, "gust": gust, "force": force}
 
 
-def generate_today_graphs():
-  logging.info("#generate_today_graphs()")
-  # wind
-  generate_wind_graph("tiefenbrunnen", "today")
-  generate_wind_graph("mythenquai", "today")
-  ############################################# todays graphs #############################################
-
-  ## get data
-  mythenquai_df = get_measurements([Measurement.Air_temp, 
-                                                      Measurement.Humidity,
-                                                      Measurement.Water_temp,
-                                                      Measurement.Water_level,
-                                                      Measurement.Dew_point,
-                                                      Measurement.Pressure],
-                                    station = "mythenquai",
-                                    time_range = "1d")
-
-  tiefenbrunnen_df = get_measurements([Measurement.Air_temp, 
-                                                      Measurement.Humidity,
-                                                      Measurement.Water_temp,
-                                                      Measurement.Water_level,
-                                                      Measurement.Dew_point,
-                                                      Measurement.Pressure],
-                                        station = "tiefenbrunnen",
-                                        time_range = "1d")
-
-  ## convert to arrays
-  timestamps_mythenquai = np.array(mythenquai_df["time"].fillna(value = 0))
-  temperatur_mythenquai = np.array(mythenquai_df["air_temperature"].fillna(value = 0))
-  dewpoint_mythenquai = np.array(mythenquai_df["dew_point"].fillna(value = 0))
-
-  timestamps_tiefenbrunnen = np.array(tiefenbrunnen_df["time"].fillna(value = 0))
-  temperatur_tiefenbrunnen = np.array(tiefenbrunnen_df["air_temperature"].fillna(value = 0))
-  dewpoint_tiefenbrunnen = np.array(tiefenbrunnen_df["dew_point"].fillna(value = 0))
-  watertemp_tiefenbrunnen = np.array(tiefenbrunnen_df["water_temperature"].fillna(value = 0))
-  waterlevel_tiefenbrunnen = np.array(tiefenbrunnen_df["water_level"].fillna(value = 0))
-  pressure_tiefenbrunnen = np.array(tiefenbrunnen_df["barometric_pressure_qfe"].fillna(value = 0))
-
-  ## plots mythenquai (No watertemperature, waterlevel and pressure, because no data)
-  generate_simple_plot(station = "mythenquai",
-                                      measurements_array = temperatur_mythenquai,
-                                      timestamps = timestamps_mythenquai,
-                                      unit_symbols = ["Temperatur", "T", "°C"],
-                                      imagepath = str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images/graphs/mythenquai_temperature_today.png",
-                                      dateformatter = "%d %b %H:%M",
-                                      showMin = True,
-                                      showMean = True,
-                                      showMax = True
-                                      )
-
-  generate_simple_plot(station = "mythenquai",
-                                      measurements_array = dewpoint_mythenquai,
-                                      timestamps = timestamps_mythenquai,
-                                      unit_symbols = ["Taupunkt", "T", "°C"],
-                                      imagepath = str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images/graphs/mythenquai_dewpoint_today.png",
-                                      dateformatter = "%d %b %H:%M",
-                                      showMin = True,
-                                      showMean = True,
-                                      showMax = True
-                                      )
-
-  ## plots tiefenbrunnen
-
-  generate_simple_plot(station = "tiefenbrunnen",
-                                      measurements_array = temperatur_tiefenbrunnen,
-                                      timestamps = timestamps_tiefenbrunnen,
-                                      unit_symbols = ["Temperatur", "T", "°C"],
-                                      imagepath = str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images/graphs/tiefenbrunnen_temperature_today.png",
-                                      dateformatter = "%d %b %H:%M",
-                                      showMin = True,
-                                      showMean = True,
-                                      showMax = True
-                                      )
-
-  generate_simple_plot(station = "tiefenbrunnen",
-                                      measurements_array = dewpoint_tiefenbrunnen,
-                                      timestamps = timestamps_tiefenbrunnen,
-                                      unit_symbols = ["Taupunkt", "T", "°C"],
-                                      imagepath = str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images/graphs/tiefenbrunnen_dewpoint_today.png",
-                                      dateformatter = "%d %b %H:%M",
-                                      showMin = True,
-                                      showMean = True,
-                                      showMax = True
-                                      )
-
-  generate_simple_plot(station = "tiefenbrunnen",
-                                      measurements_array = waterlevel_tiefenbrunnen,
-                                      timestamps = timestamps_tiefenbrunnen,
-                                      unit_symbols = ["Wasserstand", "", "m.ü.m"],
-                                      imagepath = str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images/graphs/tiefenbrunnen_waterlevel_today.png",
-                                      dateformatter = "%d %b %H:%M",
-                                      showMin = True,
-                                      showMean = True,
-                                      showMax = True
-                                      )
-
-  generate_simple_plot(station = "tiefenbrunnen",
-                                      measurements_array = watertemp_tiefenbrunnen,
-                                      timestamps = timestamps_tiefenbrunnen,
-                                      unit_symbols = ["Wassertemperatur", "T", "°C"],
-                                      imagepath = str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images/graphs/tiefenbrunnen_watertemp_today.png",
-                                      dateformatter = "%d %b %H:%M",
-                                      showMin = True,
-                                      showMean = True,
-                                      showMax = True
-                                      )
-
-  generate_simple_plot(station = "tiefenbrunnen",
-                                      measurements_array = pressure_tiefenbrunnen,
-                                      timestamps = timestamps_tiefenbrunnen,
-                                      unit_symbols = ["Luftdruck", "P", "Pa"],
-                                      imagepath = str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images/graphs/tiefenbrunnen_pressure_today.png",
-                                      ylim = (900, 1000),
-                                      dateformatter = "%d %b %H:%M",
-                                      showMin = True,
-                                      showMean = True,
-                                      showMax = True
-                                      )
+def _graph_measurements(station):
+  # measurements of the graphs of a station: "wind" -> wind graph, "simple" -> simple plots of all categories
+  categories = config.station_registry[station]["categories"]
+  measurements = {}
+  if "wind" in categories:
+    measurements["wind"] = wind_measurements
+  simple_measurements = [simple_graphs[category][0] for category in categories if category in simple_graphs]
+  if simple_measurements:
+    measurements["simple"] = simple_measurements
+  return measurements
+
+def fetch_station_graphs(stations, time_range, type = None):
+  """
+  fetch the data of the graphs of multiple stations at once (a render cycle waits for a single request instead of one request per graph)
+
+  Parameters:
+  stations (list(string)): station names
+  time_range (string or tuple of dateTime): timerange of the plotted data
+  type (string -> default: None): history -> hourly statistics for the wind graph
+
+  returns:
+  dict: station -> {"wind": DataFrame, "simple": DataFrame} (utc index, not normalized)
+  """
+  requests = [(station, name, measurements) for station in stations for name, measurements in _graph_measurements(station).items()]
+  frames = _query_measurements_batch([(station, measurements, time_range, "1h", wind_history_aggregation) if name == "wind" and type == "history" else (station, measurements, time_range) for station, name, measurements in requests])
+
+  data = {station: {} for station in stations}
+  for (station, name, measurements), df in zip(requests, frames):
+    data[station][name] = df
+  return data
+
+def station_graph_jobs(station, type, time_range, dateformatter, data = None):
+  """
+  render jobs of the wind graph and the simple plots of all categories of a station (see [Station:<name>] in config.ini)
 
+  Parameters:
+  station (string): station name
+  type (string): today, tomorrow or history
+  time_range (string or tuple of dateTime): timerange of the plotted data
+  dateformatter (string): formatter for timestamps
+  data (dict -> default: None): data of the station from fetch_station_graphs, None: fetch it
+
+  returns:
+  list(tuple(string, function, dict)): render jobs with the fetched arrays (see weatherrender.RenderEngine.render)
+  """
+  if data is None:
+    data = fetch_station_graphs([station], time_range, type)[station]
+
+  # a graph without entries (e.g. the station didn't deliver data in the time range) isn't rendered, the last image stays
+  for name in [name for name, df in data.items() if df is None or df.empty]:
+    logging.warning(f"No {name} data of {station} for the {type} graphs in {time_range}")
+  data = {name: df for name, df in data.items() if df is not None and not df.empty}
+
+  jobs = []
+  if "wind" in data:
+    timestamps, values = _to_arrays(data["wind"], wind_measurements, freq = "1h" if type == "history" else "10min")
+    jobs.append((f"{station}_wind_{type}", plot_wind_graph, {"station": station, "type": type, "timestamps": timestamps, "values": values, "profile": config.render_profile, "template": f"{station}_wind_{type}"}))
+
+  categories = [category for category in config.station_registry[station]["categories"] if category in simple_graphs]
+  if not categories or "simple" not in data:
+    return jobs
+
+  ## get data as arrays
+  timestamps, values = _to_arrays(data["simple"], [simple_graphs[category][0] for category in categories])
+
+  ## plots
+  for category in categories:
+    measurement, unit_symbols, ylim = simple_graphs[category]
+    jobs.append((f"{station}_{category}_{type}", generate_simple_plot, {
+                   "station": station,
+                   "measurements_array": values[measurement], #missing -> NaN (gap in the line, ignored by the statistics)
+                   "timestamps": timestamps,
+                   "unit_symbols": unit_symbols,
+                   "imagepath": get_graph_path(station, category, type),
+                   "ylim": ylim,
+                   "dateformatter": dateformatter,
+                   "showMin": True,
+                   "showMean": True,
+                   "showMax": True,
+                   "profile": config.render_profile,
+                   "template": f"{station}_{category}_{type}"
+                 }))
+  return jobs
+
+def generate_station_graphs(station, type, time_range, dateformatter, data = None):
+  """
+  generate the wind graph and the simple plots of all categories of a station (see station_graph_jobs)
+  """
+  render_engine.render(station_graph_jobs(station, type, time_range, dateformatter, data))
+
+def generate_graphs_of_stations(stations, jobs_of_station):
+  # the data of every station is prepared on its own -> a failing station doesn't prevent the graphs of the other stations
+  jobs = []
+  for station in stations or config.stations:
+    try:
+      jobs += jobs_of_station(station)
+    except Exception:
+      logging.exception(f"Graphs of {station} couldn't be generated")
+
+  # all graphs of all stations are rendered in parallel
+  render_engine.render(jobs)
+
+  stats = config.query_cache.stats()
+  logging.info(f"Query cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_ratio']:.0%}), {stats['entries']} entries, {stats['bytes'] / 1024 / 1024:.1f} MB, {stats['evictions']} evictions")
+  stats = render_engine.stats()
+  logging.info(f"Render engine: {stats['rendered']} rendered, {stats['skipped']} skipped ({stats['skip_ratio']:.0%}), {stats['failed']} failed")
+
+def prefetch_station_graphs(stations, time_range, type = None):
+  # data of all stations in one batch, on failure every station fetches its own data
+  try:
+    return fetch_station_graphs(stations or config.stations, time_range, type)
+  except Exception:
+    logging.exception("Data of the graphs couldn't be fetched at once")
+    return {}
 
+def generate_today_graphs(stations = None):
+  logging.info("#generate_today_graphs()")
+  data = prefetch_station_graphs(stations, "1d")
+  generate_graphs_of_stations(stations, lambda station: station_graph_jobs(station, "today", "1d", "%d %b %H:%M", data.get(station)))
 
   return schedule.CancelJob
 
-def generate_last_7_days_graphs():
+def generate_last_7_days_graphs(stations = None):
   logging.info("#generate_last_7_days_graphs()")
-  # wind
-  generate_wind_graph("tiefenbrunnen", "history")
-  generate_wind_graph("mythenquai", "history")
-  
-  ############################################# this week graphs #############################################
-  ## get data
-  mythenquai_df = get_measurements([Measurement.Air_temp, 
-                                                      Measurement.Humidity,
-                                                      Measurement.Water_temp,
-                                                      Measurement.Water_level,
-                                                      Measurement.Dew_point,
-                                                      Measurement.Pressure],
-                                      station = "mythenquai",
-                                      time_range = "7d")
-
-  tiefenbrunnen_df = get_measurements([Measurement.Air_temp, 
-                                                      Measurement.Humidity,
-                                                      Measurement.Water_temp,
-                                                      Measurement.Water_level,
-                                                      Measurement.Dew_point,
-                                                      Measurement.Pressure],
-                                          station = "tiefenbrunnen",
-                                          time_range = "7d")
-
-  ## convert to arrays
-  timestamps_mythenquai = np.array(mythenquai_df["time"].fillna(value = 0))
-  temperatur_mythenquai = np.array(mythenquai_df["air_temperature"].fillna(value = 0))
-  dewpoint_mythenquai = np.array(mythenquai_df["dew_point"].fillna(value = 0))
-
-  timestamps_tiefenbrunnen = np.array(tiefenbrunnen_df["time"].fillna(value = 0))
-  temperatur_tiefenbrunnen = np.array(tiefenbrunnen_df["air_temperature"].fillna(value = 0))
-  dewpoint_tiefenbrunnen = np.array(tiefenbrunnen_df["dew_point"].fillna(value = 0))
-  watertemp_tiefenbrunnen = np.array(tiefenbrunnen_df["water_temperature"].fillna(value = 0))
-  waterlevel_tiefenbrunnen = np.array(tiefenbrunnen_df["water_level"].fillna(value = 0))
-  pressure_tiefenbrunnen = np.array(tiefenbrunnen_df["barometric_pressure_qfe"].fillna(value = 0))
-
-
-
-  ## plots mythenquai (No watertemperature, waterlevel and pressure, because no data)
-  generate_simple_plot(station = "mythenquai",
-                                      measurements_array = temperatur_mythenquai,
-                                      timestamps = timestamps_mythenquai,
-                                      unit_symbols = ["Temperatur", "T", "°C"],
-                                      imagepath = str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images/graphs/mythenquai_temperature_history.png",
-                                      dateformatter = "%d %b",
-                                      showMin = True,
-                                      showMean = True,
-                                      showMax = True
-                                      )
-
-  generate_simple_plot(station = "mythenquai",
-                                      measurements_array = dewpoint_mythenquai,
-                                      timestamps = timestamps_mythenquai,
-                                      unit_symbols = ["Taupunkt", "T", "°C"],
-                                      imagepath = str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images/graphs/mythenquai_dewpoint_history.png",
-                                      dateformatter = "%d %b",
-                                      showMin = True,
-                                      showMean = True,
-                                      showMax = True
-                                      )
-
-  ## plots tiefenbrunnen
-
-  generate_simple_plot(station = "tiefenbrunnen",
-                                      measurements_array = temperatur_tiefenbrunnen,
-                                      timestamps = timestamps_tiefenbrunnen,
-                                      unit_symbols = ["Temperatur", "T", "°C"],
-                                      imagepath = str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images/graphs/tiefenbrunnen_temperature_history.png",
-                                      dateformatter = "%d %b",
-                                      showMin = True,
-                                      showMean = True,
-                                      showMax = True
-                                      )
-
-  generate_simple_plot(station = "tiefenbrunnen",
-                                      measurements_array = dewpoint_tiefenbrunnen,
-                                      timestamps = timestamps_tiefenbrunnen,
-                                      unit_symbols = ["Taupunkt", "T", "°C"],
-                                      imagepath = str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images/graphs/tiefenbrunnen_dewpoint_history.png",
-                                      dateformatter = "%d %b",
-                                      showMin = True,
-                                      showMean = True,
-                                      showMax = True
-                                      )
-
-  generate_simple_plot(station = "tiefenbrunnen",
-                                      measurements_array = waterlevel_tiefenbrunnen,
-                                      timestamps = timestamps_tiefenbrunnen,
-                                      unit_symbols = ["Wasserstand", "", "m.ü.m"],
-                                      imagepath = str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images/graphs/tiefenbrunnen_waterlevel_history.png",
-                                      dateformatter = "%d %b",
-                                      showMin = True,
-                                      showMean = True,
-                                      showMax = True
-                                      )
-
-  generate_simple_plot(station = "tiefenbrunnen",
-                                      measurements_array = watertemp_tiefenbrunnen,
-                                      timestamps = timestamps_tiefenbrunnen,
-                                      unit_symbols = ["Wassertemperatur", "T", "°C"],
-                                      imagepath = str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images/graphs/tiefenbrunnen_watertemp_history.png",
-                                      dateformatter = "%d %b",
-                                      showMin = True,
-                                      showMean = True,
-                                      showMax = True
-                                      )
-
-  generate_simple_plot(station = "tiefenbrunnen",
-                                      measurements_array = pressure_tiefenbrunnen,
-                                      timestamps = timestamps_tiefenbrunnen,
-                                      unit_symbols = ["Luftdruck", "P", "Pa"],
-                                      imagepath = str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images/graphs/tiefenbrunnen_pressure_history.png",
-                                      ylim = (900, 1000),
-                                      dateformatter = "%d %b",
-                                      showMin = True,
-                                      showMean = True,
-                                      showMax = True
-                                      )
-
-
-def generate_prediction_graphs():
-  logging.info("#generate_prediction_graphs()")
+  data = prefetch_station_graphs(stations, "7d", "history")
+  generate_graphs_of_stations(stations, lambda station: station_graph_jobs(station, "history", "7d", "%d %b", data.get(station)))
+
+def prediction_graph_jobs(station):
   date = datetime.now(pytz.utc) + timedelta(days=-1)
-  ## tiefenbrunnen
-  forecast_date, df = forecast_of_tomorrow("tiefenbrunnen", date)
-  logging.info(f"nearest date to {date} for tiefenbrunnen: {forecast_date}")
+  forecast_date, df = forecast_of_tomorrow(station, date)
+  logging.info(f"nearest date to {date} for {station}: {forecast_date}")
 
-  # wind
-  start_date = forecast_date.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=pytz.timezone('Europe/Zurich'))
-  end_date = start_date + timedelta(days=1)
-  time_range = (start_date.astimezone(pytz.utc), end_date.astimezone(pytz.utc))
-  
-  generate_wind_graph("tiefenbrunnen", "tomorrow", time_range)
-
-  tiefenbrunnen_df = get_measurements([
-                                        Measurement.Air_temp, 
-                                        Measurement.Humidity,
-                                        Measurement.Water_temp,
-                                        Measurement.Water_level,
-                                        Measurement.Dew_point,
-                                        Measurement.Pressure
-                                      ],
-                                      station = "tiefenbrunnen",
-                                      time_range = time_range)
-
-  timestamps_tiefenbrunnen = np.array(tiefenbrunnen_df["time"].fillna(value = 0))
-  temperatur_tiefenbrunnen = np.array(tiefenbrunnen_df["air_temperature"].fillna(value = 0))
-  dewpoint_tiefenbrunnen = np.array(tiefenbrunnen_df["dew_point"].fillna(value = 0))
-  watertemp_tiefenbrunnen = np.array(tiefenbrunnen_df["water_temperature"].fillna(value = 0))
-  waterlevel_tiefenbrunnen = np.array(tiefenbrunnen_df["water_level"].fillna(value = 0))
-  pressure_tiefenbrunnen = np.array(tiefenbrunnen_df["barometric_pressure_qfe"].fillna(value = 0))
-
-  generate_simple_plot(station = "tiefenbrunnen",
-                                      measurements_array = temperatur_tiefenbrunnen,
-                                      timestamps = timestamps_tiefenbrunnen,
-                                      unit_symbols = ["Temperatur", "T", "°C"],
-                                      imagepath = str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images/graphs/tiefenbrunnen_temperature_tomorrow.png",
-                                      dateformatter = "%H:%M",
-                                      showMin = True,
-                                      showMean = True,
-                                      showMax = True
-                                      )
-
-  generate_simple_plot(station = "tiefenbrunnen",
-                                      measurements_array = dewpoint_tiefenbrunnen,
-                                      timestamps = timestamps_tiefenbrunnen,
-                                      unit_symbols = ["Taupunkt", "T", "°C"],
-                                      imagepath = str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images/graphs/tiefenbrunnen_dewpoint_tomorrow.png",
-                                      dateformatter = "%H:%M",
-                                      showMin = True,
-                                      showMean = True,
-                                      showMax = True
-                                      )
-
-  generate_simple_plot(station = "tiefenbrunnen",
-                                      measurements_array = waterlevel_tiefenbrunnen,
-                                      timestamps = timestamps_tiefenbrunnen,
-                                      unit_symbols = ["Wasserstand", "", "m.ü.m"],
-                                      imagepath = str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images/graphs/tiefenbrunnen_waterlevel_tomorrow.png",
-                                      dateformatter = "%H:%M",
-                                      showMin = True,
-                                      showMean = True,
-                                      showMax = True
-                                      )
-
-  generate_simple_plot(station = "tiefenbrunnen",
-                                      measurements_array = watertemp_tiefenbrunnen,
-                                      timestamps = timestamps_tiefenbrunnen,
-                                      unit_symbols = ["Wassertemperatur", "T", "°C"],
-                                      imagepath = str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images/graphs/tiefenbrunnen_watertemp_tomorrow.png",
-                                      dateformatter = "%H:%M",
-                                      showMin = True,
-                                      showMean = True,
-                                      showMax = True
-                                      )
-
-  generate_simple_plot(station = "tiefenbrunnen",
-                                      measurements_array = pressure_tiefenbrunnen,
-                                      timestamps = timestamps_tiefenbrunnen,
-                                      unit_symbols = ["Luftdruck", "P", "Pa"],
-                                      imagepath = str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images/graphs/tiefenbrunnen_pressure_tomorrow.png",
-                                      ylim = (900, 1000),
-                                      dateformatter = "%H:%M",
-                                      showMin = True,
-                                      showMean = True,
-                                      showMax = True
-                                      )
-
-  ## mythenquai
-  forecast_date, df = forecast_of_tomorrow("mythenquai", date)
-  logging.info(f"nearest date to {date} for mythenquai: {forecast_date}")
-
-  # wind
   start_date = forecast_date.replace(hour=0, minute=0, second=0, microsecond=0, tzinfo=pytz.timezone('Europe/Zurich'))
   end_date = start_date + timedelta(days=1)
   time_range = (start_date.astimezone(pytz.utc), end_date.astimezone(pytz.utc))
-  generate_wind_graph("mythenquai", "tomorrow", time_range)
-  
-  mythenquai_df = get_measurements([Measurement.Air_temp, 
-                                                      Measurement.Humidity,
-                                                      Measurement.Water_temp,
-                                                      Measurement.Water_level,
-                                                      Measurement.Dew_point,
-                                                      Measurement.Pressure],
-                                    station = "mythenquai",
-                                    time_range = time_range)
-
-  timestamps_mythenquai = np.array(mythenquai_df["time"].fillna(value = 0))
-  temperatur_mythenquai = np.array(mythenquai_df["air_temperature"].fillna(value = 0))
-  dewpoint_mythenquai = np.array(mythenquai_df["dew_point"].fillna(value = 0))
-
-  ## plots mythenquai (No watertemperature, waterlevel and pressure, because no data)
-  generate_simple_plot(station = "mythenquai",
-                                      measurements_array = temperatur_mythenquai,
-                                      timestamps = timestamps_mythenquai,
-                                      unit_symbols = ["Temperatur", "T", "°C"],
-                                      imagepath = str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images/graphs/mythenquai_temperature_tomorrow.png",
-                                      dateformatter = "%H:%M",
-                                      showMin = True,
-                                      showMean = True,
-                                      showMax = True
-                                      )
-
-  generate_simple_plot(station = "mythenquai",
-                                      measurements_array = dewpoint_mythenquai,
-                                      timestamps = timestamps_mythenquai,
-                                      unit_symbols = ["Taupunkt", "T", "°C"],
-                                      imagepath = str(Path(os.path.dirname(os.path.realpath(__file__)))) + "/static/Images/graphs/mythenquai_dewpoint_tomorrow.png",
-                                      dateformatter = "%H:%M",
-                                      showMin = True,
-                                      showMean = True,
-                                      showMax = True
-                                      )
+
+  return station_graph_jobs(station, "tomorrow", time_range, "%H:%M")
+
+def generate_prediction_graphs(stations = None):
+  logging.info("#generate_prediction_graphs()")
+  generate_graphs_of_stations(stations, prediction_graph_jobs)
 
 
 def generate_spline(measurements : list(Measurement), station : str, time_range, ylabel_name : str, showPlot = False, imagePath = None):
@@ -696,9 +701,12 @@ def generate_plot_colMatrix(measurements : list(tuple((Measurement, tuple((str,
     # Plot values
     axs[i].plot(df["time"].values, df[measurement_type.value].values, label = f"{unit_name}")
 
+    # statistics without missing values
+    statistics = weatherstatistics.annotation_statistics(df[measurement_type.value].to_numpy(dtype = np.float64))
+
     # Plot mean as a line
-    if showMean:
-      mean_measurements = df[measurement_type.value][np.logical_not(np.isnan(df[measurement_type.value]))].values.mean()        #calculate mean without na
+    if showMean and statistics["mean"] is not None:
+      mean_measurements = statistics["mean"]
       axs[i].axhline(mean_measurements, color = "r", label = f"Mean: {round(mean_measurements, 1)}{unit}", linewidth = 1)                  #plot mean line
 
     # get offsets for positioning annotation text for min/max
@@ -708,42 +716,25 @@ def generate_plot_colMatrix(measurements : list(tuple((Measurement, tuple((str,
       offset_annotation = 10
 
     # Mark max in red
-    if showMax:
-     
-      ymax = 0    
-      xpos = 0    #index xmax
-      xmax = 0
-
-      for e in range(0, len(df[measurement_type.value].values)):    #Loop through column with index
-        if df[measurement_type.value].values[e] > ymax:             #Find max
-          ymax = df[measurement_type.value].values[e]               
-          xpos = e                                                  #Get Index of ymax
-
+    if showMax and statistics["max"] is not None:
+      ymax, xpos = statistics["max"]
       xmax = df["time"][xpos]                                #Get xmax with index of ymax
 
       axs[i].scatter(xmax, ymax, color = "red", s = 15)                        #Plot max point
       axs[i].annotate(f"Max: {ymax}{unit}", xy=(xmax, ymax), xytext=(xmax, ymax + offset_annotation))     #Plot label
 
     # Mark min in red
-    if showMin:
-
-      ymin = 1000    
-      xpos = 0    #index xmin
-      xmin = 0
-
-      for e in range(0, len(df[measurement_type.value].values)):    #Loop through column with index
-        if df[measurement_type.value].values[e] < ymin:             #Find min
-          ymin = df[measurement_type.value].values[e]               
-          xpos = e                                                  #Get Index of ymin
-
+    if showMin and statistics["min"] is not None:
+      ymin, xpos = statistics["min"]
       xmin = df["time"][xpos]                                 #Get xmin with index of ymin
 
       axs[i].scatter(xmin, ymin, color = "red", s = 15)                        #Plot min point
       axs[i].annotate(f"Min: {ymin}{unit}", xy=(xmin, ymin), xytext=(xmin, ymin - offset_annotation))      #Plot label
 
     # Mark latest value
-    if showLatest:
-      axs[i].scatter(df["time"].values[-1], df[measurement_type.value].values[-1], color = "green", s = 15, label = f"Aktuell: {df[measurement_type.value].values[-1]}{unit}") 
+    if showLatest and statistics["latest"] is not None:
+      ylatest, xpos = statistics["latest"]
+      axs[i].scatter(df["time"].values[xpos], ylatest, color = "green", s = 15, label = f"Aktuell: {ylatest}{unit}") 
 
 
     #Titles and labels
@@ -774,28 +765,6 @@ def generate_plot_colMatrix(measurements : list(tuple((Measurement, tuple((str,
   else:
     plt.savefig(imagePath, bbox_inches='tight')
 
-## get max value and position in df
-def get_ymax(df_col = np.array):
-    temp_df = df_col[df_col != np.array(None)]
-    xpos_max = 0
-    ymax = 0
-    for i in range(len(temp_df)):
-        if temp_df[i] > ymax:
-            ymax = temp_df[i]
-            xpos_max = i
-    return [ymax, xpos_max]
-
-## get min value and position in df
-def get_ymin(df_col = np.array):
-    temp_df = df_col[df_col != np.array(None)]
-    xpos_min = 0
-    ymin = 100000000
-    for i in range(len(temp_df)):
-        if temp_df[i] < ymin:
-            ymin = temp_df[i]
-            xpos_min = i
-    return [ymin, xpos_min]
-
 def generate_simple_plot(station, 
                         measurements_array,
                         timestamps,
@@ -805,7 +774,9 @@ def generate_simple_plot(station,
                         showMin = True, 
                         showMean = True, 
                         showMax = True,
-                        ylim: list = None
+                        ylim: list = None,
+                        profile = None,
+                        template = None
                         ):
   """
   create simple plot
@@ -822,42 +793,81 @@ def generate_simple_plot(station,
   showMin (Bool --> Default = True) plot red point and value for Min Value
   showMean (Bool --> Default = True) plot red horizontal line and value for Mean Value
   showMax (Bool --> Default = True) plot red point and value for Max Value
+  profile (dict --> Default = None) render profile (size and format of the image), None: Profile of config.ini
+  template (str --> Default = None) key of the figure template to reuse (e.g. station_category_type), None: new figure
   """
   ## Exception for lack of values
   if len(measurements_array) <= 1:
     raise Exception("Es müssen mindestens 2 measurements angegeben werden!")
   
-  ## generate axs and figure
-  fig, ax = plt.subplots()
+  ## figure (reused if only the data changed)
+  layout = (station, tuple(unit_symbols), dateformatter, showMin, showMean, showMax, tuple(ylim) if ylim is not None else None)
+  plot = _get_figure_template(template, layout, lambda: _build_simple_plot(station, timestamps, measurements_array, unit_symbols, dateformatter, showMin, showMean, showMax, ylim))
+  labels = plot["labels"]
+
+  ## statistics / annotations (missing values are ignored)
+  statistics = weatherstatistics.annotation_statistics(measurements_array)
 
-  ## statistics / annotations
   if showMin:
-    ymin, xpos_min = get_ymin(np.array(measurements_array))
-    ax.scatter(x = timestamps[xpos_min], 
-                y = ymin, 
-                color = "red", 
-                label = f"Min: {round(ymin, 2)}{unit_symbols[2]}")
+    _set_point(plot["min"], timestamps, statistics["min"])
+    labels["min"].set_text(_format_statistic("Min", statistics["min"], unit_symbols[2]))
 
   if showMean:
-    ymean = np.nanmean(measurements_array)
-    ax.axhline(y = ymean, 
-                color = "red", 
-                label = f"Mean: {round(ymean, 2)}{unit_symbols[2]}")
+    plot["mean"].set_visible(statistics["mean"] is not None)
+    if statistics["mean"] is not None:
+      plot["mean"].set_ydata([statistics["mean"], statistics["mean"]])
+    labels["mean"].set_text(_format_statistic("Mean", statistics["mean"], unit_symbols[2]))
 
   if showMax:
-    ymax, xpos_max = get_ymax(np.array(measurements_array))
-    ax.scatter(x = timestamps[xpos_max], 
-                y = ymax, 
-                color = "red", 
-                label = f"Max: {round(ymax, 2)}{unit_symbols[2]}")
+    _set_point(plot["max"], timestamps, statistics["max"])
+    labels["max"].set_text(_format_statistic("Max", statistics["max"], unit_symbols[2]))
+
+  ## plot axis
+  plot["line"].set_data(timestamps, measurements_array)
+  labels["line"].set_text(_format_statistic("Aktueller Wert", statistics["latest"], unit_symbols[2]))
+  plot["ax"].set_title(f"Number of measuremens: {statistics['count']}", fontsize = 6)
+  _autoscale(plot["ax"], scaley = ylim is None)
+  _update_figure_layout(plot, [plot["ax"]])
+
+  # save plot
+  weatherrender.save_figure(plot["fig"], imagepath, profile or config.render_profile, bbox_inches='tight')
+
+def _set_point(scatter, timestamps, statistic):
+  # moves the marker of a statistic (value, position), hidden if there is no value
+  if statistic is None:
+    scatter.set_offsets(np.empty((0, 2)))
+  else:
+    value, position = statistic
+    scatter.set_offsets([[mpl_dates.date2num(timestamps[position]), value]])
+
+def _format_statistic(label, statistic, unit):
+  # text of an annotation, statistic: value or (value, position), None -> no value
+  if statistic is None:
+    return f"{label}: -"
+  value = statistic[0] if isinstance(statistic, tuple) else statistic
+  return f"{label}: {round(value, 2)}{unit}"
+
+def _build_simple_plot(station, timestamps, measurements_array, unit_symbols, dateformatter, showMin, showMean, showMax, ylim):
+  # figure template of the simple plot (see generate_simple_plot), the statistics are set by generate_simple_plot
+  fig = Figure()
+  FigureCanvasAgg(fig)
+  ax = fig.subplots()
+
+  ## statistics / annotations (order of the legend)
+  artists = {}
+  if showMin:
+    artists["min"] = ax.scatter(x = timestamps[:1], y = measurements_array[:1], color = "red", label = "Min")
+  if showMean:
+    artists["mean"] = ax.axhline(y = 0, color = "red", label = "Mean")
+  if showMax:
+    artists["max"] = ax.scatter(x = timestamps[:1], y = measurements_array[:1], color = "red", label = "Max")
 
   ## plot axis
-  ax.plot(timestamps, measurements_array, label = f"Aktueller Wert: {round(measurements_array[-1], 2)}{unit_symbols[2]}")
+  artists["line"], = ax.plot(timestamps, measurements_array, label = "Aktueller Wert")
 
   ## set axis attributes
-  ax.legend(loc = "center left",  bbox_to_anchor=(1.02, 0.8), fontsize = 6)
+  legend = ax.legend(loc = "center left",  bbox_to_anchor=(1.02, 0.8), fontsize = 6)
   ax.grid()
-  ax.set_title(f"Number of measuremens: {len(np.array(measurements_array))}", fontsize = 6)
   ax.set_ylabel(f"{unit_symbols[0]} {unit_symbols[1]} in {unit_symbols[2]}", fontsize = 8)
   ax.set_xlabel(f"Zeitachse", fontsize = 6)
   if ylim != None:
@@ -869,14 +879,16 @@ def generate_simple_plot(station,
   fig.set_figwidth(6)
   fig.suptitle(f"Wetterstation {station}: {unit_symbols[0]} {unit_symbols[1]} in {unit_symbols[2]}", fontsize = 6, fontweight = "bold")
   fig.autofmt_xdate()
-  fig.tight_layout()
 
   #set ticksize 
-  plt.xticks(fontsize = 6)
+  ax.tick_params(axis = "x", labelsize = 6)
 
-  # save plot
-  plt.savefig(imagepath, bbox_inches='tight', dpi = 500)
-  plt.close(fig)
+  # legend entries are updated with set_text
+  labels = {text.get_text(): text for text in legend.get_texts()}
+  artists["labels"] = {"min": labels.get("Min"), "mean": labels.get("Mean"), "max": labels.get("Max"), "line": labels["Aktueller Wert"]}
+  artists["fig"] = fig
+  artists["ax"] = ax
+  return artists
 
 
 def generate_plot_rowMatrix(measurements : list(tuple((Measurement, tuple((str, str, str))))), station : str, time_range, showPlot = False, imagePath = None, showMean = False, showMax = False, showMin = False, title = str ):
@@ -970,20 +982,13 @@ def extract_anomaly(station : str, start_time : str):
   return stange data (null values, no values, data interruption)
   """
 
-  df = get_all_measurements(station, start_time)
-  df_anomaly = pd.DataFrame
+  # only the rows with missing values of every chunk are kept
+  anomalies = [df[df.isna().any(axis=1)] for df in stream_measurements(None, station, start_time)]
 
-  is_NaN = df.isnull()
-  row_has_NaN = is_NaN.any(axis=1)
-  df_has_NaN = df[row_has_NaN]
-
-  is_Na = df.isna()
-  row_has_Na = is_Na.any(axis=1)
-  df_has_Na = df[row_has_Na]
-
-  df_anomaly = pd.concat([df_has_NaN, df_has_Na])
+  if not anomalies:
+    raise Exception("Measurements not available for this day!")
 
-  return df_anomaly
+  return pd.concat(anomalies, ignore_index = True)
 
 #forecast
 def construct_window_vector_old(df: pd.DataFrame, lim_weight: list, normalize_to_plusMinus = 1):
@@ -1107,15 +1112,18 @@ def get_mean_of_day(df, measurements_converted, vector_lim_weight):
   measurements_converted (list(Measurement)): list of all measurements (converted to value of measurements)
   vector_lim_weight (list(tuple)): specify min, max and weight for each measurement
   """
-  #calculate mean of measurements
+  return _get_normalized_mean([np.nanmean(df[measurement]) for measurement in measurements_converted], vector_lim_weight)
+
+def _get_normalized_mean(means, vector_lim_weight):
+  # means: mean of each measurement (numbers or numpy arrays, e.g. the means of many days at once)
   mean_of_measurements_dateSearchFor_normalized_list = []
-  for i, measurement in enumerate(measurements_converted):
+  for i, mean in enumerate(means):
     range0 = vector_lim_weight[0][1] - vector_lim_weight[0][0]
     rangei = vector_lim_weight[i][1] - vector_lim_weight[i][0]
 
     weight = (range0 / rangei) * vector_lim_weight[i][2] #calculate weight in dependence to first measurement and measurement weight
 
-    mean_of_measurements_dateSearchFor_normalized_list.append(np.nanmean(df[measurement]) * weight)
+    mean_of_measurements_dateSearchFor_normalized_list.append(mean * weight)
 
   pythoagoras = 0
   for mean_measurement in mean_of_measurements_dateSearchFor_normalized_list:
@@ -1126,6 +1134,32 @@ def get_mean_of_day(df, measurements_converted, vector_lim_weight):
   return pythoagoras
 
 
+def _iterate_days(chunks):
+  """
+  assembles time ordered chunks to days (generator)
+
+  Parameters:
+  chunks (iterable of pandas.DataFrame): entries with an utc index, sorted by time
+
+  returns:
+  tuple(datetime, pandas.DataFrame): date (utc, without time) and the entries of the day
+  """
+  rest = None #entries of the last day of the previous chunk (the day may continue in the next chunk)
+  for chunk in chunks:
+    if rest is not None:
+      chunk = pd.concat([rest, chunk])
+
+    days = chunk.index.normalize()
+    for day, table in chunk.groupby(days):
+      if day == days[-1]: #last day -> wait for the next chunk
+        rest = table
+      else:
+        yield datetime(day.year, day.month, day.day), table
+
+  if rest is not None:
+    day = rest.index[0]
+    yield datetime(day.year, day.month, day.day), rest
+
 def nearest_neighbour(station: str, date_searchBestRecord: datetime, timeArea_months: int, day_window_size = '4h', measurements = [Measurement.Air_temp, Measurement.Dew_point], vector_lim_weight = [(-10, 10, 1), (-10, 10, 0.1)], mean_in_range_percent = 0):
   """
   Get date of a day which is the closest to date_searchBestRecord by cos simularity and mean difference
@@ -1149,10 +1183,9 @@ def nearest_neighbour(station: str, date_searchBestRecord: datetime, timeArea_mo
 
   measurements_converted = [measurement.value for measurement in measurements] #convert measurements
 
-  tables_hist =  wd.get_multible_attr_entries_yearlyWindow(config, measurements_converted, station, date_searchBestRecord, timeArea_months=timeArea_months) #get time windows (missing measurements are not filled with None)
-  table_hist = pd.concat(tables_hist) #concat 
-  table_hist["time"] = [datetime(index.year, index.month, index.day) for index in table_hist.index] #add time column containing only year month and day
-  tables_groupedByDay_hist = table_hist.groupby(table_hist['time']) #group by day
+  # time windows of every year are streamed day by day (missing measurements are not filled with None) -> only one day is kept in memory
+  # the mean difference of all days is calculated from the daily rollups first, the raw entries are only read for the similarity of the days in range
+  history = lambda: _iterate_days(wd.stream_multible_attr_entries_yearlyWindow(config, measurements_converted, station, date_searchBestRecord, timeArea_months=timeArea_months))
 
   #create vector list of date_searchBestRecord
   dateOnly = datetime(date_searchBestRecord.year, date_searchBestRecord.month, date_searchBestRecord.day) #get date of date_searchBestRecord only
@@ -1180,34 +1213,19 @@ def nearest_neighbour(station: str, date_searchBestRecord: datetime, timeArea_mo
   if not vector_today_windowed_dict:
     raise Exception("The day we are searching for cannot be vectorized... stopped searching!")
 
-  #calculate min mean difference of measurements between historical date and searchdate
-  best_meanDifference = None
-  worst_meanDifference = None
-  diff_means = []
-  for index, table_hist_day in tables_groupedByDay_hist:
-    time =  index
+  #calculate min mean difference of measurements between historical date and searchdate (daily means of all days at once)
+  means_of_days = wd.get_rollup_entries_yearlyWindow(config, measurements_converted, station, "1d", date_searchBestRecord, timeArea_months = timeArea_months, statistics = "mean")
+  days = [datetime(day.year, day.month, day.day) for day in means_of_days.index]
+  diffMeans_of_days_norm = np.abs(_get_normalized_mean([means_of_days[measurement].to_numpy() for measurement in measurements_converted], vector_lim_weight) - mean_of_dateSearchFor_norm)
+  diff_means_of_days = {day: diffMean for day, diffMean in zip(days, diffMeans_of_days_norm) if day != dateOnly} #without reference day
+  diff_means = list(diff_means_of_days.values())
 
-    if datetime(time.year, time.month, time.day) == dateOnly: #reference day found
-      #logging.info("reference day found:", datetime(time.year, time.month, time.day))
-      continue
+  if not diff_means:
+    raise Exception("No historical days found... stopped searching!")
 
+  best_meanDifference = np.nanmin(diff_means)
+  worst_meanDifference = np.nanmax(diff_means)
 
-    diffMean_of_hist_day_norm = abs(get_mean_of_day(table_hist_day, measurements_converted, vector_lim_weight) - mean_of_dateSearchFor_norm)
-    diff_means.append(diffMean_of_hist_day_norm) #add value
-
-
-    if best_meanDifference == None: #if no value stored
-      best_meanDifference = diffMean_of_hist_day_norm
-
-    elif diffMean_of_hist_day_norm < best_meanDifference:
-      best_meanDifference = diffMean_of_hist_day_norm
-
-    if worst_meanDifference == None: #if no value stored
-      worst_meanDifference = diffMean_of_hist_day_norm
-
-    elif diffMean_of_hist_day_norm > worst_meanDifference:
-      worst_meanDifference = diffMean_of_hist_day_norm
-  
   meanDifference_range = worst_meanDifference - best_meanDifference #calculate range
   min_meanDifference = ((meanDifference_range / 100) * mean_in_range_percent) + best_meanDifference #mean of historical date has to be in range of meanDifference_range / 100 
   
@@ -1224,7 +1242,7 @@ def nearest_neighbour(station: str, date_searchBestRecord: datetime, timeArea_mo
   best_date = dateOnly
   bestCos = np.pi / 2
   progress_counter = 0
-  for index, table_hist_day in tables_groupedByDay_hist: #iterate over days
+  for index, table_hist_day in history(): #iterate over days
     time =  index
 
     table_day = table_hist_day #rename
@@ -1236,10 +1254,10 @@ def nearest_neighbour(station: str, date_searchBestRecord: datetime, timeArea_mo
 
 
     ####if mean difference is in range####
-    mean_of_hist_day_norm = get_mean_of_day(table_day, measurements_converted, vector_lim_weight) #get mean of hist_Day measurements
+    diffMean_of_hist_day_norm = diff_means_of_days.get(datetime(time.year, time.month, time.day), None) #mean difference of hist_Day (daily rollup)
 
-    #continue if mean difference is not in allowed range
-    if abs(mean_of_hist_day_norm - mean_of_dateSearchFor_norm) > min_meanDifference:
+    #continue if mean difference is not in allowed range (or day isn't complete in the windows)
+    if diffMean_of_hist_day_norm is None or diffMean_of_hist_day_norm > min_meanDifference:
       continue
 
     progress_counter += 1
@@ -0,0 +1,188 @@
+""" Render engine of the graphs
+
+Every graph (station x category x type) is an independent job, which gets its
+data already fetched as numpy arrays. The jobs are rendered in a process pool
+with the Agg backend, so a full refresh uses all cores instead of rendering one
+png after another in the main thread.
+
+Images are written to a temporary file and replaced atomically, the kiosk never
+shows a half written image.
+
+Every job is fingerprinted (hash of its arrays and render parameters). If the
+fingerprint matches the last successful render of the graph, the job is skipped,
+e.g. the graphs of a station without new entries aren't rendered again.
+
+A graph is always rendered by the same process, which keeps its figure as a
+template and only replaces the data (see weatherimport._get_figure_template).
+The graphs are never rendered in the calling process (Flask / scheduler), also
+not a single one or with one worker, so matplotlib only runs in the workers.
+"""
+
+import hashlib
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+def save_figure(fig, path, profile = None, **kwargs):
+    """Saves a figure atomically (temporary file in the same directory, then replaced)
+
+    Parameters:
+    fig (matplotlib.figure.Figure): figure to save
+    path (string): path of the image (the format is taken from the extension if no profile is given)
+    profile (dict -> default: None): render profile (see weatherdata.load_render_profiles), sets dpi and format, None: kwargs only
+    kwargs: arguments of fig.savefig (dpi, bbox_inches, ...)
+    """
+    if profile is not None:
+        kwargs['dpi'] = profile['width'] / fig.get_figwidth() #size of the figure in inch -> width of the display in pixel
+        kwargs['format'] = profile['format']
+        kwargs['pil_kwargs'] = {'compress_level': profile['compress_level']} if profile['format'] == 'png' else {'quality': profile['quality']}
+
+    root, extension = os.path.splitext(path)
+    temp_path = f'{root}.{os.getpid()}.tmp{extension}' #unique per process, same extension -> same format
+    try:
+        fig.savefig(temp_path, **kwargs)
+        os.replace(temp_path, path)
+    finally:
+        if os.path.exists(temp_path): #savefig failed
+            os.remove(temp_path)
+
+def fingerprint(function, kwargs):
+    """Returns a hash of a render job: plot function, arrays (content, dtype and shape) and all other parameters
+
+    Parameters:
+    function (function): plot function
+    kwargs (dict): keyword arguments of the plot function (numpy arrays, dicts, lists and values with a stable repr)
+    """
+    digest = hashlib.blake2b(digest_size = 16)
+    digest.update(f'{function.__module__}.{function.__qualname__}'.encode())
+    __update_digest(digest, kwargs)
+    return digest.hexdigest()
+
+def __update_digest(digest, value):
+    if isinstance(value, np.ndarray):
+        digest.update(f'array{value.dtype.str}{value.shape}'.encode())
+        digest.update(np.ascontiguousarray(value).view(np.uint8).data) #raw bytes without copy (datetime64 can't be hashed directly)
+    elif isinstance(value, dict):
+        digest.update(b'dict')
+        for key in sorted(value, key = repr): #same order as long as the content is the same
+            digest.update(repr(key).encode())
+            __update_digest(digest, value[key])
+    elif isinstance(value, (list, tuple)):
+        digest.update(f'{type(value).__name__}{len(value)}'.encode())
+        for item in value:
+            __update_digest(digest, item)
+    else:
+        digest.update(repr(value).encode())
+
+def _init_worker():
+    # non interactive backend, the workers never show a window
+    import matplotlib
+    matplotlib.use('Agg')
+    import weatherimport
+    weatherimport.init_plotting()
+
+
+class RenderEngine:
+    def __init__(self, workers):
+        """
+        Parameters:
+        workers (int): number of render processes (at least 1)
+        """
+        self.workers = max(workers, 1)
+        self.__executors = [None] * self.workers #one process per slot
+        self.__slots = {} #name of the graph -> slot (the process keeps the figure template of the graph)
+        self.__lock = threading.Lock()
+        self.__fingerprints = {} #name of the graph -> fingerprint of the last successful render
+        self.__stats = {'rendered': 0, 'skipped': 0, 'failed': 0}
+
+    def render(self, jobs):
+        """Renders the jobs (in parallel) and waits until all are done, a failing job doesn't prevent the others
+        Jobs with the same fingerprint as the last successful render of the graph are skipped.
+
+        Parameters:
+        jobs (list of tuple(string, function, dict)): (name, plot function, keyword arguments), the function has to be defined
+                                                      on module level and the arguments must be picklable (e.g. numpy arrays)
+
+        Returns:
+        int: number of successfully rendered jobs
+        """
+        started = time.perf_counter()
+        rendered = failed = 0
+
+        with self.__lock: #one refresh at a time
+            # unchanged graphs are neither built nor saved
+            changed = []
+            for name, function, kwargs in jobs:
+                job_fingerprint = fingerprint(function, kwargs)
+                if self.__fingerprints.get(name) != job_fingerprint:
+                    changed.append((name, function, kwargs, job_fingerprint))
+            skipped = len(jobs) - len(changed)
+
+            results = [(name, job_fingerprint, self.__get_executor(name).submit(function, **kwargs)) for name, function, kwargs, job_fingerprint in changed]
+
+            for name, job_fingerprint, future in results:
+                try:
+                    future.result()
+                    self.__fingerprints[name] = job_fingerprint
+                    rendered += 1
+                except BrokenProcessPool:
+                    logging.exception(f'Render process died while rendering {name}')
+                    self.__fingerprints.pop(name, None)
+                    self.__executors[self.__slots[name]] = None #a new process is started for the next jobs
+                    failed += 1
+                except Exception:
+                    logging.exception(f'Graph {name} couldn\'t be rendered')
+                    self.__fingerprints.pop(name, None) #rendered again next time
+                    failed += 1
+
+            self.__stats['rendered'] += rendered
+            self.__stats['skipped'] += skipped
+            self.__stats['failed'] += failed
+
+        logging.info(f'Rendered {rendered}, skipped {skipped} (unchanged), failed {failed} of {len(jobs)} graphs in {time.perf_counter() - started:.1f}s ({self.workers} workers)')
+        return rendered
+
+    def stats(self):
+        """Returns the counters of the engine
+
+        Returns:
+        dict: rendered, skipped (unchanged fingerprint), failed, skip_ratio
+        """
+        with self.__lock:
+            stats = dict(self.__stats)
+        jobs = stats['rendered'] + stats['skipped']
+        stats['skip_ratio'] = stats['skipped'] / jobs if jobs > 0 else 0.0
+        return stats
+
+    def reset(self):
+        """Forgets the fingerprints, all graphs are rendered again (e.g. after the images were replaced)"""
+        with self.__lock:
+            self.__fingerprints.clear()
+
+    def shutdown(self):
+        """Stops the render processes"""
+        with self.__lock:
+            for executor in self.__executors:
+                if executor is not None:
+                    executor.shutdown()
+            self.__executors = [None] * len(self.__executors)
+
+    def __get_executor(self, name):
+        # a new graph gets the slot with the fewest graphs, afterwards it always stays in this slot
+        if name not in self.__slots:
+            graphs = [0] * len(self.__executors)
+            for slot in self.__slots.values():
+                graphs[slot] += 1
+            self.__slots[name] = graphs.index(min(graphs))
+
+        slot = self.__slots[name]
+        if self.__executors[slot] is None:
+            # spawn: the import threads may hold locks (e.g. logging) while a process would be forked
+            self.__executors[slot] = ProcessPoolExecutor(max_workers = 1, mp_context = multiprocessing.get_context('spawn'), initializer = _init_worker)
+        return self.__executors[slot]
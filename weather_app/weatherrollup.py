@@ -0,0 +1,61 @@
+""" Hourly and daily rollups of the measurements
+
+The min, mean, max and median of every field are stored per hour and per day
+(utc) in separate tables next to the raw entries (<station>_1h, <station>_1d),
+one column per field and statistic (e.g. air_temperature_mean). Buckets are
+recomputed from the raw entries whenever new entries of the bucket are written,
+so graphs of long ranges don't have to aggregate the raw entries again.
+"""
+
+import pandas as pd
+
+
+RESOLUTIONS = {'1h': pd.Timedelta(hours = 1), '1d': pd.Timedelta(days = 1)} #resolution -> length of a bucket
+STATISTICS = ['min', 'mean', 'max', 'median']
+
+
+def get_table(station, resolution):
+    """Returns the name of the rollup table of a station"""
+    return f'{station}_{resolution}'
+
+def get_column(field, statistic):
+    """Returns the name of the rollup column of a field and statistic"""
+    return f'{field}_{statistic}'
+
+def get_buckets(resolution, start_time, stop_time):
+    """Returns (first, last) bucket of the range [start_time, stop_time] (utc timestamps)
+
+    Parameters:
+    resolution (string): 1h or 1d
+    start_time (pd.Timestamp): start of the range (utc)
+    stop_time (pd.Timestamp): end of the range (utc)
+    """
+    length = RESOLUTIONS[resolution]
+    return start_time.floor(length), stop_time.floor(length)
+
+def aggregate(data : pd.DataFrame, resolution, statistics = STATISTICS) -> pd.DataFrame:
+    """Aggregates raw entries to buckets
+
+    Parameters:
+    data (pd.DataFrame): raw entries with a utc timestamp index
+    resolution (string): 1h or 1d
+    statistics (list of string -> default: all): statistics per field [min, mean, max, median]
+
+    Returns:
+    pd.DataFrame: one row per bucket with entries (start of the bucket as index), columns <field>_<statistic> (NaN ignored)
+    """
+    rollup = data.groupby(data.index.floor(RESOLUTIONS[resolution])).agg(list(statistics))
+    rollup.columns = [get_column(field, statistic) for field, statistic in rollup.columns]
+    rollup.index.name = None
+    return rollup
+
+def select(rollup : pd.DataFrame, statistics : dict) -> pd.DataFrame:
+    """Returns one statistic per field, the columns are named like the fields
+
+    Parameters:
+    rollup (pd.DataFrame): buckets with the columns <field>_<statistic>
+    statistics (dict): field -> statistic
+    """
+    selected = rollup.reindex(columns = [get_column(field, statistic) for field, statistic in statistics.items()])
+    selected.columns = list(statistics.keys())
+    return selected
@@ -0,0 +1,111 @@
+""" Write-ahead spool for measurements which couldn't be written to the database
+
+Data which fails to be written (e.g. InfluxDB is down or restarting) is appended
+to a local file. As soon as the database is reachable again, the spool is
+replayed in batches and removed. The health check backs off exponentially, so
+an unavailable database doesn't cost CPU.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import pandas as pd
+
+
+class Spool:
+    def __init__(self, path, retry_base = 5, retry_max = 300):
+        """
+        Parameters:
+        path (string): directory of the spool files
+        retry_base (float): seconds to wait before the first replay attempt after a failure (doubled on every failure)
+        retry_max (float): maximum seconds to wait between two replay attempts
+        """
+        self.path = path
+        self.file = os.path.join(path, 'spool.jsonl') #new data is appended here
+        self.replay_file = os.path.join(path, 'replay.jsonl') #data which is currently replayed
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.retry_delay = retry_base
+        self.next_retry = 0
+        self.__lock = threading.Lock()
+
+    def is_empty(self):
+        """Returns True if no data is waiting to be written to the database"""
+        return not os.path.exists(self.file) and not os.path.exists(self.replay_file)
+
+    def is_due(self):
+        """Returns True if a replay should be attempted (backoff after failures)"""
+        return time.monotonic() >= self.next_retry
+
+    def failed(self):
+        """Call after a failed replay / health check -> next attempt is delayed"""
+        self.next_retry = time.monotonic() + self.retry_delay
+        logging.warning(f'Database not available. Next attempt to replay the spool in {self.retry_delay}s')
+        self.retry_delay = min(self.retry_delay * 2, self.retry_max)
+
+    def succeeded(self):
+        """Call after a successful replay -> resets the backoff"""
+        self.retry_delay = self.retry_base
+        self.next_retry = 0
+
+    def append(self, station, data : pd.DataFrame):
+        """Appends data of a station to the spool (flushed to disk before returning)
+
+        Parameters:
+        station (string): station name
+        data (pd.DataFrame): measurements with a utc timestamp index
+        """
+        record = {
+            'station': station,
+            'index': (data.index.asi8 // 10**9).tolist(), #epoch seconds
+            'columns': list(data.columns),
+            'data': data.to_numpy(dtype = float).tolist()
+        }
+        with self.__lock:
+            os.makedirs(self.path, exist_ok = True)
+            with open(self.file, 'a') as file:
+                file.write(json.dumps(record) + '\n')
+                file.flush()
+                os.fsync(file.fileno())
+        logging.warning(f'Spooled {len(data.index)} entries of {station}')
+
+    def replay(self, write):
+        """Writes all spooled data with write and removes it from the spool afterwards
+
+        If write raises, the data stays in the spool and is replayed again on the next call.
+
+        Parameters:
+        write (function(station, pd.DataFrame)): writes the data of a station to the database
+
+        Returns:
+        int: number of replayed entries
+        """
+        entries = 0
+        with self.__lock:
+            while not self.is_empty():
+                if not os.path.exists(self.replay_file): #new data is appended to a fresh file while replaying
+                    os.replace(self.file, self.replay_file)
+
+                for station, data in self.__read(self.replay_file).items():
+                    write(station, data)
+                    entries += len(data.index)
+
+                os.remove(self.replay_file)
+
+        return entries
+
+    def __read(self, file_name):
+        frames = {}
+        with open(file_name) as file:
+            for line in file:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    logging.error('Skip corrupt entry in spool ' + file_name) #e.g. power loss while appending
+                    continue
+                index = pd.to_datetime(record['index'], unit = 's', utc = True)
+                frames.setdefault(record['station'], []).append(pd.DataFrame(record['data'], index = index, columns = record['columns']))
+
+        return {station: pd.concat(data).sort_index() for station, data in frames.items()}
@@ -0,0 +1,35 @@
+""" Statistics of the graph annotations
+
+Min, max, mean and latest value of a series with their positions, computed with
+NaN aware NumPy reductions (loops in C instead of Python). Missing measurements
+(NaN) are ignored, they are never counted as 0.
+"""
+
+import numpy as np
+
+
+def annotation_statistics(values):
+    """Returns the statistics shown in the annotations of a graph
+
+    Parameters:
+    values (numpy array): measurements (missing -> NaN)
+
+    Returns:
+    dict: min, max, latest -> (value, position in values), mean -> value, count -> number of values (None if there is no value)
+    """
+    values = np.asarray(values, dtype = np.float64)
+    valid = ~np.isnan(values)
+    count = int(np.count_nonzero(valid))
+    if count == 0:
+        return {'min': None, 'max': None, 'mean': None, 'latest': None, 'count': 0}
+
+    position_min = int(np.nanargmin(values))
+    position_max = int(np.nanargmax(values))
+    position_latest = len(values) - 1 - int(np.argmax(valid[::-1])) #last value which isn't NaN
+    return {
+        'min': (float(values[position_min]), position_min),
+        'max': (float(values[position_max]), position_max),
+        'mean': float(np.nanmean(values)),
+        'latest': (float(values[position_latest]), position_latest),
+        'count': count
+    }
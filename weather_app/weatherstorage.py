@@ -0,0 +1,412 @@
+""" Storage backends of the measurements
+
+Every station is stored as its own table (InfluxDB: measurement) with the time and
+one column per field. Two backends implement the same interface:
+
+InfluxStorage: InfluxDB 1.x server (influxdb.DataFrameClient)
+SQLiteStorage: embedded SQLite file, no separate service needed (e.g. on a Raspberry Pi or for offline tests)
+
+The backend is selected with Backend in the [Database] section of config.ini.
+All reads return a pd.DataFrame with the utc timestamp as index (like the
+DataFrameClient), or None if no entries were found.
+
+InfluxStorage reads the entries as csv (Read_Format = csv), which is parsed column
+wise by pd.read_csv instead of building the DataFrame row by row from json.
+"""
+
+import io
+import logging
+import os
+import sqlite3
+import threading
+import numpy as np
+import pandas as pd
+from weatherarchive import to_utc
+
+try:
+    from influxdb import DataFrameClient
+except ImportError:
+    DataFrameClient = None
+
+
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%SZ'
+
+
+def _quote_identifier(name):
+    """Returns a quoted SQLite identifier (table or column name), embedded quotes are escaped"""
+    return '"' + name.replace('"', '""') + '"'
+
+def decode_csv(content):
+    """Decodes a csv query result of InfluxDB (Accept: application/csv, epoch=ns)
+
+    Every statement with entries is a block of lines (header: name,tags,time,<fields>),
+    the blocks are separated by an empty line. Statements without entries are left out.
+
+    Parameters:
+    content (bytes): body of the response
+
+    Returns:
+    list of tuple(string, pd.DataFrame): (measurement, float columns with the utc timestamp as index) per block
+    """
+    results = []
+    for block in content.split(b'\n\n'):
+        if not block.strip():
+            continue
+
+        lines = block.split(b'\n', 2)
+        header = lines[0].decode().strip().split(',')
+        if header[:3] != ['name', 'tags', 'time']:
+            raise Exception(f'Unexpected query result: {block[:200].decode(errors = "replace")}') #e.g. error of a statement
+        if len(lines) < 2:
+            continue
+
+        data = pd.read_csv(io.BytesIO(block), usecols = header[2:], dtype = {**dict.fromkeys(header[3:], np.float64), 'time': np.int64}, engine = 'c')
+        values = data.drop(columns = 'time')
+        values.index = pd.to_datetime(data['time'].to_numpy(), unit = 'ns', utc = True)
+        results.append((lines[1].split(b',', 1)[0].decode(), values))
+    return results
+
+
+class InfluxStorage:
+    def __init__(self, host, port, db_name, read_format = 'csv'):
+        """
+        Parameters:
+        host (string): database host
+        port (int): port of the database
+        db_name (string): database name
+        read_format (string -> default: csv): format of the query results of read / read_many [csv, json]
+        """
+        if DataFrameClient is None:
+            raise Exception('influxdb is not installed, use Backend = sqlite in config.ini')
+
+        self.db_name = db_name
+        self.read_format = read_format
+        self.client = DataFrameClient(host = host, port = port) #connect to database
+
+    def ping(self):
+        """Returns the version of the database, raises if the database isn't reachable"""
+        return self.client.ping()
+
+    def create(self):
+        """Creates the database (if not existing) and selects it"""
+        self.client.create_database(self.db_name) #create a new database
+        self.client.switch_database(self.db_name) #select created database
+
+    def drop(self):
+        """Drops all data and creates the database again"""
+        self.client.drop_database(self.db_name) #drop the database
+        self.client.create_database(self.db_name) #create a new database
+
+    def write(self, station, data : pd.DataFrame, batch_size = None):
+        """Writes (or updates) entries of a station
+
+        Parameters:
+        station (string): station name
+        data (pd.DataFrame): measurements with a utc timestamp index
+        batch_size (int -> default: None): number of rows per write request, None: all at once
+        """
+        self.client.write_points(data, station, time_precision = 's', database = self.db_name, batch_size = batch_size, protocol = 'line') #write rows (line protocol)
+
+    def delete(self, station, stop_time):
+        """Deletes all entries of a station older than stop_time (retention)
+
+        Parameters:
+        station (string): station name
+        stop_time (datetime): entries before this time are deleted
+        """
+        self.client.query(f'DELETE FROM {station} WHERE time < \'{to_utc(stop_time).strftime(TIME_FORMAT)}\'', method = 'POST')
+
+    def read(self, station, fields, start_time, stop_time = None, include_start = True, include_stop = True, limit = None):
+        """Reads entries of a station in a time range (sorted by time)
+
+        Parameters:
+        station (string): station name
+        fields (list of string): field names, None: all fields
+        start_time (datetime): start of the range (utc if no timezone is set)
+        stop_time (datetime -> default: None): end of the range (utc if no timezone is set), None: up to the newest entry
+        include_start (bool -> default: True): False excludes entries at start_time
+        include_stop (bool -> default: True): False excludes entries at stop_time
+        limit (int -> default: None): max. number of entries (the oldest ones)
+        """
+        query = self.__select(station, fields, start_time, stop_time, include_start, include_stop, limit)
+        if self.read_format == 'csv':
+            frames = self.__query_csv(query, [(station, fields, start_time, stop_time, include_start, include_stop)])
+            if frames is not None:
+                return frames[0]
+
+        return self.client.query(query).get(station, None)
+
+    def read_many(self, requests):
+        """Reads multiple ranges in a single request (one statement per range)
+
+        Parameters:
+        requests (list of tuple(string, list of string, datetime, datetime)): (station, fields, start_time, stop_time) like read
+
+        Returns:
+        list of pd.DataFrame: entries of every request in the order of requests
+        """
+        if not requests:
+            return []
+
+        query = ";".join(self.__select(station, fields, start_time, stop_time) for station, fields, start_time, stop_time in requests)
+        if self.read_format == 'csv' and self.__csv_assignable(requests):
+            frames = self.__query_csv(query, [(station, fields, start_time, stop_time, True, True) for station, fields, start_time, stop_time in requests])
+            if frames is not None:
+                return frames
+
+        answer = self.client.query(query) #dictionary (one statement) or list of dictionaries
+        answers = [answer] if isinstance(answer, dict) else list(answer)
+        return [answer.get(station, None) for (station, fields, start_time, stop_time), answer in zip(requests, answers)]
+
+    def last_entry(self, station, since = None):
+        """Returns the newest entry of a station (pd.DataFrame with one row) or None
+
+        Parameters:
+        station (string): station name
+        since (datetime -> default: None): only entries at or after this time are scanned
+        """
+        if since is not None:
+            return self.client.query(f'SELECT * FROM {station} WHERE time >= \'{to_utc(since).strftime(TIME_FORMAT)}\' ORDER BY time DESC LIMIT 1').get(station, None)
+
+        try:
+            # we are only interested in time, however need to provide any field to make query work
+            return self.client.query(f'SELECT air_temperature FROM {station} ORDER BY time DESC LIMIT 1').get(station, None)
+        except:
+            # There are influxDB versions which have an issue with above query
+            logging.error('An exception occurred while querying last entry from DB for ' + station + '. Try alternative approach.')
+            return self.client.query(f'SELECT * FROM {station} ORDER BY time DESC LIMIT 1').get(station, None)
+
+    def first_time(self, station):
+        """Returns the time of the oldest entry of a station (pd.Timestamp in utc) or None"""
+        df_first = self.client.query(f'SELECT first(air_temperature) FROM {station}').get(station, None) #get pd.dataframe from key "station", return "None" if key not found
+        return df_first.index[0] if df_first is not None else None
+
+    def count(self, station, field, start_time, stop_time, interval):
+        """Counts the entries of a field per time interval
+
+        Parameters:
+        station (string): station name
+        field (string): field name
+        start_time (datetime): start of the range
+        stop_time (datetime): end of the range (included)
+        interval (string): length of the intervals [1d, 10m, ...], intervals are aligned to midnight (utc)
+
+        Returns:
+        pd.DataFrame: column 'count' with the start of every interval as index (intervals without entries: 0), None if no entries found
+        """
+        query = f'SELECT count({field}) FROM {station} WHERE time >= \'{to_utc(start_time).strftime(TIME_FORMAT)}\' AND time <= \'{to_utc(stop_time).strftime(TIME_FORMAT)}\' GROUP BY time({interval}) fill(0)'
+        return self.client.query(query).get(station, None)
+
+    def field_keys(self, station):
+        """Returns the names of all fields of a station"""
+        return [point['fieldKey'] for point in self.client.query(f'SHOW FIELD KEYS FROM {station}').get_points()]
+
+    def __query_csv(self, query, ranges):
+        # queries the entries as csv, returns one pd.DataFrame (or None) per range or None if the server doesn't support csv (-> json)
+        response = self.client.request('query', params = {'q': query, 'db': self.db_name, 'epoch': 'ns'}, headers = {'Accept': 'application/csv'})
+        if not response.headers.get('Content-Type', '').startswith('application/csv'):
+            logging.warning('InfluxDB does not support csv query results, reading json instead')
+            self.read_format = 'json'
+            return None
+
+        # empty statements are left out -> assign the blocks in order to the first range containing them (station, time and fields)
+        frames = [None] * len(ranges)
+        blocks = iter(decode_csv(response.content))
+        block = next(blocks, None)
+        for i, (station, fields, start_time, stop_time, include_start, include_stop) in enumerate(ranges):
+            if block is None:
+                break
+            name, data = block
+            start = to_utc(start_time).floor('s') #precision of the query (TIME_FORMAT)
+            stop = to_utc(stop_time).floor('s') if stop_time is not None else None
+            if name == station and (data.index[0] >= start if include_start else data.index[0] > start) \
+                and (stop is None or (data.index[-1] <= stop if include_stop else data.index[-1] < stop)) \
+                and (fields is None or set(data.columns) <= set(fields)):
+                frames[i] = data.dropna(axis = 1, how = 'all') #no empty fields (like the DataFrameClient)
+                block = next(blocks, None)
+
+        return frames
+
+    def __csv_assignable(self, requests):
+        # the blocks of a csv result are matched by station, time and fields -> requests of the same range are only distinguishable with disjoint fields
+        fields_of_range = {}
+        for station, fields, start_time, stop_time in requests:
+            fields_of_range.setdefault((station, start_time, stop_time), []).append(fields)
+        for fields_list in fields_of_range.values():
+            if len(fields_list) > 1 and (None in fields_list or len(set().union(*fields_list)) < sum(len(fields) for fields in fields_list)):
+                return False
+        return True
+
+    def __select(self, station, fields, start_time, stop_time, include_start = True, include_stop = True, limit = None):
+        time_filter = f'time {">=" if include_start else ">"} \'{to_utc(start_time).strftime(TIME_FORMAT)}\''
+        if stop_time is not None:
+            time_filter += f' AND time {"<=" if include_stop else "<"} \'{to_utc(stop_time).strftime(TIME_FORMAT)}\''
+
+        query = f'SELECT {",".join(fields) if fields else "*"} FROM {station} WHERE {time_filter}'
+        if limit is not None:
+            query += f' ORDER BY time ASC LIMIT {limit}'
+        return query
+
+
+class SQLiteStorage:
+    def __init__(self, file_name):
+        """
+        Parameters:
+        file_name (string): path of the database file
+        """
+        self.file_name = file_name
+        self.connection = None
+        self.__lock = threading.Lock()
+
+    def ping(self):
+        """Returns the version of SQLite"""
+        return sqlite3.sqlite_version
+
+    def create(self):
+        """Opens (or creates) the database file"""
+        with self.__lock:
+            if self.connection is None:
+                directory = os.path.dirname(self.file_name)
+                if directory:
+                    os.makedirs(directory, exist_ok = True)
+                self.connection = sqlite3.connect(self.file_name, check_same_thread = False) #shared by the import and render threads (serialized by the lock)
+                self.connection.execute('PRAGMA journal_mode = WAL')
+                self.connection.execute('PRAGMA synchronous = NORMAL')
+
+    def drop(self):
+        """Drops all tables"""
+        with self.__lock:
+            for table in self.__tables():
+                self.connection.execute(f'DROP TABLE {_quote_identifier(table)}')
+            self.connection.commit()
+            self.connection.execute('VACUUM')
+
+    def write(self, station, data : pd.DataFrame, batch_size = None):
+        """Writes (or updates) entries of a station, missing values (NaN) don't overwrite existing values
+
+        Parameters:
+        station (string): station name
+        data (pd.DataFrame): measurements with a utc timestamp index
+        batch_size (int -> default: None): number of rows per transaction, None: all at once
+        """
+        data = data.dropna(axis = 1, how = 'all').dropna(axis = 0, how = 'all') #no empty fields / entries (like InfluxDB)
+        if data.empty:
+            return
+
+        fields = [str(field) for field in data.columns]
+        times = (data.index.asi8 // 10**9).tolist() #epoch seconds
+        values = data.to_numpy(dtype = np.float64).astype(object)
+        values[pd.isna(values)] = None
+        rows = [(time,) + tuple(row) for time, row in zip(times, values.tolist())]
+
+        columns = ', '.join(_quote_identifier(field) for field in fields)
+        updates = ', '.join(f'{_quote_identifier(field)} = coalesce(excluded.{_quote_identifier(field)}, {_quote_identifier(field)})' for field in fields)
+        statement = f'INSERT INTO {_quote_identifier(station)} (time, {columns}) VALUES ({", ".join("?" * (len(fields) + 1))}) ON CONFLICT(time) DO UPDATE SET {updates}'
+
+        batch_size = batch_size or len(rows)
+        with self.__lock:
+            self.__ensure_columns(station, fields)
+            for i in range(0, len(rows), batch_size):
+                self.connection.executemany(statement, rows[i:i + batch_size])
+                self.connection.commit()
+
+    def delete(self, station, stop_time):
+        """Deletes all entries of a station older than stop_time (the space is reused for new entries), see InfluxStorage.delete"""
+        with self.__lock:
+            if station in self.__tables():
+                self.connection.execute(f'DELETE FROM {_quote_identifier(station)} WHERE time < ?', [int(to_utc(stop_time).timestamp())])
+                self.connection.commit()
+
+    def read(self, station, fields, start_time, stop_time = None, include_start = True, include_stop = True, limit = None):
+        """Reads entries of a station in a time range (sorted by time), see InfluxStorage.read"""
+        with self.__lock:
+            columns = self.__columns(station)
+            fields = [field for field in (fields or columns) if field in columns]
+            if not fields:
+                return None
+
+            conditions = [f'time {">=" if include_start else ">"} ?']
+            parameters = [int(to_utc(start_time).timestamp())]
+            if stop_time is not None:
+                conditions.append(f'time {"<=" if include_stop else "<"} ?')
+                parameters.append(int(to_utc(stop_time).timestamp()))
+            conditions.append('(' + ' OR '.join(f'{_quote_identifier(field)} IS NOT NULL' for field in fields) + ')') #only entries with values (like InfluxDB)
+
+            selected = ', '.join(_quote_identifier(field) for field in fields)
+            query = f'SELECT time, {selected} FROM {_quote_identifier(station)} WHERE {" AND ".join(conditions)} ORDER BY time'
+            if limit is not None:
+                query += f' LIMIT {int(limit)}'
+            rows = self.connection.execute(query, parameters).fetchall()
+
+        return self.__to_frame(rows, fields)
+
+    def read_many(self, requests):
+        """Reads multiple ranges, see InfluxStorage.read_many"""
+        return [self.read(station, fields, start_time, stop_time) for station, fields, start_time, stop_time in requests]
+
+    def last_entry(self, station, since = None):
+        """Returns the newest entry of a station (pd.DataFrame with one row) or None, see InfluxStorage.last_entry"""
+        with self.__lock:
+            columns = self.__columns(station)
+            if not columns:
+                return None
+            condition = 'WHERE time >= ?' if since is not None else ''
+            parameters = [int(to_utc(since).timestamp())] if since is not None else []
+            selected = ', '.join(_quote_identifier(column) for column in columns)
+            rows = self.connection.execute(f'SELECT time, {selected} FROM {_quote_identifier(station)} {condition} ORDER BY time DESC LIMIT 1', parameters).fetchall()
+
+        return self.__to_frame(rows, columns)
+
+    def first_time(self, station):
+        """Returns the time of the oldest entry of a station (pd.Timestamp in utc) or None"""
+        with self.__lock:
+            if 'air_temperature' not in self.__columns(station):
+                return None
+            first = self.connection.execute(f'SELECT min(time) FROM {_quote_identifier(station)} WHERE air_temperature IS NOT NULL').fetchone()[0]
+
+        return pd.Timestamp(first, unit = 's', tz = 'UTC') if first is not None else None
+
+    def count(self, station, field, start_time, stop_time, interval):
+        """Counts the entries of a field per time interval, see InfluxStorage.count"""
+        seconds = int(pd.Timedelta(interval).total_seconds())
+        start = int(to_utc(start_time).timestamp())
+        stop = int(to_utc(stop_time).timestamp())
+
+        with self.__lock:
+            if field not in self.__columns(station):
+                return None
+            rows = self.connection.execute(f'SELECT time / ? * ? AS slot, count({_quote_identifier(field)}) FROM {_quote_identifier(station)} WHERE time >= ? AND time <= ? GROUP BY slot', [seconds, seconds, start, stop]).fetchall()
+
+        if not any(count for slot, count in rows):
+            return None
+
+        slots = pd.to_datetime(np.arange(start // seconds * seconds, stop // seconds * seconds + 1, seconds), unit = 's', utc = True)
+        counts = pd.Series(dict(rows), dtype = np.int64)
+        counts.index = pd.to_datetime(counts.index, unit = 's', utc = True)
+        return pd.DataFrame({'count': counts.reindex(slots, fill_value = 0)})
+
+    def field_keys(self, station):
+        """Returns the names of all fields of a station"""
+        with self.__lock:
+            return self.__columns(station)
+
+    def __tables(self):
+        return [row[0] for row in self.connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+
+    def __columns(self, station):
+        return [row[1] for row in self.connection.execute(f'PRAGMA table_info({_quote_identifier(station)})') if row[1] != 'time']
+
+    def __ensure_columns(self, station, fields):
+        self.connection.execute(f'CREATE TABLE IF NOT EXISTS {_quote_identifier(station)} (time INTEGER PRIMARY KEY)') #time is the key -> entries are sorted and indexed by time
+        columns = self.__columns(station)
+        for field in fields:
+            if field not in columns: #new field
+                self.connection.execute(f'ALTER TABLE {_quote_identifier(station)} ADD COLUMN {_quote_identifier(field)} REAL')
+
+    def __to_frame(self, rows, fields):
+        if not rows:
+            return None
+
+        block = np.array(rows, dtype = np.float64) #None -> NaN
+        data = pd.DataFrame(block[:, 1:], index = pd.to_datetime(block[:, 0].astype(np.int64), unit = 's', utc = True), columns = fields)
+        return data.dropna(axis = 1, how = 'all') #no empty fields (like the DataFrameClient)
@@ -0,0 +1,97 @@
+""" Persistent ingestion state of the stations
+
+Stores the time of the newest entry in the database (high-water mark) and the
+import state of the historic csv file and the synced range of the rollups of every
+station in a small json file.
+After a restart the last entries don't have to be searched in the whole table.
+
+The file is replaced atomically, so it is never left half written.
+"""
+
+import json
+import logging
+import os
+import threading
+import pandas as pd
+
+
+class WatermarkStore:
+    def __init__(self, file_name):
+        """
+        Parameters:
+        file_name (string): path of the json file
+        """
+        self.file_name = file_name
+        self.__lock = threading.Lock()
+        self.__state = self.__load()
+
+    def get_last_entry(self, station):
+        """Returns the persisted time of the newest entry of a station (pd.Timestamp in utc) or None"""
+        with self.__lock:
+            last_entry = self.__state.get(station, {}).get('last_entry', None)
+        return pd.Timestamp(last_entry) if last_entry else None
+
+    def set_last_entry(self, station, last_entry):
+        """Persists the time of the newest entry of a station
+
+        Parameters:
+        station (string): station name
+        last_entry (datetime): time of the newest entry in the database (timezone aware)
+        """
+        with self.__lock:
+            self.__state.setdefault(station, {})['last_entry'] = pd.Timestamp(last_entry).tz_convert('UTC').isoformat()
+            self.__save()
+
+    def get_csv_imported(self, station):
+        """Returns True if the csv file is imported completely, False if the import was started but not finished, None if unknown"""
+        with self.__lock:
+            return self.__state.get(station, {}).get('csv_imported', None)
+
+    def set_csv_imported(self, station, imported):
+        """Persists the import state of the csv file of a station"""
+        with self.__lock:
+            self.__state.setdefault(station, {})['csv_imported'] = imported
+            self.__save()
+
+    def get_rollups_first(self, station):
+        """Returns the time since which the rollups of a station are complete (pd.Timestamp in utc) or None"""
+        with self.__lock:
+            rollups_first = self.__state.get(station, {}).get('rollups_first', None)
+        return pd.Timestamp(rollups_first) if rollups_first else None
+
+    def set_rollups_first(self, station, rollups_first):
+        """Persists the time since which the rollups of a station are complete (timezone aware)"""
+        with self.__lock:
+            self.__state.setdefault(station, {})['rollups_first'] = pd.Timestamp(rollups_first).tz_convert('UTC').isoformat()
+            self.__save()
+
+    def reset(self, station = None):
+        """Removes the state of a station (all stations if None), e.g. after the database was dropped"""
+        with self.__lock:
+            if station is None:
+                self.__state.clear()
+            else:
+                self.__state.pop(station, None)
+            self.__save()
+
+    def __load(self):
+        if not os.path.isfile(self.file_name):
+            return {}
+        try:
+            with open(self.file_name) as file:
+                return json.load(file)
+        except ValueError:
+            logging.error(f'Watermark file {self.file_name} is corrupt and ignored')
+            return {}
+
+    def __save(self):
+        # write a temporary file and replace the old one -> the file is always complete
+        directory = os.path.dirname(self.file_name)
+        if directory:
+            os.makedirs(directory, exist_ok = True)
+        temp_file_name = self.file_name + '.tmp'
+        with open(temp_file_name, 'w') as file:
+            json.dump(self.__state, file, indent = 4)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_file_name, self.file_name)